@@ -83,6 +83,7 @@ class atom(drawable_chem_vertex, oasa.atom):
   @symbol.setter
   def symbol(self, symbol):
     oasa.atom.symbol.__set__(self, symbol)
+    self._flush_molecule_cache()
     if self._symbol != 'C':
       self.show = True
 
@@ -149,6 +150,22 @@ class atom(drawable_chem_vertex, oasa.atom):
   @valency.setter
   def valency(self, val):
     drawable_chem_vertex.valency.__set__(self, val)
+    self._flush_molecule_cache()
+
+
+  # Override of oasa.atom.isotope, the cached OASA molecule depends on it
+  @property
+  def isotope(self):
+    try:
+      return self._isotope
+    except AttributeError:
+      return None
+
+
+  @isotope.setter
+  def isotope(self, isotope):
+    self._isotope = isotope
+    self._flush_molecule_cache()
 
 
   # Replace oasa.atom.free_sites
@@ -163,6 +180,7 @@ class atom(drawable_chem_vertex, oasa.atom):
   @free_sites.setter
   def free_sites(self, free_sites):
     self._free_sites = free_sites
+    self._flush_molecule_cache()
     marks = self.get_marks_by_type( "free_sites")
     if self._free_sites:
       if not marks:
@@ -317,6 +335,7 @@ class atom(drawable_chem_vertex, oasa.atom):
         [m.draw() for m in self.marks]
       self.paper.register_id( self.item, self)
       self._reposition_on_redraw = 0
+      self.dirty = 0
 
 
   def focus( self):
@@ -30,7 +30,15 @@ import os_support
 
 sys.path.insert(1, os_support.get_module_path())
 
+# --profile-startup OUTPUT [--profile-baseline BASELINE] records the time
+# spent in the startup phases and imports, writes it as JSON and exits
+import startup
+profile = __name__ == '__main__' and startup.parse_profile_options( sys.argv) or None
+if profile:
+  startup.profile_imports()
+
 ### now starting for real
+startup.begin( "preferences")
 import pref_manager
 
 from singleton_store import Store
@@ -39,9 +47,11 @@ from singleton_store import Store
 Store.pm = pref_manager.pref_manager(
   [os_support.get_config_filename( "prefs.xml", level="global", mode='r'),
    os_support.get_config_filename( "prefs.xml", level="personal", mode='r')])
+startup.end()
 
 
 ## first turn locale support on
+startup.begin( "locale")
 
 import gettext
 import os.path
@@ -93,6 +103,7 @@ else:
     builtins.__dict__['_'] = lambda m: m
     builtins.__dict__['ngettext'] = gettext.ngettext
     Store.lang = "en"
+startup.end()
 
 
 
@@ -121,12 +132,27 @@ if not config.debug:
     sys.exit()
 
 
-from main import BKChem
-from splash import Splash
-from singleton_store import Store
+# the conversion mode does not use Tk at all, it must be handled before
+# the application is created
+if __name__ == '__main__' and ("-c" in sys.argv[1:] or "--convert" in sys.argv[1:]):
+  import headless
+  sys.exit( headless.main( sys.argv[1:]))
+
 
-myapp = BKChem()
-myapp.withdraw()
+# worker processes of multiprocessing started by spawn or forkserver import
+# this module as __mp_main__ - they are used by the conversion mode and
+# must not create the Tk application
+is_worker = __name__ == '__mp_main__'
+
+if not is_worker:
+  startup.begin( "create_application")
+  from main import BKChem
+  from splash import Splash
+  from singleton_store import Store
+
+  myapp = BKChem()
+  myapp.withdraw()
+  startup.end()
 
 if __name__ == '__main__':
 
@@ -158,6 +184,8 @@ if __name__ == '__main__':
     if len(opts) >= i:
       # Batch mode
       myapp.initialize_batch()
+      if profile:
+        sys.exit( startup.finish_profile( *profile))
       myapp.process_batch(opts)
     sys.exit()
   else:
@@ -183,6 +211,9 @@ if __name__ == '__main__':
 
     # application initialization
     myapp.initialize()
+    if profile:
+      splash.destroy()
+      sys.exit( startup.finish_profile( *profile))
     for i in range( 0, len( files)):
       if i > 0:
         myapp.add_new_paper()
@@ -208,7 +239,7 @@ if __name__ == '__main__':
   myapp.destroy()
 
 # the module was imported from outside
-else:
+elif not is_worker:
   # application initialization
   myapp.initialize()
   # start the application
@@ -34,6 +34,7 @@ import misc
 import dom_extensions
 
 from ftext import ftext
+from coordinates import coordinate_array
 from singleton_store import Store, Screen
 from parents import meta_enabled, line_colored, drawable, with_line, interactive, child_with_paper
 
@@ -88,6 +89,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
     self.auto_bond_sign = 1
     self.simple_double = simple_double
     self.equithick = 0
+    self._side_cache = None
 
     if package:
       self.read_package( package)
@@ -102,6 +104,9 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @dirty.setter
   def dirty(self, dirty):
     self.__dirty = dirty
+    if dirty:
+      self._note_undo_change()
+      self._schedule_redraw_if_drawn()
 
 
   @property
@@ -122,7 +127,8 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @type.setter
   def type(self, mol):
     self.__type = mol
-    self.__dirty = 1
+    self.dirty = 1
+    self._flush_molecule_cache()
 
 
   @property
@@ -133,7 +139,15 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @order.setter
   def order(self, mol):
     oasa.bond.order.__set__(self, mol)
-    self.__dirty = 1
+    self.dirty = 1
+    self._flush_molecule_cache()
+
+
+  def _flush_molecule_cache( self):
+    """data cached on the molecule are no longer valid when the bond changes"""
+    mol = getattr( self, '_bond__molecule', None)
+    if mol is not None:
+      mol.flush_oasa_cache()
 
 
   @property
@@ -150,7 +164,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
       self._vertices[0] = mol
     except IndexError:
       self._vertices = [mol, None]
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -167,7 +181,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
       self._vertices[1] = mol
     except IndexError:
       self._vertices = [None, mol]
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -178,7 +192,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @atoms.setter
   def atoms(self, mol):
     self._vertices = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -189,7 +203,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @center.setter
   def center(self, mol):
     self.__center = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -200,7 +214,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @bond_width.setter
   def bond_width(self, mol):
     self.__bond_width = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -211,7 +225,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @wedge_width.setter
   def wedge_width(self, mol):
     self.__wedge_width = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -222,7 +236,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @simple_double.setter
   def simple_double(self, mol):
     self.__simple_double = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -233,7 +247,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @double_length_ratio.setter
   def double_length_ratio(self, mol):
     self.__double_length_ratio = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -244,7 +258,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
   @auto_bond_sign.setter
   def auto_bond_sign(self, mol):
     self.__auto_bond_sign = mol
-    self.__dirty = 1
+    self.dirty = 1
 
 
   @property
@@ -288,28 +302,20 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
       if automatic == "both":
         self.center = center
     # the following lines ensure proper drawing in case 3D coordinates are involved
-    transform = None
-    self._transform = oasa.transform3d.transform3d()
+    self._transform = None
+    original = None
     if self.order != 1 or self.type != 'n':
-      for n in self.atom1.neighbors + self.atom2.neighbors:
-        # self.atom1 and self.atom2 are in this list as well
-        if n.z != 0:
-          # engage 3d transform prior to detection of where to draw
-          transform = self._get_3dtransform_for_drawing()
-          break
+      transform, original = self._project_for_drawing( self._get_neighborhood())
       if transform:
-        for n in self.molecule.atoms:
-          n.transform( transform)
         self._transform = transform.get_inverse()
     # / end of 3D
     # we call the draw method
     self.__class__.__dict__[ method]( self)
     # we have to cleanup after 3D stuff
-    if self._transform:
-      # if transform was used, we need to transform back
-      for n in self.molecule.atoms:
-        n.transform( self._transform)
+    if original is not None:
+      original.apply( move_marks=False)
       self._transform = None
+    self.__dirty = 0
 
 
   # THE DRAW HELPER METHODS
@@ -681,6 +687,38 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
     return t
 
 
+  def _get_neighborhood( self, rings=None):
+    """returns list of self.atom1, self.atom2, their neighbors and the atoms
+    of the rings of self (or of rings when given) - the atoms whose
+    coordinates are used when self is drawn"""
+    if rings is None:
+      rings = self.molecule.get_rings_of_bond( self)
+    atoms = self.atom1.neighbors + self.atom2.neighbors
+    for ring in rings:
+      atoms.extend( ring)
+    return misc.filter_unique( atoms)
+
+
+  def _project_for_drawing( self, atoms):
+    """if any of atoms has a non-zero z coordinate, moves them using the
+    transform from _get_3dtransform_for_drawing and returns a tuple
+    (transform, coordinate_array of the original coordinates); the caller
+    restores the atoms by calling apply on the returned coordinate_array.
+    Only the given atoms are moved, not the whole molecule, because the
+    transform is specific for this bond. Returns (None, None) for 2D."""
+    for a in atoms:
+      if a.z != 0:
+        break
+    else:
+      return None, None
+    transform = self._get_3dtransform_for_drawing()
+    original = coordinate_array( atoms)
+    projected = coordinate_array( atoms)
+    projected.transform( transform)
+    projected.apply( move_marks=False)
+    return transform, original
+
+
   # wedge bonds
   def _draw_w1( self):
     where = self._where_to_draw_from_and_to()
@@ -1012,13 +1050,13 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
 
   def simple_redraw( self):
     """very fast redraw that draws only a simple line instead of the bond,
-    used in 3d rotation only (as for BKChem 0.5.0)"""
+    used during 3d rotation and dragging, must be followed by a full redraw"""
     [self.paper.delete( i) for i in self.second]
     self.second = []
     [self.paper.delete( i) for i in self.third]
     self.third = []
     if self.items:
-      map( self.paper.delete, self.items)
+      [self.paper.delete( i) for i in self.items]
       self.items = []
     x1, y1 = self.atom1.get_xy()
     x2, y2 = self.atom2.get_xy()
@@ -1121,7 +1159,7 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
     self.second = []
     self.third = []
     self.items = []
-    map( self.paper.delete, items)
+    [self.paper.delete( o) for o in items]
     return self
 
 
@@ -1307,17 +1345,13 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
 
   def _compute_sign_and_center( self):
     """returns tuple of (sign, center) where sign is the default sign of the self.bond_width"""
+    rings = self.molecule.get_rings_of_bond( self)
+    # the result is memoized until the local geometry changes
+    key = self._get_side_key( rings)
+    if self._side_cache and self._side_cache[0] == key:
+      return self._side_cache[1]
     # check if we need to transform 3D before computation
-    transform = None
-    for n in self.atom1.neighbors + self.atom2.neighbors:
-      # self.atom1 and self.atom2 are in this list as well
-      if n.z != 0:
-        # engage 3d transform prior to detection of where to draw
-        transform = self._get_3dtransform_for_drawing()
-        break
-    if transform:
-      for n in self.atom1.neighbors + self.atom2.neighbors:
-        n.transform( transform)
+    transform, original = self._project_for_drawing( self._get_neighborhood( rings))
     # /end of check
     line = self.atom1.get_xy() + self.atom2.get_xy()
     atms = self.atom1.neighbors + self.atom2.neighbors
@@ -1325,10 +1359,9 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
     coords = [a.get_xy() for a in atms]
     # searching for circles
     circles = 0
-    for ring in self.molecule.get_smallest_independent_cycles_dangerous_and_cached():
-      if self.atom1 in ring and self.atom2 in ring:
-        on_which_side = lambda xy: geometry.on_which_side_is_point( line, xy)
-        circles += sum(map(on_which_side, [a.get_xy() for a in ring if a not in self.atoms]))
+    for ring in rings:
+      on_which_side = lambda xy: geometry.on_which_side_is_point( line, xy)
+      circles += sum(map(on_which_side, [a.get_xy() for a in ring if a not in self.atoms]))
     if circles:
       side = circles
     else:
@@ -1360,14 +1393,21 @@ class bond( meta_enabled, line_colored, drawable, with_line, interactive, child_
         else:
           ret = (1, 0)
     # transform back if necessary
-    if transform:
-      inv = transform.get_inverse()
-      for n in self.atom1.neighbors + self.atom2.neighbors:
-        n.transform( inv)
+    if original is not None:
+      original.apply( move_marks=False)
     # /end of back transform
+    self._side_cache = (key, ret)
     return ret
 
 
+  def _get_side_key( self, rings):
+    """returns the data _compute_sign_and_center depends on - the atoms
+    around self and in its rings with their coordinates and the rings"""
+    around = tuple( (a, a.x, a.y, a.z, a.show, getattr( a, 'symbol', None)) for a in self._get_neighborhood( rings))
+    in_rings = tuple( frozenset( ring) for ring in rings)
+    return around, in_rings
+
+
   def get_atoms( self):
     return self.get_vertices()
 
@@ -0,0 +1,192 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Streaming reader of CDML and CD-SVG files.
+
+The file is parsed incrementally and only the cdml element is built as
+a DOM tree, the SVG drawing around it in CD-SVG files is skipped without
+being kept in memory. Gzipped files are recognized by their first bytes,
+so the file is opened and read only once.
+"""
+
+import gzip
+import xml.dom
+import xml.dom.minidom as dom
+from xml.parsers import expat
+
+import data
+
+
+gzip_magic = b"\x1f\x8b"
+
+
+
+class cdml_read_error(Exception):
+
+  def __init__( self, value):
+    Exception.__init__( self, value)
+    self.value = value
+
+
+
+class _cdml_found(Exception):
+  """raised from the parser handlers to stop parsing"""
+  pass
+
+
+
+class cdml_builder(object):
+  """Expat handlers building the DOM tree of the cdml element.
+
+  Elements outside of the cdml element are only counted. A cdml element
+  without the CDML namespace (and not being the root) is kept as fallback
+  and the search for a proper one continues.
+  """
+  def __init__( self):
+    self.depth = 0
+    self.document = None
+    self.cdml = None
+    self.fallback = None
+    self._stack = []
+    self._namespaces = []
+
+
+  def install( self, parser):
+    parser.StartNamespaceDeclHandler = self.start_namespace
+    parser.StartElementHandler = self.start_element
+    parser.EndElementHandler = self.end_element
+    parser.CharacterDataHandler = self.characters
+
+
+  def start_namespace( self, prefix, uri):
+    self._namespaces.append( (prefix, uri))
+
+
+  def start_element( self, name, attrs):
+    uri, local, prefix = _split_name( name)
+    qname = prefix and prefix+":"+local or local
+    if self._stack:
+      el = dom.Element( qname, uri, prefix, local)
+      el.ownerDocument = self.document
+      dom._append_child( self._stack[-1], el)
+    elif local == 'cdml' and (self.depth == 0 or uri == data.cdml_namespace or self.fallback is None):
+      self.document = dom.getDOMImplementation().createDocument( uri, qname, None)
+      el = self.document.documentElement
+      self.cdml = el
+    else:
+      self.depth += 1
+      self._namespaces = []
+      return
+    for prefix, ns_uri in self._namespaces:
+      if prefix:
+        self._set_attribute( el, xml.dom.XMLNS_NAMESPACE, prefix, "xmlns", ns_uri)
+      else:
+        self._set_attribute( el, xml.dom.XMLNS_NAMESPACE, "xmlns", None, ns_uri)
+    self._namespaces = []
+    for name, value in attrs.items():
+      uri, local, prefix = _split_name( name)
+      self._set_attribute( el, uri, local, prefix, value)
+    self._stack.append( el)
+
+
+  def _set_attribute( self, el, uri, local, prefix, value):
+    # the same shortcuts as in xml.dom.expatbuilder are used when building
+    # the tree, createElementNS and setAttributeNS are too slow
+    a = dom.Attr( prefix and prefix+":"+local or local, uri, local, prefix)
+    a.value = value
+    a.ownerDocument = self.document
+    dom._set_attribute_node( el, a)
+
+
+  def end_element( self, name):
+    if not self._stack:
+      self.depth -= 1
+      return
+    el = self._stack.pop()
+    if el is self.cdml:
+      if self.depth == 0 or el.namespaceURI == data.cdml_namespace:
+        raise _cdml_found()
+      self.fallback = el
+      self.cdml = None
+
+
+  def characters( self, text):
+    if self._stack:
+      el = self._stack[-1]
+      if el.childNodes and el.childNodes[-1].nodeType == el.TEXT_NODE:
+        el.childNodes[-1].data += text
+      else:
+        node = dom.Text()
+        node.data = text
+        node.ownerDocument = self.document
+        dom._append_child( el, node)
+
+
+
+def _split_name( name):
+  """splits name reported by expat into (namespace uri, local name, prefix)"""
+  parts = name.split( " ")
+  if len( parts) == 1:
+    return None, name, None
+  if len( parts) == 2:
+    return parts[0], parts[1], None
+  return parts
+
+
+
+def open_file( file_name):
+  """returns binary file object with the content of file_name,
+  gzipped files are uncompressed on the fly"""
+  f = open( file_name, "rb")
+  magic = f.read( 2)
+  f.seek( 0)
+  if magic == gzip_magic:
+    return gzip.GzipFile( fileobj=f, mode="rb")
+  return f
+
+
+
+def read_cdml( file_name):
+  """returns tuple (cdml element, namespace_ok) from a CDML or CD-SVG file.
+
+  namespace_ok is False when the cdml element was found in SVG only
+  without the CDML namespace. Raises cdml_read_error when the file cannot
+  be read or does not contain cdml data.
+  """
+  try:
+    f = open_file( file_name)
+  except IOError:
+    raise cdml_read_error( _("cannot open file ") + file_name)
+  parser = expat.ParserCreate( namespace_separator=" ")
+  parser.namespace_prefixes = True
+  parser.buffer_text = True
+  builder = cdml_builder()
+  builder.install( parser)
+  try:
+    parser.ParseFile( f)
+  except _cdml_found:
+    # the rest of the file is not interesting
+    return builder.cdml, True
+  except Exception:
+    raise cdml_read_error( _("error reading file"))
+  finally:
+    f.close()
+  if builder.fallback is not None:
+    return builder.fallback, False
+  raise cdml_read_error( _("cdml data are not present in SVG or are corrupted!"))
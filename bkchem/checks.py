@@ -35,7 +35,7 @@ def check_linear_fragments(paper):
   last_record = paper.um.get_last_record()
   for mol in paper.molecules:
     to_del = set()
-    fs = [f for f in mol.fragments if f.type == "linear_form"]
+    fs = mol.get_fragments_by_type( "linear_form")
     if fs and (last_record is None or last_record.object_changed(mol)):
       for f in fs:
         if mol.check_linear_form_fragment( f) == False:
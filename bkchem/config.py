@@ -25,6 +25,10 @@ current_CDML_version = '0.16'
 
 current_BKChem_version = '0.14.0-pre4'
 
+# documents with at least this many atoms are drawn lazily - only the
+# molecules in the visible part of the paper are drawn on load
+lazy_drawing_min_atoms = 2000
+
 
 
 # border width for all components of interface
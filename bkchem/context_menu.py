@@ -119,6 +119,9 @@ class context_menu( Tkinter.Menu):
       self.changes_made = 1
     else:
       if misc.set_attr_or_property( o, name, value):
+        # attributes without a setter do not flush the cached OASA data
+        if hasattr( o, '_flush_molecule_cache'):
+          o._flush_molecule_cache()
         o.redraw()
         self.changes_made = 1
 
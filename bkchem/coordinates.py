@@ -0,0 +1,100 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Batched coordinate transformations.
+
+coordinate_array keeps the x, y, z coordinates of a list of vertices in
+one contiguous block - a NumPy array when NumPy is available, array.array
+otherwise - so that a transformation is applied to all of them at once.
+"""
+
+import array
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+
+def affine_matrix( tr):
+  """returns the 3x4 matrix [[a,b,c,tx],[d,e,f,ty],[g,h,i,tz]] of an affine
+  transformation given by an object with the transform_xyz method
+  (both 2D and 3D oasa transforms are supported)"""
+  ox, oy, oz = tr.transform_xyz( 0, 0, 0)
+  cols = [[c-o for c, o in zip( tr.transform_xyz( *unit), (ox, oy, oz))]
+          for unit in ((1,0,0), (0,1,0), (0,0,1))]
+  return [[cols[0][i], cols[1][i], cols[2][i], (ox, oy, oz)[i]] for i in range( 3)]
+
+
+
+class coordinate_array(object):
+  """Coordinates of vertices stored in one block.
+
+  The coordinates are read from the vertices on creation, changed by
+  transform and written back by apply.
+  """
+  def __init__( self, vertices):
+    self.vertices = list( vertices)
+    flat = []
+    for v in self.vertices:
+      flat.extend( (v.x, v.y, v.z))
+    if numpy is not None:
+      self.data = numpy.array( flat, dtype=float).reshape( (-1, 3))
+    else:
+      self.data = array.array( 'd', flat)
+
+
+  def __len__( self):
+    return len( self.vertices)
+
+
+  def __iter__( self):
+    """yields (x, y, z) for each vertex"""
+    if numpy is not None:
+      for row in self.data.tolist():
+        yield tuple( row)
+    else:
+      d = self.data
+      for i in range( 0, len( d), 3):
+        yield d[i], d[i+1], d[i+2]
+
+
+  def transform( self, tr):
+    """applies the transformation tr to all the coordinates"""
+    m = affine_matrix( tr)
+    if numpy is not None:
+      if len( self.data):
+        m = numpy.array( m)
+        self.data = numpy.dot( self.data, m[:,:3].T) + m[:,3]
+      return
+    (a, b, c, tx), (d, e, f, ty), (g, h, i, tz) = m
+    data = self.data
+    for j in range( 0, len( data), 3):
+      x, y, z = data[j], data[j+1], data[j+2]
+      data[j] = a*x + b*y + c*z + tx
+      data[j+1] = d*x + e*y + f*z + ty
+      data[j+2] = g*x + h*y + i*z + tz
+
+
+  def apply( self, move_marks=True):
+    """moves the vertices to the stored coordinates"""
+    for v, (x, y, z) in zip( self.vertices, self):
+      v.move_to( x, y, dont_move_marks=not move_marks)
+      v.z = z
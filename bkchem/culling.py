@@ -0,0 +1,178 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Lazy drawing of the parts of the paper that are not visible.
+
+"""
+
+import contextlib
+import collections
+
+
+
+class viewport_culler(object):
+  """Keeps the molecules that were not drawn because they were outside
+  the visible part of the paper (enlarged by margin).
+
+  They are drawn when they get scrolled into view or when something
+  needs all of them drawn (selection of everything, global redraws).
+  Exporters get the whole document through fully_drawn. Only molecules
+  are culled - in big documents they make up almost all the canvas items
+  and they can be deleted from the canvas and drawn again without losing
+  anything; other top levels are always drawn.
+  """
+  margin = 200  # px
+
+  def __init__( self, paper):
+    self.paper = paper
+    self._pending = collections.OrderedDict()  # molecule -> estimated bbox
+
+
+  def __len__( self):
+    return len( self._pending)
+
+
+  def __contains__( self, o):
+    return o in self._pending
+
+
+  @staticmethod
+  def is_drawn( mol):
+    return any( a.item for a in mol.atoms)
+
+
+  @staticmethod
+  def estimate_bbox( mol):
+    """bbox of the atom centers, the labels are covered by the margin"""
+    xs = [a.x for a in mol.atoms]
+    ys = [a.y for a in mol.atoms]
+    return min( xs), min( ys), max( xs), max( ys)
+
+
+  def visible_area( self):
+    """returns the visible part of the paper enlarged by margin"""
+    p = self.paper
+    w, h = p.winfo_width(), p.winfo_height()
+    if w <= 1 or h <= 1:
+      # the window is not mapped yet
+      w, h = p.winfo_reqwidth(), p.winfo_reqheight()
+    m = self.margin
+    return p.canvasx( 0)-m, p.canvasy( 0)-m, p.canvasx( w)+m, p.canvasy( h)+m
+
+
+  def cull( self, mol):
+    """draws mol if it is visible, otherwise postpones its drawing;
+    returns True when it was drawn"""
+    if not mol.atoms:
+      return False
+    bbox = self.estimate_bbox( mol)
+    if _intersect( bbox, self.visible_area()):
+      self._draw( mol)
+      return True
+    self._pending[ mol] = bbox
+    return False
+
+
+  def get_bbox( self):
+    """returns bbox of all the postponed molecules or None"""
+    if not self._pending:
+      return None
+    bboxes = list( self._pending.values())
+    return (min( b[0] for b in bboxes) - self.margin,
+            min( b[1] for b in bboxes) - self.margin,
+            max( b[2] for b in bboxes) + self.margin,
+            max( b[3] for b in bboxes) + self.margin)
+
+
+  def draw_visible( self):
+    """draws the postponed molecules that got into the visible area"""
+    if self._pending:
+      area = self.visible_area()
+      self.draw_now( [o for o, bbox in self._pending.items() if _intersect( bbox, area)])
+
+
+  def draw_all( self):
+    """draws all the postponed molecules"""
+    self.draw_now( list( self._pending))
+
+
+  def draw_now( self, mols):
+    """draws those of mols that are postponed"""
+    drawn = 0
+    for mol in mols:
+      if mol in self._pending:
+        del self._pending[ mol]
+        # molecules removed from the paper in the meantime are forgotten
+        if mol in self.paper.stack and not self.is_drawn( mol):
+          self._draw( mol)
+          drawn = 1
+    if drawn:
+      self._restack()
+
+
+  def forget( self, mol):
+    self._pending.pop( mol, None)
+
+
+  def clear( self):
+    self._pending.clear()
+
+
+  @contextlib.contextmanager
+  def fully_drawn( self):
+    """draws the postponed molecules for the time of the with block,
+    their canvas items are deleted again at its end"""
+    temporary = [o for o in self._pending if o in self.paper.stack and not self.is_drawn( o)]
+    for mol in temporary:
+      self._draw( mol)
+    if temporary:
+      self._restack()
+    try:
+      yield
+    finally:
+      for mol in temporary:
+        if mol in self._pending:
+          self._undraw( mol)
+
+
+  def _draw( self, mol):
+    mol.draw( automatic="none")
+
+
+  def _undraw( self, mol):
+    for b in mol.bonds:
+      b.delete()
+    for a in mol.atoms:
+      # atom.delete deletes the marks for good
+      marks = a.marks
+      a.marks = set()
+      a.delete()
+      [m.delete() for m in marks]
+      a.marks = marks
+
+
+  def _restack( self):
+    # the new items are on top, the stacking order must be restored
+    [o.lift() for o in self.paper.stack]
+
+
+
+def _intersect( bbox1, bbox2):
+  return (bbox1[0] <= bbox2[2] and bbox2[0] <= bbox1[2] and
+          bbox1[1] <= bbox2[3] and bbox2[1] <= bbox1[3])
@@ -0,0 +1,210 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Backend neutral record of everything drawn on the paper.
+
+The paper records each canvas item (line, polygon, rectangle, oval or
+text) together with its coordinates, options and tags when an object
+draws it, and keeps the record up to date when the item is configured,
+moved or deleted. Exporters read the items from here instead of asking
+the Tk canvas about each of them.
+"""
+
+import misc
+
+from singleton_store import Screen
+
+
+
+# values of options not given when the item was created
+item_defaults = {'line': {'fill': 'black', 'width': '1.0', 'arrow': 'none', 'arrowshape': '8 10 3',
+                          'capstyle': 'butt', 'joinstyle': 'round', 'smooth': '0', 'dash': ''},
+                 'polygon': {'fill': 'black', 'outline': '', 'width': '1.0', 'joinstyle': 'round',
+                             'smooth': '0', 'dash': ''},
+                 'rectangle': {'fill': '', 'outline': 'black', 'width': '1.0', 'dash': ''},
+                 'oval': {'fill': '', 'outline': 'black', 'width': '1.0', 'dash': ''},
+                 'text': {'fill': 'black', 'font': 'Helvetica 12', 'anchor': 'center',
+                          'justify': 'left', 'text': '', 'width': '0'}}
+
+
+
+def to_px( value):
+  """converts a Tk screen distance (number or string with unit c, i, m or p) to pixels"""
+  if misc.myisstr( value):
+    value = value.strip()
+    if value[-1] in "cimp":
+      v = float( value[:-1])
+      return {'c': Screen.cm_to_px, 'i': Screen.in_to_px,
+              'm': Screen.mm_to_px, 'p': lambda x: Screen.in_to_px( x/72.0)}[ value[-1]]( v)
+  return float( value)
+
+
+def font_size( font):
+  """returns size of font given in any form Tk accepts - string,
+  tuple (family, size, style) or tkFont.Font"""
+  if misc.myisstr( font):
+    return int( font.split()[1])
+  elif isinstance( font, (list, tuple)):
+    return int( font[1])
+  return int( font.cget( 'size'))
+
+
+def flatten_coords( values, into=None):
+  """returns list of coordinates in pixels from the coordinates given
+  to a canvas method (numbers, pairs or lists of them)"""
+  if into is None:
+    into = []
+  for v in values:
+    if isinstance( v, (list, tuple)):
+      flatten_coords( v, into)
+    else:
+      into.append( to_px( v))
+  return into
+
+
+
+class display_item(object):
+  """One primitive - the type of a canvas item, its coordinates, options
+  (in the form returned by the Tk itemcget) and tags.
+
+  bbox is cached when known and forgotten whenever the item changes.
+  """
+  __slots__ = ('id', 'type', 'coords', 'options', 'tags', 'bbox')
+
+  def __init__( self, id, type, coords):
+    self.id = id
+    self.type = type
+    self.coords = coords
+    self.options = {}
+    self.tags = []
+    self.bbox = None
+
+
+  def get( self, option):
+    """returns value of option, the default when it was not set"""
+    if option == 'tags':
+      return " ".join( self.tags)
+    if option in self.options:
+      return self.options[ option]
+    return item_defaults[ self.type].get( option, '')
+
+
+  def configure( self, options):
+    for key, value in options.items():
+      if key == 'tags':
+        if misc.myisstr( value):
+          value = value.split()
+        self.tags = list( value)
+      elif key == 'width':
+        self.options[ key] = str( to_px( value))
+      elif key == 'smooth':
+        self.options[ key] = (value and value not in ('0', 'false')) and '1' or '0'
+      elif key == 'arrowshape' and not misc.myisstr( value):
+        self.options[ key] = " ".join( "%g" % v for v in value)
+      else:
+        self.options[ key] = value
+    self.bbox = None
+
+
+  def move( self, dx, dy):
+    self.coords = [c + (i % 2 and dy or dx) for i, c in enumerate( self.coords)]
+    self.bbox = None
+
+
+  def is_exported( self):
+    return 'no_export' not in self.tags
+
+
+
+class display_list(object):
+  """The display items of a canvas indexed by the canvas item id.
+
+  The stacking order is kept by the canvas, items() returns the display
+  items in the order given by the canvas find_all().
+  """
+  def __init__( self):
+    self._items = {}
+
+
+  def __len__( self):
+    return len( self._items)
+
+
+  def __contains__( self, item):
+    try:
+      return item in self._items
+    except TypeError:
+      # unhashable - a list of items
+      return False
+
+
+  def __getitem__( self, item):
+    return self._items[ item]
+
+
+  def get( self, item):
+    """returns display_item for the canvas item or None"""
+    return self._items.get( item)
+
+
+  def add( self, item, type, args, options):
+    """records a newly created canvas item, args and options are those
+    passed to the canvas create method"""
+    it = display_item( item, type, flatten_coords( args))
+    it.configure( options)
+    self._items[ item] = it
+    return it
+
+
+  def configure( self, item, options):
+    it = self._items.get( item)
+    if it:
+      it.configure( options)
+
+
+  def set_coords( self, item, args):
+    it = self._items.get( item)
+    if it:
+      it.coords = flatten_coords( args)
+      it.bbox = None
+
+
+  def move( self, item, dx, dy):
+    it = self._items.get( item)
+    if it:
+      it.move( dx, dy)
+
+
+  def remove( self, item):
+    self._items.pop( item, None)
+
+
+  def clear( self):
+    self._items.clear()
+
+
+  def items( self, order, exported_only=True):
+    """returns the display items of the canvas items in order (from the
+    bottom), without those tagged 'no_export' if exported_only is set"""
+    ret = []
+    for i in order:
+      it = self._items.get( i)
+      if it and (it.is_exported() or not exported_only):
+        ret.append( it)
+    return ret
@@ -27,6 +27,7 @@ import types
 import os.path
 import xml.dom.minidom as dom
 
+import startup
 import os_support
 import dom_extensions as dom_ext
 
@@ -53,46 +54,53 @@ class external_data_manager( object):
 
 
   def __init__( self):
-    self.records = {}
-    self.definitions = {}
+    self._records = {}
+    self._definitions = {}
+    self._pending = []
+
+
+  @property
+  def records(self):
+    """Data of objects by definition class.
+
+    """
+    self._load()
+    return self._records
+
+
+  @property
+  def definitions(self):
+    """Definitions of the data by definition class and object type.
+
+    """
+    self._load()
+    return self._definitions
 
 
   def load_available_definitions(self):
+    """registers the definition files, they are read on first use"""
     d = os_support.get_bkchem_private_dir()
     d = os.path.join(d, 'definitions')
     if not os.path.isdir(d):
-      return []
+      return
     for name in os.listdir(d):
       base, ext = os.path.splitext(name)
       if ext == ".xml":
-        self.read_data_definition(os.path.join(d, name))
+        self._pending.append( os.path.join(d, name))
 
-    return self.definitions.keys()
 
+  def _load( self):
+    while self._pending:
+      filename = self._pending.pop( 0)
+      with startup.timed( "definitions"):
+        self.read_data_definition( filename)
+    _definition_cache.save()
 
-  def read_data_definition( self, filename):
-    doc = dom.parse( filename)
-    root = doc.childNodes[0]
-    for ecls in dom_ext.simpleXPathSearch( root, "class"):
-      cls = ecls.getAttribute( 'name')
-      self.definitions[ cls] = {}
-      for eobj in dom_ext.simpleXPathSearch( ecls, "object"):
-        obj = eobj.getAttribute( 'type')
-        self.definitions[ cls][ obj] = {}
-        for evalue in dom_ext.simpleXPathSearch( eobj, "value"):
-          vname = evalue.getAttribute( 'name')
-          vtype = evalue.getAttribute( 'type')
-          # try to decode list style types
-          if vtype.startswith( "[") and vtype.endswith( "]"):
-            try:
-              vtype = eval( vtype)
-            except ValueError:
-              pass
-          text = dom_ext.getAllTextFromElement( dom_ext.getFirstChildNamed( evalue, "text"))
-          self.definitions[ cls][ obj][ vname] = {'type': vtype,
-                                                  'text': text }
 
-    self.records[ cls] = {}
+  def read_data_definition( self, filename):
+    for cls, objs in _definition_cache.get( filename, _read_data_definition):
+      self._definitions[ cls] = objs
+      self._records[ cls] = {}
 
 
   def get_definitions_for_class_and_type( self, def_class, item_type):
@@ -178,7 +186,7 @@ class external_data_manager( object):
 
 
   def get_package( self, doc):
-    if not self.records or sum( map( len, self.records.values())) == 0:
+    if not self._records or sum( map( len, self._records.values())) == 0:
       return None
     e = doc.createElement( 'external-data')
     for dclass in self.records:
@@ -225,6 +233,38 @@ class external_data_manager( object):
 
 
 
+_definition_cache = startup.file_cache( "definitions")
+
+
+def _read_data_definition( filename):
+  """returns list of (class name, definitions by object type) read from
+  the definition file"""
+  ret = []
+  doc = dom.parse( filename)
+  root = doc.childNodes[0]
+  for ecls in dom_ext.simpleXPathSearch( root, "class"):
+    cls = ecls.getAttribute( 'name')
+    objs = {}
+    for eobj in dom_ext.simpleXPathSearch( ecls, "object"):
+      obj = eobj.getAttribute( 'type')
+      objs[ obj] = {}
+      for evalue in dom_ext.simpleXPathSearch( eobj, "value"):
+        vname = evalue.getAttribute( 'name')
+        vtype = evalue.getAttribute( 'type')
+        # try to decode list style types
+        if vtype.startswith( "[") and vtype.endswith( "]"):
+          try:
+            vtype = eval( vtype)
+          except ValueError:
+            pass
+        text = dom_ext.getAllTextFromElement( dom_ext.getFirstChildNamed( evalue, "text"))
+        objs[ obj][ vname] = {'type': vtype,
+                              'text': text }
+    ret.append( (cls, objs))
+  return ret
+
+
+
 try:
   from tkinter import Entry
 except ImportError:
@@ -72,13 +72,8 @@ class fragment( simple_parent):
 
 
   def is_consistent(self, molecule):
-    for e in self.edges:
-      if e not in molecule.edges:
-        return False
-    for v in self.vertices:
-      if v not in molecule.vertices:
-        return False
-    return True
+    # molecule.vertices is a list, issubset converts it to a set only once
+    return self.edges.issubset( molecule.edges) and self.vertices.issubset( molecule.vertices)
 
 
   @property
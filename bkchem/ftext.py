@@ -29,6 +29,7 @@ i - italic
 import sys
 import copy
 import xml.sax
+import collections
 try:
   import tkinter.font as tkFont
 except ImportError:
@@ -54,8 +55,11 @@ class ftext(object):
       self.font = font
     else:
       self.font = tkFont.Font( family="Helvetica", size=12)
-    self._font_family = self.font.actual('family')
-    self._font_size = int( self.font.actual('size'))
+    actual = self.font.actual()
+    self._font_family = actual['family']
+    self._font_size = int( actual['size'])
+    self._metrics = get_font_metrics( self._font_family, self._font_size,
+                                      weight=actual.get( 'weight', 'normal'), slant=actual.get( 'slant', 'roman'))
     self.pos = pos
     self.fill = fill
     self.justify = justify
@@ -91,15 +95,15 @@ class ftext(object):
       last_attrs = ch.attrs
       bbox = self._draw_chunk( ch, scale=scale)
       if ch.newline_after:
-        self._current_y = bbox[3] + self.font.metrics()['linespace'] / 2.0
+        self._current_y = bbox[3] + self._metrics.metrics['linespace'] / 2.0
         self._current_x = self.x
 
     #does not work when 1. character is not regular
     if self.pos == 'center-first':
-      self.diff = self.font.measure( self.items[0].text[0])/2.0
+      self.diff = self._metrics.measure( self.items[0].text[0])/2.0
     elif self.pos == 'center-last':
       x1, y1, x2, y2 = self.bbox()
-      self.diff = x2 -x1 -self.font.measure( self.items[0].text[-1])/2.0 -2
+      self.diff = x2 -x1 -self._metrics.measure( self.items[0].text[-1])/2.0 -2
     self.move( -self.diff, 0)
     return self.bbox()
 
@@ -143,7 +147,16 @@ class ftext(object):
 
 
   def get_chunks( self):
-    text = self.sanitized_text()
+    """returns list of new text_chunk instances for self.text, the result
+    of parsing is cached for each text"""
+    parsed = _chunk_cache.get( self.text, self._parse_chunks)
+    return [text_chunk( text=text, attrs=set( attrs), newline_after=newline_after)
+            for text, attrs, newline_after in parsed]
+
+
+  def _parse_chunks( self, text):
+    """returns tuple of (text, attrs, newline_after) for each chunk of text"""
+    text = self.__class__.sanitize_text( text)
     # BytesIO expects byte string (called by xml.sax.parseString)
     if sys.version_info[0] > 2:
       if isinstance(text, str):
@@ -166,7 +179,7 @@ class ftext(object):
           chunks.append( new_ch)
       else:
         chunks.append( ch)
-    return chunks
+    return tuple( (ch.text, frozenset( ch.attrs), ch.newline_after) for ch in chunks)
 
 
   def bbox( self, complete=False):
@@ -239,6 +252,103 @@ class ftext(object):
 
 
 
+class lru_cache(object):
+  """Mapping of limited size which drops the least recently used values.
+
+  The number of hits and misses is recorded to allow checking how
+  efficient the cache is.
+  """
+  def __init__( self, size=1000):
+    self.size = size
+    self.hits = 0
+    self.misses = 0
+    self._data = collections.OrderedDict()
+
+
+  def __len__( self):
+    return len( self._data)
+
+
+  def get( self, key, compute):
+    """returns the value for key, compute( key) is called when not cached"""
+    try:
+      value = self._data.pop( key)
+    except KeyError:
+      self.misses += 1
+      value = compute( key)
+      if len( self._data) >= self.size:
+        self._data.popitem( last=False)
+    else:
+      self.hits += 1
+    self._data[ key] = value
+    return value
+
+
+  def clear( self):
+    self._data.clear()
+    self.hits = 0
+    self.misses = 0
+
+
+  def hit_rate( self):
+    total = self.hits + self.misses
+    return total and float( self.hits) / total or 0.0
+
+
+
+class font_metrics(object):
+  """Font with its metrics and text widths cached."""
+  def __init__( self, family, size, weight="normal", slant="roman"):
+    self.font = tkFont.Font( family=family, size=size, weight=weight, slant=slant)
+    self.metrics = dict( self.font.metrics())
+    self._widths = {}
+    self.hits = 0
+    self.misses = 0
+
+
+  def measure( self, text):
+    try:
+      w = self._widths[ text]
+    except KeyError:
+      self.misses += 1
+      w = self._widths[ text] = self.font.measure( text)
+    else:
+      self.hits += 1
+    return w
+
+
+  def measure_chunks( self, chunks):
+    """returns list of widths of the texts of chunks"""
+    return [self.measure( ch.text) for ch in chunks]
+
+
+
+_chunk_cache = lru_cache( size=2000)
+_font_cache = lru_cache( size=64)
+
+
+def get_font_metrics( family, size, weight="normal", slant="roman"):
+  """returns shared font_metrics instance for the font"""
+  return _font_cache.get( (family, size, weight, slant), lambda key: font_metrics( *key))
+
+
+def get_font( family, size):
+  """returns shared tkFont.Font instance, it must not be reconfigured"""
+  return get_font_metrics( family, size).font
+
+
+def cache_stats():
+  """returns dict with (hits, misses) for each of the caches"""
+  widths = [0, 0]
+  for f in _font_cache._data.values():
+    widths[0] += f.hits
+    widths[1] += f.misses
+  return {'chunks': (_chunk_cache.hits, _chunk_cache.misses),
+          'fonts': (_font_cache.hits, _font_cache.misses),
+          'widths': tuple( widths)}
+
+
+
 class text_chunk(object):
 
   def __init__( self, text, attrs=None, newline_after=False):
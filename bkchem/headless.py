@@ -0,0 +1,785 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Conversion of CDML and CD-SVG documents without Tk.
+
+headless_canvas is a pure python replacement of the parts of the Tk canvas
+used by BKChem objects and headless_paper combines it with chem_paper, so
+that documents are read and drawn by the same code as in the GUI. The
+resulting items are written by the usual exporters - xml_writer.SVG_writer
+and the cairo plugins.
+
+Library use (with the bkchem directory on sys.path):
+
+  import headless
+  headless.convert( "in.cdml", "out.png")
+  headless.convert_files( ["a.cdml", "b.svg"], "pdf", output_dir="out")
+
+From the command line:
+
+  bkchem -c FORMAT [-o DIR] [-j N] files_or_directories...
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import math
+import time
+import gettext
+
+if sys.version_info[0] > 2:
+  import builtins
+else:
+  import __builtin__ as builtins
+
+# the rest of BKChem expects the translation functions to be installed
+if '_' not in builtins.__dict__:
+  builtins.__dict__['_'] = lambda m: m
+  builtins.__dict__['ngettext'] = gettext.ngettext
+
+try:
+  import tkinter.font as tkFont
+except ImportError:
+  import tkFont
+
+try:
+  import cairo
+except ImportError:
+  cairo = None
+
+import oasa
+
+import misc
+import export
+import logger
+import os_support
+import cdml_reader
+import pref_manager
+import dom_extensions
+
+from paper import chem_paper
+from molecule import molecule
+from xml_writer import SVG_writer
+from display_list import display_list, item_defaults, to_px
+from id_manager import id_manager, id_strategies
+from singleton_store import Store, Screen
+
+
+
+class conversion_error(Exception):
+
+  def __init__( self, value):
+    self.value = value
+
+
+  def __str__( self):
+    return self.value
+
+
+
+## fonts
+
+# widths of Helvetica glyphs in 1/1000 of em, used when cairo is not available
+_helvetica_widths = dict( zip( u" !\"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~",
+                               (278,278,355,556,556,889,667,191,333,333,389,584,278,333,278,278,
+                                556,556,556,556,556,556,556,556,556,556,278,278,584,584,584,556,
+                                1015,667,667,722,722,667,611,778,722,278,500,667,556,833,722,778,
+                                667,778,722,667,611,722,667,944,667,667,611,278,278,278,469,556,
+                                333,556,556,500,556,556,278,556,556,222,222,500,222,833,556,556,
+                                556,556,333,500,278,556,500,722,500,500,500,334,260,334,584)))
+
+
+
+def _parse_font( font):
+  """converts Tk font description - a tuple (family, size, style) or its
+  string form - to a dict of font options"""
+  if misc.myisstr( font):
+    parts = []
+    rest = font.strip()
+    while rest:
+      if rest.startswith( "{"):
+        end = rest.find( "}")
+        parts.append( rest[1:end])
+        rest = rest[end+1:].strip()
+      else:
+        part = rest.split( None, 1)
+        parts.append( part[0])
+        rest = len( part) > 1 and part[1].strip() or ""
+  else:
+    parts = list( font)
+  ret = {}
+  if parts:
+    ret['family'] = parts[0]
+  if len( parts) > 1:
+    ret['size'] = int( parts[1])
+  for style in parts[2:]:
+    for word in (misc.myisstr( style) and style.split() or style):
+      if word == 'bold':
+        ret['weight'] = 'bold'
+      elif word == 'italic':
+        ret['slant'] = 'italic'
+      elif word in ('underline', 'overstrike'):
+        ret[ word] = 1
+  return ret
+
+
+
+class headless_font(object):
+  """Replacement of tkFont.Font that does not need a Tk root.
+
+  Metrics are taken from cairo when it is available, otherwise they are
+  approximated using Helvetica glyph widths.
+  """
+  def __init__( self, root=None, font=None, name=None, exists=False, **options):
+    self._options = {'family': 'Helvetica', 'size': 12, 'weight': 'normal', 'slant': 'roman',
+                     'underline': 0, 'overstrike': 0}
+    if font:
+      self._options.update( _parse_font( font))
+    self._options.update( options)
+    self._metrics = None
+
+
+  def actual( self, option=None):
+    if option:
+      return self._options[ option]
+    return dict( self._options)
+
+
+  def cget( self, option):
+    return self._options[ option]
+
+
+  def config( self, **options):
+    if options:
+      self._options.update( options)
+      self._metrics = None
+    else:
+      return dict( self._options)
+
+  configure = config
+
+
+  def pixel_size( self):
+    size = self._options['size']
+    if size < 0:
+      return float( -size)
+    return size * Screen.dpi / 72.0
+
+
+  def measure( self, text):
+    if cairo:
+      context = self._cairo_context()
+      return int( round( context.text_extents( text)[4]))
+    width = sum( _helvetica_widths.get( ch, 556) for ch in text)
+    if self._options['weight'] == 'bold':
+      width *= 1.07
+    return int( round( width * self.pixel_size() / 1000.0))
+
+
+  def metrics( self, *options):
+    if not self._metrics:
+      if cairo:
+        ascent, descent, height = self._cairo_context().font_extents()[:3]
+      else:
+        size = self.pixel_size()
+        ascent, descent = 0.905 * size, 0.212 * size
+        height = ascent + descent
+      self._metrics = {'ascent': int( math.ceil( ascent)),
+                       'descent': int( math.ceil( descent)),
+                       'linespace': int( math.ceil( height)),
+                       'fixed': 0}
+    if len( options) == 1:
+      return self._metrics[ options[0]]
+    return dict( self._metrics)
+
+
+  def _cairo_context( self):
+    context = cairo.Context( cairo.ImageSurface( cairo.FORMAT_ARGB32, 1, 1))
+    slant = self._options['slant'] == 'italic' and cairo.FONT_SLANT_ITALIC or cairo.FONT_SLANT_NORMAL
+    weight = self._options['weight'] == 'bold' and cairo.FONT_WEIGHT_BOLD or cairo.FONT_WEIGHT_NORMAL
+    context.select_font_face( self._options['family'], slant, weight)
+    context.set_font_size( self.pixel_size())
+    return context
+
+
+
+## canvas
+
+_named_colors = {'black': (0,0,0),
+                 'white': (255,255,255),
+                 'red': (255,0,0),
+                 'green': (0,255,0),
+                 'blue': (0,0,255),
+                 'cyan': (0,255,255),
+                 'magenta': (255,0,255),
+                 'yellow': (255,255,0),
+                 'orange': (255,165,0),
+                 'grey': (190,190,190),
+                 'gray': (190,190,190),
+                 'darkgrey': (169,169,169),
+                 'darkgray': (169,169,169),
+                 'lightgrey': (211,211,211),
+                 'lightgray': (211,211,211)}
+
+
+class headless_canvas(object):
+  """Display list with the interface of the Tk canvas used by BKChem.
+
+  Items are kept in a display_list together with their options and tags,
+  the stacking order is kept here, nothing is displayed. Event related
+  methods do nothing.
+  """
+  def __init__( self, **kw):
+    self.display_list = display_list()
+    self._z = {}       # item -> position in the stacking order
+    self._top = 0
+    self._bottom = 0
+    self._last_item = 0
+    self._config = dict( kw)
+
+
+  # unit conversion
+  def winfo_fpixels( self, value):
+    return to_px( value)
+
+
+  def winfo_rgb( self, color):
+    if color.startswith( "#"):
+      digits = color[1:]
+      n = len( digits) // 3
+      if n not in (1,2,3,4) or len( digits) != 3*n:
+        raise ValueError( "unknown color name %s" % color)
+      r, g, b = [int( digits[i*n:(i+1)*n], 16) for i in range( 3)]
+      scale = 65535 // (16**n - 1)
+      return r*scale, g*scale, b*scale
+    name = color.lower().replace( " ", "")
+    if name not in _named_colors:
+      raise ValueError( "unknown color name %s" % color)
+    return tuple( c*257 for c in _named_colors[ name])
+
+
+  def canvasx( self, x, gridspacing=None):
+    return x
+
+  canvasy = canvasx
+
+
+  # configuration of the canvas itself
+  def config( self, cnf=None, **kw):
+    if cnf:
+      self._config.update( cnf)
+    self._config.update( kw)
+
+  configure = config
+
+
+  def cget( self, key):
+    return self._config.get( key, '')
+
+
+  # events and widget management
+  def _ignore( self, *args, **kw):
+    pass
+
+  bind = unbind = tag_bind = tag_unbind = event_generate = focus_set = _ignore
+  update = update_idletasks = grid = pack = _ignore
+  after_idle = after_cancel = _ignore
+
+
+  # item creation
+  def _create( self, type, args, kw):
+    self._last_item += 1
+    item = self._last_item
+    self.display_list.add( item, type, args, kw)
+    self._top += 1
+    self._z[ item] = self._top
+    return item
+
+
+  def create_line( self, *args, **kw):
+    return self._create( 'line', args, kw)
+
+
+  def create_polygon( self, *args, **kw):
+    return self._create( 'polygon', args, kw)
+
+
+  def create_rectangle( self, *args, **kw):
+    return self._create( 'rectangle', args, kw)
+
+
+  def create_oval( self, *args, **kw):
+    return self._create( 'oval', args, kw)
+
+
+  def create_text( self, *args, **kw):
+    return self._create( 'text', args, kw)
+
+
+  # item configuration
+  def itemconfig( self, tag_or_id, cnf=None, **kw):
+    items = self.find_withtag( tag_or_id)
+    if isinstance( cnf, dict):
+      kw.update( cnf)
+    elif cnf is not None:
+      # query of one option, in the form returned by Tk
+      return items and self._option_info( items[0], cnf) or None
+    if not kw:
+      if not items:
+        return {}
+      item = self.display_list[ items[0]]
+      names = set( item_defaults[ item.type]) | set( item.options) | set( ['tags'])
+      return dict( (name, self._option_info( items[0], name)) for name in names)
+    for item in items:
+      self.display_list.configure( item, kw)
+
+  itemconfigure = itemconfig
+
+
+  def _option_info( self, item, option):
+    """returns (name, dbname, dbclass, default, value) of option as Tk does"""
+    item = self.display_list[ item]
+    default = item_defaults[ item.type].get( option, '')
+    return (option, '', '', default, item.get( option))
+
+
+  def itemcget( self, tag_or_id, option):
+    items = self.find_withtag( tag_or_id)
+    if not items:
+      return ''
+    return self.display_list[ items[0]].get( option)
+
+
+  def type( self, tag_or_id):
+    items = self.find_withtag( tag_or_id)
+    return items and self.display_list[ items[0]].type or None
+
+
+  # tags
+  def gettags( self, tag_or_id):
+    items = self.find_withtag( tag_or_id)
+    return items and tuple( self.display_list[ items[0]].tags) or ()
+
+
+  def addtag_withtag( self, newtag, tag_or_id):
+    for item in self.find_withtag( tag_or_id):
+      tags = self.display_list[ item].tags
+      if newtag not in tags:
+        tags.append( newtag)
+
+
+  def dtag( self, tag_or_id, tag_to_delete=None):
+    if tag_to_delete is None:
+      tag_to_delete = tag_or_id
+    for item in self.find_withtag( tag_or_id):
+      tags = self.display_list[ item].tags
+      if tag_to_delete in tags:
+        tags.remove( tag_to_delete)
+
+
+  # searching
+  def find_all( self):
+    return tuple( sorted( self._z, key=self._z.get))
+
+
+  def find_withtag( self, tag_or_id):
+    if tag_or_id in self._z:
+      return (tag_or_id,)
+    if tag_or_id == 'all':
+      return self.find_all()
+    if not misc.myisstr( tag_or_id):
+      return ()
+    return tuple( i for i in self.find_all() if tag_or_id in self.display_list[ i].tags)
+
+
+  def find_overlapping( self, x1, y1, x2, y2):
+    ret = []
+    for item in self.find_all():
+      bx1, by1, bx2, by2 = self.bbox( item)
+      if bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+        ret.append( item)
+    return tuple( ret)
+
+
+  def find_enclosed( self, x1, y1, x2, y2):
+    ret = []
+    for item in self.find_all():
+      bx1, by1, bx2, by2 = self.bbox( item)
+      if bx1 >= x1 and bx2 <= x2 and by1 >= y1 and by2 <= y2:
+        ret.append( item)
+    return tuple( ret)
+
+
+  # geometry
+  def coords( self, tag_or_id, *args):
+    items = self.find_withtag( tag_or_id)
+    if not items:
+      return []
+    if args:
+      self.display_list.set_coords( items[0], args)
+    return list( self.display_list[ items[0]].coords)
+
+
+  def move( self, tag_or_id, dx, dy):
+    for item in self.find_withtag( tag_or_id):
+      self.display_list.move( item, dx, dy)
+
+
+  def bbox( self, *args):
+    boxes = []
+    for tag_or_id in args:
+      boxes.extend( [self._item_bbox( i) for i in self.find_withtag( tag_or_id)])
+    if not boxes:
+      return None
+    return (min( b[0] for b in boxes), min( b[1] for b in boxes),
+            max( b[2] for b in boxes), max( b[3] for b in boxes))
+
+
+  def _item_bbox( self, item):
+    it = self.display_list[ item]
+    if it.bbox is None:
+      it.bbox = self._compute_item_bbox( it)
+    return it.bbox
+
+
+  def _compute_item_bbox( self, it):
+    type, coords, opts = it.type, it.coords, it.options
+    if type == 'text':
+      x, y = coords[:2]
+      font = headless_font( font=it.get( 'font'))
+      lines = misc.myisstr( opts.get( 'text')) and opts['text'].split( "\n") or [u"%s" % opts.get( 'text', '')]
+      w = max( font.measure( line) for line in lines)
+      h = len( lines) * font.metrics( 'linespace')
+      anchor = it.get( 'anchor')
+      x1 = x - ('w' in anchor and 0 or 'e' in anchor and w or w/2.0)
+      y1 = y - ('n' in anchor and 0 or 's' in anchor and h or h/2.0)
+      x2, y2 = x1+w, y1+h
+    else:
+      xs = coords[0::2]
+      ys = coords[1::2]
+      x1, y1, x2, y2 = min( xs), min( ys), max( xs), max( ys)
+      if type == 'line' or it.get( 'outline'):
+        w = float( it.get( 'width')) / 2.0
+        x1, y1, x2, y2 = x1-w, y1-w, x2+w, y2+w
+    return (int( math.floor( x1)), int( math.floor( y1)),
+            int( math.ceil( x2)), int( math.ceil( y2)))
+
+
+  # deleting and stacking
+  def delete( self, *args):
+    for tag_or_id in args:
+      for item in self.find_withtag( tag_or_id):
+        self.display_list.remove( item)
+        del self._z[ item]
+
+
+  def tag_raise( self, tag_or_id, above=None):
+    items = self.find_withtag( tag_or_id)
+    if above is None:
+      for item in items:
+        self._top += 1
+        self._z[ item] = self._top
+    else:
+      self._restack( items, self.find_withtag( above)[-1:], after=True)
+
+  lift = tkraise = tag_raise
+
+
+  def tag_lower( self, tag_or_id, below=None):
+    items = self.find_withtag( tag_or_id)
+    if below is None:
+      for item in reversed( items):
+        self._bottom -= 1
+        self._z[ item] = self._bottom
+    else:
+      self._restack( items, self.find_withtag( below)[:1], after=False)
+
+  lower = tag_lower
+
+
+  def _restack( self, items, reference, after=True):
+    if not reference or reference[0] in items:
+      return
+    order = [i for i in self.find_all() if i not in items]
+    pos = order.index( reference[0]) + (after and 1 or 0)
+    order[pos:pos] = list( items)
+    self._bottom = 0
+    for i, item in enumerate( order):
+      self._z[ item] = i
+    self._top = len( order)
+
+
+
+## paper
+
+class headless_paper(headless_canvas, chem_paper):
+  """chem_paper drawing to a headless_canvas"""
+
+  def __init__( self, file_name={}):
+    headless_canvas.__init__( self)
+    self.init_paper( file_name=file_name)
+    self._default_standard = self.standard
+
+
+  def _index_item( self, item):
+    # there is no interaction, hit testing is not needed
+    pass
+
+
+  def reset( self):
+    """prepares the paper for a new document"""
+    self.clean_paper()
+    self.onread_id_sandbox_cancel()
+    # clean_paper forgets only the ids of the top levels, a new id_manager
+    # drops the rest and makes the ids of a file independent of the files
+    # converted before it
+    Store.id_manager = Store.id_manager.new_sandbox()
+    self.standard = self._default_standard
+    self._cropping_bbox = None
+    self.set_default_paper_properties()
+
+
+
+class headless_app(object):
+  """Stand-in for the application object in Store.app"""
+
+  in_batch_mode = 1
+
+  def __init__( self):
+    self.paper = None
+    self.mode = 'draw'
+
+
+  def update_status( self, message, time=4):
+    pass
+
+
+
+## library interface
+
+def init( dpi=96):
+  """sets up the singletons needed for reading and drawing without Tk"""
+  if isinstance( Store.app, headless_app):
+    return Store.app
+  Screen.dpi = dpi
+  # all fonts are created through tkFont.Font, we replace it with a version
+  # which does not need a Tk root
+  tkFont.Font = headless_font
+  oasa.config.Config.molecule_class = molecule
+  if not Store.pm:
+    Store.pm = pref_manager.pref_manager(
+      [os_support.get_config_filename( "prefs.xml", level="global", mode='r'),
+       os_support.get_config_filename( "prefs.xml", level="personal", mode='r')])
+  Store.logger = logger.logger()
+  Store.logger.handling = logger.batch_mode
+  Store.log = Store.logger.log
+  strategy = id_strategies.get( Store.pm.get_preference( "id_allocation"), id_strategies['sequential'])
+  Store.id_manager = id_manager( strategy=strategy())
+  Store.app = headless_app()
+  Store.app.paper = headless_paper()
+  return Store.app
+
+
+def read_cdml( file_name):
+  """returns the cdml element from a CDML or CD-SVG file, gzipped or not"""
+  try:
+    doc, namespace_ok = cdml_reader.read_cdml( file_name)
+  except cdml_reader.cdml_read_error as e:
+    raise conversion_error( e.value)
+  return doc
+
+
+def load( file_name):
+  """reads the file into the headless paper and returns the paper"""
+  paper = init().paper
+  paper.reset()
+  try:
+    paper.read_package( read_cdml( file_name))
+  except Exception:
+    # no half read document or sandboxed ids are left for the next file
+    paper.reset()
+    raise
+  paper.file_name = {'name': os.path.basename( file_name),
+                     'dir': os.path.dirname( os.path.abspath( file_name)),
+                     'auto': 0}
+  return paper
+
+
+def _write_svg( paper, file_name):
+  exporter = SVG_writer( paper)
+  exporter.construct_dom_tree( paper.top_levels)
+  dom_extensions.safe_indent( exporter.document.childNodes[0])
+  with open( file_name, "wb") as f:
+    f.write( exporter.document.toxml( 'utf-8'))
+
+
+def _write_with_plugin( plugin_name):
+  def write( paper, file_name):
+    try:
+      plugin = __import__( "plugins."+plugin_name, globals(), locals(), [plugin_name])
+    except ImportError:
+      raise conversion_error( _("the %s format needs the cairo library") % plugin_name.split( "_")[0])
+    exporter = plugin.exporter( paper)
+    exporter.interactive = False
+    if not exporter.on_begin():
+      raise conversion_error( _("there is nothing to export"))
+    exporter.write_to_file( file_name)
+  return write
+
+
+# format -> (extension, writer)
+formats = {'svg': ('.svg', _write_svg),
+           'cd-svg': ('.svg', lambda paper, name: export.export_CD_SVG( paper, name)),
+           'cdml': ('.cdml', lambda paper, name: export.export_CDML( paper, name)),
+           'png': ('.png', _write_with_plugin( 'png_cairo')),
+           'pdf': ('.pdf', _write_with_plugin( 'pdf_cairo'))}
+
+# extensions of files picked from directories given as input
+input_extensions = ('.cdml', '.cdgz', '.svg', '.svgz')
+
+
+def convert( input_name, output_name, format=None):
+  """converts one file, the format is guessed from the output_name if not given"""
+  if not format:
+    format = os.path.splitext( output_name)[1][1:].lower()
+  if format not in formats:
+    raise conversion_error( _("unknown output format %s") % format)
+  if os.path.abspath( output_name) == os.path.abspath( input_name):
+    raise conversion_error( _("the output would overwrite the input file"))
+  paper = load( input_name)
+  formats[ format][1]( paper, output_name)
+
+
+def get_output_name( input_name, format, output_dir=None):
+  """returns the name of the file input_name is converted to"""
+  base = os.path.splitext( os.path.basename( input_name))[0]
+  return os.path.join( output_dir or os.path.dirname( input_name), base + formats[ format][0])
+
+
+def expand_inputs( names):
+  """returns list of files with directories in names replaced by the
+  BKChem documents they contain"""
+  ret = []
+  for name in names:
+    if os.path.isdir( name):
+      ret.extend( sorted( os.path.join( name, f) for f in os.listdir( name)
+                          if os.path.splitext( f)[1].lower() in input_extensions))
+    else:
+      ret.append( name)
+  return ret
+
+
+def _convert_one( job):
+  input_name, out, format = job
+  try:
+    convert( input_name, out, format=format)
+    return input_name, out, None
+  except Exception as e:
+    if isinstance( Store.app, headless_app):
+      # the failed document is dropped together with its ids
+      Store.app.paper.reset()
+    return input_name, out, str( e)
+
+
+def _init_worker( dpi):
+  init( dpi=dpi)
+
+
+def convert_files( file_names, format, output_dir=None, processes=1):
+  """converts all the files to format, output files are named after the
+  input ones and placed to output_dir or next to the input.
+
+  Yields (input_name, output_name, error) for each file as soon as it is
+  done, error is None for successful conversions. When processes is not 1
+  the files are converted by a pool of that many worker processes (None
+  means one per CPU), each of them with its own paper and singletons; the
+  results then come in the order of completion."""
+  if format not in formats:
+    raise conversion_error( _("unknown output format %s") % format)
+  jobs = [(name, get_output_name( name, format, output_dir), format) for name in file_names]
+  if processes == 1 or len( jobs) < 2:
+    return (_convert_one( job) for job in jobs)
+  return _convert_in_pool( jobs, processes)
+
+
+def _convert_in_pool( jobs, processes):
+  import multiprocessing
+  processes = min( processes or multiprocessing.cpu_count(), len( jobs))
+  # bigger chunks save on communication, but should not starve the workers at the end
+  chunksize = max( 1, min( 32, len( jobs) // (4*processes)))
+  try:
+    # forked workers do not import the main module again, with spawn they
+    # would import it (bkchem.py takes care not to start Tk then)
+    context = multiprocessing.get_context( "fork")
+  except (AttributeError, ValueError):
+    # python 2 always forks on posix, windows can only spawn
+    context = multiprocessing
+  pool = context.Pool( processes, _init_worker, (Screen.dpi or 96,))
+  try:
+    for result in pool.imap_unordered( _convert_one, jobs, chunksize):
+      yield result
+  finally:
+    pool.terminate()
+    pool.join()
+
+
+def main( argv):
+  """command line interface, argv are the arguments without the program name;
+  returns the exit status"""
+  args = [misc.myisstr( a) and a or a.decode( sys.getfilesystemencoding() or "utf-8") for a in argv]
+  format = None
+  output_dir = None
+  processes = None
+  files = []
+  while args:
+    a = args.pop( 0)
+    if a in ("-c", "--convert") and args:
+      format = args.pop( 0).lower()
+    elif a == "-o" and args:
+      output_dir = args.pop( 0)
+    elif a == "-j" and args:
+      processes = int( args.pop( 0)) or None
+    elif a == "-H" and args:
+      os_support.set_bkchem_private_dir( args.pop( 0))
+    else:
+      files.append( a)
+  if format not in formats:
+    print( _("unknown output format %s, use one of: %s") % (format, ", ".join( sorted( formats))), file=sys.stderr)
+    return 2
+  files = expand_inputs( files)
+  if not files:
+    print( _("no files to convert"), file=sys.stderr)
+    return 2
+  if output_dir and not os.path.isdir( output_dir):
+    os.makedirs( output_dir)
+  failed = 0
+  start = time.time()
+  for name, out, error in convert_files( files, format, output_dir=output_dir, processes=processes):
+    if error:
+      failed += 1
+      print( "%s: %s" % (name, error), file=sys.stderr)
+    else:
+      print( "%s -> %s" % (name, out))
+    sys.stdout.flush()
+  elapsed = max( time.time() - start, 1e-6)
+  print( _("%d files converted, %d failed in %.1f s (%.1f files/s)") % (len( files)-failed, failed, elapsed, len( files)/elapsed),
+         file=sys.stderr)
+  return failed and 1 or 0
@@ -19,17 +19,31 @@
 
 """Here is the http server that server data from application on demand.
 
+Every request is handled in its own thread. Tk may only be used from the
+thread running the mainloop, therefore all access to the application is
+passed to it through tk_dispatcher. Rendered content (SVG, PNG, SMILES)
+is kept in memory until the revision of the paper changes.
 """
 
 from __future__ import print_function
 
+import io
 import time
-import string
 import os.path
-import urlparse
-import BaseHTTPServer
+import threading
 import xml.dom.minidom as dom
 
+try:
+  import queue
+  from urllib.parse import urlparse
+  from socketserver import ThreadingMixIn
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+  import Queue as queue
+  from urlparse import urlparse
+  from SocketServer import ThreadingMixIn
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
 import xml_writer
 import oasa_bridge
 import xml_serializer
@@ -38,22 +52,22 @@ from singleton_store import Store
 
 
 
-class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
+class bkchem_http_handler( BaseHTTPRequestHandler):
 
   dirs = ('smiles','inchi','gtml','images')
 
   def __init__( self, *args):
-    BaseHTTPServer.BaseHTTPRequestHandler.__init__( self, *args)
+    BaseHTTPRequestHandler.__init__( self, *args)
 
 
   def do_GET_fallback( self):
-    protocol, address, path, parameters, query, fragment = urlparse.urlparse( self.path)
-    path_list = filter( None, path.split("/"))
+    protocol, address, path, parameters, query, fragment = urlparse( self.path)
+    path_list = [p for p in path.split("/") if p]
 
     if len( path_list) == 1 or path_list[0] not in self.dirs:
       # these are static pages
-      path = string.replace( path, ".", "_")
-      path = string.replace( path, "/", "__")
+      path = path.replace( ".", "_")
+      path = path.replace( "/", "__")
       method = 'serve' + path
 
       if method in self.__class__.__dict__:
@@ -67,31 +81,15 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
 
   def serve__content_xml( self):
     t = time.time()
-    self.send_response( 200)
-    self.send_header("Content-Type", "text/xml")
-    self.end_headers()
-
-    doc = dom.Document()
-    xml_serializer.serialize( Store.app.paper, doc, doc)
-    self.wfile.write(doc.toxml('utf-8'))
+    self._serve_data( self.server.render( 'xml', self._render_xml), "text/xml")
     print("%.2f ms" % (1000*(time.time() - t)))
 
 
   def serve__content_svg( self):
-    self.send_response( 200)
-    self.send_header("Content-Type", "image/svg+xml")
-    self.end_headers()
-
-    exporter = xml_writer.SVG_writer( Store.app.paper)
-    exporter.construct_dom_tree( Store.app.paper.top_levels)
-    self.wfile.write(exporter.document.toxml('utf-8'))
+    self._serve_data( self.server.render( 'svg', self._render_svg), "image/svg+xml")
 
 
   def serve__content_html( self):
-    self.send_response( 200)
-    self.send_header("Content-Type", "text/html")
-    self.end_headers()
-
     result = '''
     <html>
     <head>
@@ -135,36 +133,30 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
     </body>
     </html>
     ''' % {'smiles': self._get_all_smiles()}
-    self.wfile.write( result)
+    self._serve_data( result, "text/html")
 
 
   def serve__content_png( self):
-    Store.app.plugin_export( "PNG (Cairo)", filename="http_temp.png", interactive=False)
-    self._serve_file( "http_temp.png", "image/png")
+    data = self.server.render( 'png', self._render_png)
+    if data:
+      self._serve_data( data, "image/png")
+    else:
+      self.return_error()
 
 
   def servedir_smiles( self, path_list):
     if not len( path_list) == 1:
       self.return_error()
     else:
-      Store.app.paper.clean_paper()
-      Store.app.paper.create_background()
-      Store.app.read_smiles( path_list[0])
-      self.serve__content_svg()
+      self._serve_replaced( Store.app.read_smiles, path_list[0])
 
 
   def servedir_inchi( self, path_list):
-    Store.app.paper.clean_paper()
-    Store.app.paper.create_background()
-    Store.app.read_inchi( '/'.join( path_list))
-    self.serve__content_svg()
+    self._serve_replaced( Store.app.read_inchi, '/'.join( path_list))
 
 
   def servedir_gtml( self, path_list):
-    Store.app.paper.clean_paper()
-    Store.app.paper.create_background()
-    Store.app.plugin_import( 'GTML', '/'.join( path_list))
-    self.serve__content_svg()
+    self._serve_replaced( Store.app.plugin_import, 'GTML', '/'.join( path_list))
 
 
   def servedir_images( self, path_list):
@@ -180,17 +172,17 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
     self.send_header("Content-Type", "text/html")
     self.end_headers()
 
-    self.wfile.write("<html><body><h1>Bad request</h1><p>This address does not exist</p></body></html>")
+    self.wfile.write(b"<html><body><h1>Bad request</h1><p>This address does not exist</p></body></html>")
 
 
   def do_GET( self):
-    protocol, address, path, parameters, query, fragment = urlparse.urlparse( self.path)
+    protocol, address, path, parameters, query, fragment = urlparse( self.path)
     if path == "/" or path == "content.html":
       attrs = self._get_attrs( query)
       if "action" in attrs:
         method = "_action_"+attrs['action']
         if hasattr( self, method):
-          getattr( self, method)( attrs)
+          self.server.call( getattr( self, method), attrs)
           smiles = self._get_all_smiles()
           #smiles = "SMILES not available"
           self._serve_xml( "<smiles>%s</smiles>" % smiles)
@@ -201,6 +193,7 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
       self.do_GET_fallback()
 
 
+  # the following methods are run in the Tk thread
   def _action_click( self, attrs):
     x = float( attrs['x'])-8
     y = float( attrs['y'])-9
@@ -237,22 +230,67 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
     Store.app.mode.set_submode( attrs['temp'])
 
 
-  def _serve_xml( self, text):
-    self.send_response( 200)
-    self.send_header("Content-Type", "text/xml")
-    self.end_headers()
+  def _replace_content( self, reader, *args):
+    Store.app.paper.clean_paper()
+    Store.app.paper.create_background()
+    reader( *args)
 
-    self.wfile.write( text)
 
+  def _render_xml( self):
+    doc = dom.Document()
+    xml_serializer.serialize( Store.app.paper, doc, doc)
+    return doc.toxml('utf-8')
 
-  def _serve_file( self, filename, content_type="image/png"):
+
+  def _render_svg( self):
+    exporter = xml_writer.SVG_writer( Store.app.paper)
+    exporter.construct_dom_tree( Store.app.paper.top_levels)
+    return exporter.document.toxml('utf-8')
+
+
+  def _render_png( self):
+    plugin = Store.app.plugins.get( "PNG (Cairo)")
+    if not plugin:
+      return b""
+    exporter = plugin.exporter( Store.app.paper)
+    exporter.interactive = False
+    with Store.app.paper.prepared_for_export():
+      if not exporter.on_begin():
+        return b""
+      f = io.BytesIO()
+      exporter.write_to_file( f)
+    return f.getvalue()
+
+
+  def _render_smiles( self):
+    return ", ".join( [oasa_bridge.mol_to_smiles( m) for m in Store.app.paper.molecules])
+
+
+  # helpers
+  def _serve_replaced( self, reader, *args):
+    """replaces the content by what reader(*args) reads and serves it as SVG"""
+    data = self.server.call_and_render( 'svg', self._render_svg, self._replace_content, reader, *args)
+    self._serve_data( data, "image/svg+xml")
+
+
+  def _serve_xml( self, text):
+    self._serve_data( text, "text/xml")
+
+
+  def _serve_data( self, data, content_type):
+    if not isinstance( data, bytes):
+      data = data.encode( 'utf-8')
     self.send_response( 200)
     self.send_header("Content-Type", content_type)
+    self.send_header("Content-Length", str( len( data)))
     self.end_headers()
 
-    f = file( filename, "rb")
-    self.wfile.write( f.read())
-    f.close()
+    self.wfile.write( data)
+
+
+  def _serve_file( self, filename, content_type="image/png"):
+    with open( filename, "rb") as f:
+      self._serve_data( f.read(), content_type)
 
 
   def _get_attrs( self, query):
@@ -266,11 +304,7 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
 
 
   def _get_all_smiles( self):
-    sms = []
-    for m in Store.app.paper.molecules:
-      sms.append( oasa_bridge.mol_to_smiles( m))
-    smiles = ", ".join( sms)
-    return smiles
+    return self.server.render( 'smiles', self._render_smiles)
 
 
   # LOGGING
@@ -287,10 +321,141 @@ class bkchem_http_handler( BaseHTTPServer.BaseHTTPRequestHandler):
 
 
 
-class bkchem_http_server( BaseHTTPServer.HTTPServer):
+class bkchem_http_server( ThreadingMixIn, HTTPServer):
+  """Serves every request in a separate thread.
+
+  Must be created in the Tk thread, the application is then only touched
+  from there (see tk_dispatcher).
+  """
+  daemon_threads = True
+
+  def __init__( self, server_address, handler_class, app=None):
+    HTTPServer.__init__( self, server_address, handler_class)
+    self.app = app or Store.app
+    self.dispatcher = tk_dispatcher( self.app)
+    self.cache = render_cache()
+
+
+  def get_revision( self):
+    paper = self.app.paper
+    return id( paper), paper.revision
+
+
+  def render( self, key, function):
+    """returns the result of function() for the current state of the paper,
+    function is run in the Tk thread and only when the cached value is outdated"""
+    value = self.cache.get( self.get_revision(), key)
+    if value is None:
+      value = self.dispatcher.call( self._render, key, function)
+    return value
+
+
+  def _render( self, key, function):
+    revision = self.get_revision()
+    # another request could have rendered it while we were waiting
+    value = self.cache.get( revision, key)
+    if value is None:
+      value = function()
+      self.cache.put( revision, key, value)
+    return value
+
+
+  def call( self, function, *args):
+    """calls function changing the application in the Tk thread"""
+    return self.dispatcher.call( self._call, function, args)
+
+
+  def _call( self, function, args):
+    # the cache is cleared in the Tk thread too, before any other request
+    # can render the changed paper
+    try:
+      return function( *args)
+    finally:
+      self.cache.clear()
+
+
+  def call_and_render( self, key, render, function, *args):
+    """calls function changing the application and returns render() of the
+    result. Both run in one call in the Tk thread, so that other requests
+    cannot change the paper in between"""
+    return self.dispatcher.call( self._call_and_render, key, render, function, args)
 
-  def __init__( self, *args):
-    BaseHTTPServer.HTTPServer.__init__( self, *args)
+
+  def _call_and_render( self, key, render, function, args):
+    self._call( function, args)
+    return self._render( key, render)
+
+
+
+class tk_dispatcher(object):
+  """Runs functions in the Tk thread on behalf of other threads.
+
+  The calls are put into a queue which is polled from the Tk mainloop.
+  """
+  def __init__( self, widget, interval=20):
+    self.widget = widget
+    self.interval = interval
+    self._queue = queue.Queue()
+    self._thread = threading.current_thread()
+    self.widget.after( self.interval, self._poll)
+
+
+  def call( self, function, *args, **kw):
+    """calls function in the Tk thread, waits for it and returns its result"""
+    if threading.current_thread() is self._thread:
+      return function( *args, **kw)
+    done = threading.Event()
+    result = {}
+    self._queue.put( (function, args, kw, done, result))
+    done.wait()
+    if 'error' in result:
+      raise result['error']
+    return result['value']
+
+
+  def _poll( self):
+    while True:
+      try:
+        function, args, kw, done, result = self._queue.get_nowait()
+      except queue.Empty:
+        break
+      try:
+        result['value'] = function( *args, **kw)
+      except Exception as e:
+        result['error'] = e
+      done.set()
+    self.widget.after( self.interval, self._poll)
+
+
+
+class render_cache(object):
+  """Rendered data valid for one revision of the paper, thread safe."""
+
+  def __init__( self):
+    self._lock = threading.Lock()
+    self._revision = None
+    self._data = {}
+
+
+  def get( self, revision, key):
+    with self._lock:
+      if revision == self._revision:
+        return self._data.get( key)
+      return None
+
+
+  def put( self, revision, key, value):
+    with self._lock:
+      if revision != self._revision:
+        self._revision = revision
+        self._data = {}
+      self._data[ key] = value
+
+
+  def clear( self):
+    with self._lock:
+      self._revision = None
+      self._data = {}
 
 
 
@@ -299,4 +464,3 @@ class Event(object):
   def __init__( self, x, y):
     self.x = x
     self.y = y
-
@@ -22,40 +22,162 @@ from warnings import warn
 
 
 
-class id_manager(object):
+class id_registry(object):
+  """Bidirectional mapping between ids and objects.
 
+  Lookups are O(1) in both directions. One object may be registered
+  under several ids (as is the case for canvas items), each id belongs
+  to exactly one object.
+  """
   def __init__(self):
-    self.id_map = {}
+    self._id_2_object = {}
+    self._object_2_ids = {}
+
+
+  def __len__(self):
+    return len(self._id_2_object)
+
+
+  def __contains__(self, Id):
+    return Id in self._id_2_object
+
+
+  def register(self, Id, obj):
+    if Id in self._id_2_object:
+      self.unregister(Id)
+    self._id_2_object[Id] = obj
+    self._object_2_ids.setdefault(obj, []).append(Id)
+
+
+  def unregister(self, Id):
+    """removes Id and returns the object it belonged to, raises KeyError for unknown ids"""
+    obj = self._id_2_object.pop(Id)
+    ids = self._object_2_ids[obj]
+    ids.remove(Id)
+    if not ids:
+      del self._object_2_ids[obj]
+    return obj
+
+
+  def get_object(self, Id, default=None):
+    return self._id_2_object.get(Id, default)
+
+
+  def get_id(self, obj):
+    """returns the first id registered for obj or None"""
+    ids = self._object_2_ids.get(obj)
+    if ids:
+      return ids[0]
+    return None
+
+
+  def get_ids(self, obj):
+    return list(self._object_2_ids.get(obj, ()))
+
+
+  def has_object(self, obj):
+    return obj in self._object_2_ids
+
+
+  def clear(self):
+    self._id_2_object.clear()
+    self._object_2_ids.clear()
+
+
+
+##-------------------- ID ALLOCATION STRATEGIES --------------------
+
+class random_ids(object):
+  """Draws random numbers until an unused id is found (the historical behavior)."""
+  keeps_read_ids = False
+
+  def next_id(self, prefix, is_taken):
+    while True:
+      Id = prefix + str(randint(1, 100000))
+      if not is_taken(Id):
+        return Id
+
+
+
+class sequential_ids(object):
+  """Monotonic counter per prefix.
+
+  Ids that were registered explicitly (for example when read from a
+  file) are skipped; as the counter never goes back, allocation is O(1)
+  amortized."""
+  keeps_read_ids = False
+
+  def __init__(self):
+    self._counters = {}
+
+
+  def next_id(self, prefix, is_taken):
+    i = self._counters.get(prefix, 0)
+    while True:
+      i += 1
+      Id = prefix + str(i)
+      if not is_taken(Id):
+        self._counters[prefix] = i
+        return Id
+
+
+
+class stable_ids(sequential_ids):
+  """Sequential ids which also keep the ids read from a file whenever
+  they do not clash with ids already in use, so that saving an
+  unchanged document reproduces the same ids."""
+  keeps_read_ids = True
+
+
+
+id_strategies = {'random': random_ids,
+                 'sequential': sequential_ids,
+                 'stable': stable_ids}
+
+
+
+class id_manager(object):
+
+  def __init__(self, strategy=None):
+    self.id_map = id_registry()
+    self.strategy = strategy or sequential_ids()
+
+
+  def new_sandbox(self):
+    """returns a new, empty id_manager using the same kind of strategy"""
+    return id_manager(strategy=self.strategy.__class__())
 
 
   def register_id(self, obj, Id):
     if self.is_registered_object(obj):
       raise ValueError("Object is already registered " + str(obj))
-    self.id_map[Id] = obj
+    self.id_map.register(Id, obj)
 
 
   def unregister_id(self, Id, obj):
-    try:
-      if self.id_map[Id] != obj:
-        raise ValueError("Id and object do not correspond")
-      del self.id_map[Id]
-    except KeyError:
+    if Id not in self.id_map:
       raise ValueError("Id %s is not registered" % Id)
+    if self.id_map.get_object(Id) != obj:
+      raise ValueError("Id and object do not correspond")
+    self.id_map.unregister(Id)
 
 
   def get_object_with_id(self, Id):
-    return self.id_map[Id]
+    if Id not in self.id_map:
+      raise KeyError(Id)
+    return self.id_map.get_object(Id)
 
 
   def get_object_with_id_or_none(self, Id):
-    return self.id_map.get(Id, None)
+    return self.id_map.get_object(Id)
 
 
   def generate_id(self, prefix='id'):
-    while True:
-      Id = prefix + str(randint(1, 100000))
-      if Id not in self.id_map:
-        return Id
+    return self.strategy.next_id(prefix, self.is_registered_id)
+
+
+  def is_registered_id(self, Id):
+    return Id in self.id_map
 
 
   def generate_and_register_id(self, obj, prefix='id'):
@@ -65,16 +187,24 @@ class id_manager(object):
 
 
   def is_registered_object(self, obj):
-    return (obj in self.id_map.values())
+    return self.id_map.has_object(obj)
 
 
   def get_id_of_object(self, obj):
-    for k, v in self.id_map.items():
-      if v == obj:
-        return k
-    return None
+    return self.id_map.get_id(obj)
 
 
   def unregister_object(self, obj):
     self.unregister_id(self.get_id_of_object(obj), obj)
 
+
+  def adopt_id(self, obj):
+    """Registers obj, which was created inside a sandbox, in this manager.
+
+    The id obj already has is kept when the strategy allows it and the id
+    is free, otherwise a new one is generated."""
+    Id = obj.id
+    if self.strategy.keeps_read_ids and not self.is_registered_id(Id):
+      obj.id = Id
+    else:
+      obj.generate_id()
@@ -67,6 +67,7 @@ def ask_name_for_selected( paper):
 
   for m in ms:
     m.name = name
+    m._note_undo_change()
   Store.log( _('Name %s was set to molecule(s)') % name)
   paper.start_new_undo_record()
 
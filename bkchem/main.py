@@ -25,10 +25,8 @@ from __future__ import print_function
 
 import os
 import oasa
-import string
 import warnings
 import collections
-import xml.dom.minidom as dom
 
 try:
   from tkinter import *
@@ -43,16 +41,18 @@ import Pmw
 import data
 import misc
 import modes
+import debug
 import config
 import export
 import logger
 import dialogs
 import pixmaps
-import plugins
+import startup
 import messages
 import molecule
 import os_support
 import interactors
+import cdml_reader
 import oasa_bridge
 import dom_extensions
 import non_xml_writer
@@ -62,9 +62,9 @@ import plugins.plugin
 from paper import chem_paper
 from edit_pool import editPool
 from xml_writer import SVG_writer
-from id_manager import id_manager
+from id_manager import id_manager, id_strategies
 from temp_manager import template_manager
-from plugin_support import plugin_manager
+from plugin_support import plugin_manager, format_plugins
 from singleton_store import Store, Screen
 
 
@@ -91,26 +91,31 @@ class BKChem( Tk):
 
   def initialize( self):
     self.in_batch_mode = 0
-    self.init_basics()
+    with startup.timed( "init_basics"):
+      self.init_basics()
 
     # main drawing part
     self.papers = []
     self.notebook = Pmw.NoteBook( self.main_frame,
                                   raisecommand=self.change_paper,
                                   borderwidth=config.border_width)
-    self.add_new_paper()
+    with startup.timed( "add_new_paper"):
+      self.add_new_paper()
 
     # template and group managers
-    self.init_singletons()
+    with startup.timed( "init_singletons"):
+      self.init_singletons()
 
     # menu initialization
-    self.init_menu()
-    self.init_plugins_menu()
+    with startup.timed( "init_menu"):
+      self.init_menu()
+      self.init_plugins_menu()
 
     # modes initialization
-    self.init_modes()
-    self.mode = 'draw' # this is normaly not a string but it makes things easier on startup
-    self.init_mode_buttons()
+    with startup.timed( "init_modes"):
+      self.init_modes()
+      self.mode = 'draw' # this is normaly not a string but it makes things easier on startup
+      self.init_mode_buttons()
 
     # edit pool
     self.editPool = editPool( self.main_frame, width=60)
@@ -122,7 +127,8 @@ class BKChem( Tk):
 
 
     # preferences
-    self.init_preferences()
+    with startup.timed( "init_preferences"):
+      self.init_preferences()
 
     # init status bar
     self.init_status_bar()
@@ -137,20 +143,24 @@ class BKChem( Tk):
     self.update_menu_after_selection_change( None)
 
     #self.start_server()
+    debug.log( "startup times:\n" + startup.report())
 
 
   def initialize_batch( self):
     self.in_batch_mode = 1
-    self.init_basics()
+    with startup.timed( "init_basics"):
+      self.init_basics()
 
     # main drawing part
     self.papers = []
     self.notebook = Pmw.NoteBook( self.main_frame,
                                   raisecommand=self.change_paper)
-    self.add_new_paper()
+    with startup.timed( "add_new_paper"):
+      self.add_new_paper()
 
     # template and group managers
-    self.init_singletons()
+    with startup.timed( "init_singletons"):
+      self.init_singletons()
 
     # not very verbose logging strategy
     Store.logger.handling = logger.batch_mode
@@ -163,6 +173,7 @@ class BKChem( Tk):
 
     # modes initialization
     self.mode = 'draw' # this is normaly not a string but it makes things easier on startup
+    debug.log( "startup times:\n" + startup.report())
 
 
   def init_menu( self):
@@ -368,36 +379,23 @@ class BKChem( Tk):
     self.main_frame.rowconfigure( 4, weight=1)
     self.main_frame.columnconfigure( 0, weight=1)
 
-    self.plugins = {}
-    if plugins.__all__:
-      for name in plugins.__all__:
-        plugin = plugins.__dict__[ name]
-        self.plugins[ plugin.name] = plugin
-
-        # support for tuning of piddle
-        if plugin.name.endswith( "(Piddle)"):
-          from plugins import tk2piddle
-          import tuning
-          tk2piddle.tk2piddle.text_x_shift = tuning.Tuning.Piddle.text_x_shift
+    # import/export plugins, the modules are imported on first use
+    self.plugins = format_plugins()
 
     self.paper = None
 
 
   def init_plugins_menu( self):
-    # PLUGINS
-    names = sorted(self.plugins.keys())
-    for name in names:
-      plugin = self.plugins[ name]
-      local_name = hasattr( plugin, "local_name") and getattr( plugin, "local_name") or plugin.name
-      if ('importer' in  plugin.__dict__) and plugin.importer:
-        doc_string = hasattr( plugin.importer, "doc_string") and getattr( plugin.importer, "doc_string") or plugin.importer.__doc__
-        self.menu.addmenuitem( _("Import"), 'command', label=local_name,
-                               statusHelp=doc_string,
+    # PLUGINS - built from the cached names, nothing is imported here
+    for name in sorted( self.plugins.keys()):
+      plugin = self.plugins.handlers[ name]
+      if plugin.importer_doc is not None:
+        self.menu.addmenuitem( _("Import"), 'command', label=plugin.local_name,
+                               statusHelp=plugin.importer_doc,
                                command=misc.lazy_apply( self.plugin_import, (plugin.name,)))
-      if ('exporter' in plugin.__dict__) and plugin.exporter:
-        doc_string = hasattr( plugin.exporter, "doc_string") and getattr( plugin.exporter, "doc_string") or plugin.exporter.__doc__
-        self.menu.addmenuitem( _("Export"), 'command', label=local_name,
-                               statusHelp=doc_string,
+      if plugin.exporter_doc is not None:
+        self.menu.addmenuitem( _("Export"), 'command', label=plugin.local_name,
+                               statusHelp=plugin.exporter_doc,
                                command=misc.lazy_apply( self.plugin_export, (plugin.name,)))
 
 
@@ -407,9 +405,10 @@ class BKChem( Tk):
     Store.log = Store.logger.log
 
     # id_manager
-    Store.id_manager = id_manager()
+    strategy = id_strategies.get( Store.pm.get_preference( "id_allocation"), id_strategies['sequential'])
+    Store.id_manager = id_manager( strategy=strategy())
 
-    # template_manager
+    # template_manager (the templates are read on first use)
     Store.tm = template_manager()
     Store.tm.add_template_from_CDML( "templates.cdml")
 
@@ -422,8 +421,8 @@ class BKChem( Tk):
     Store.gm.add_template_from_CDML( "groups.cdml")
     Store.gm.add_template_from_CDML( "groups2.cdml")
 
+    # plugins are searched for on first use
     self.plug_man = plugin_manager()
-    plugs = self.plug_man.get_available_plugins()
 
 
   def init_preferences( self):
@@ -481,22 +480,29 @@ class BKChem( Tk):
     self.modes_sort = ['edit', 'draw', 'template', 'usertemplate', 'atom', 'mark', 'arrow',
                        'plus', 'text', 'bracket', 'rotate', 'bondalign', 'vector', 'misc']#  'reaction', 'externaldata'] #, 'rapiddraw']
 
-    # import plugin modes
-    import imp
+    # plugin modes, they are loaded when first selected
+    self._plugin_modes = {}
     for plug_name in self.plug_man.get_names( type="mode"):
       plug = self.plug_man.get_plugin_handler( plug_name)
-      module_name = plug.get_module_name()
-      # no invalid characters in mode_name
-      mode_name = ''.join(x in string.ascii_letters and x or "X" for x in module_name)
-      try:
-        module = imp.load_source( module_name, plug.filename)
-      except ImportError:
-        continue
-      else:
-        self.modes[ module_name.replace("_","")] = module.plugin_mode()
-        self.modes_sort.append( module_name.replace("_",""))
+      mode_name = plug.get_module_name().replace("_","")
+      self._plugin_modes[ mode_name] = plug
+      self.modes_sort.append( mode_name)
+
+
+  def get_mode( self, tag):
+    """returns the mode for tag, plugin modes are loaded on first use"""
+    if tag not in self.modes:
+      plug = self._plugin_modes[ tag]
+      import imp
+      module = imp.load_source( plug.get_module_name(), plug.filename)
+      self.modes[ tag] = module.plugin_mode()
+    return self.modes[ tag]
 
-    del imp
+
+  def get_mode_name( self, tag):
+    if tag in self.modes:
+      return self.modes[ tag].name
+    return self._plugin_modes[ tag].name
 
 
   def init_mode_buttons( self):
@@ -518,11 +524,11 @@ class BKChem( Tk):
     # Add some buttons to the radiobutton RadioSelect.
     for m in self.modes_sort:
       if m in pixmaps.images:
-        recent = self.radiobuttons.add( m, image=pixmaps.images[m], text=self.modes[m].name, activebackground='grey',
+        recent = self.radiobuttons.add( m, image=pixmaps.images[m], text=self.get_mode_name( m), activebackground='grey',
                                         relief='flat', borderwidth=config.border_width)
-        self.balloon.bind( recent, self.modes[ m].name)
+        self.balloon.bind( recent, self.get_mode_name( m))
       else:
-        self.radiobuttons.add( m, text=self.modes[ m].name, borderwidth=config.border_width)
+        self.radiobuttons.add( m, text=self.get_mode_name( m), borderwidth=config.border_width)
     # sub-mode support
     self.subFrame = Frame( self.main_frame)
     self.subFrame.grid( row=2, sticky='we')
@@ -550,8 +556,13 @@ class BKChem( Tk):
 
 
   def change_mode( self, tag):
+    try:
+      mode = self.get_mode( tag)
+    except ImportError as e:
+      Store.log( _("The mode could not be loaded: %s") % e, message_type="error")
+      return
     old_mode = self.mode
-    self.mode = self.modes[ tag]
+    self.mode = mode
     if not misc.myisstr(old_mode):
       old_mode.cleanup()
       self.mode.copy_settings( old_mode)
@@ -839,71 +850,20 @@ class BKChem( Tk):
   def _load_CDML_file( self, a, draw=True):
     if a != '':
       self.save_dir, save_file = os.path.split( a)
-      ## try if the file is gzipped
-      # try to open the file
       try:
-        import gzip
-        inp = gzip.open( a, "rb")
-      except IOError:
-        # can't read the file
-        Store.log( _("cannot open file ") + a)
+        doc, namespace_ok = cdml_reader.read_cdml( a)
+      except cdml_reader.cdml_read_error as e:
+        Store.log( e.value)
         return None
-      # is it a gzip file?
-      it_is_gzip = 1
-      try:
-        s = inp.read()
-      except IOError:
-        # not a gzip file
-        it_is_gzip = 0
-      # if it's gzip file parse it
-      if it_is_gzip:
-        try:
-          doc = dom.parseString(s)
-        except:
-          Store.log( _("error reading file"))
-          inp.close()
+      if not namespace_ok:
+        # ask if we should proceed with incorrect namespace
+        proceed = tkMessageBox.askokcancel(_("Proceed?"),
+                                           _("CDML data seem present in SVG but have wrong namespace. Proceed?"),
+                                           default='ok',
+                                           parent=self)
+        if not proceed:
+          Store.log(_("file not loaded"))
           return None
-        inp.close()
-        del gzip
-        doc = [n for n in doc.childNodes if n.nodeType == doc.ELEMENT_NODE][0]
-      else:
-      ## otherwise it should be normal xml file
-        ## try to parse it
-        try:
-          doc = dom.parse( a)
-        except IndexError:
-          Store.log( _("error reading file"))
-          return None
-        ## if it works check if its CDML of CD-SVG file
-        doc = [n for n in doc.childNodes if n.nodeType == doc.ELEMENT_NODE][0]
-      ## check if its CD-SVG or CDML
-      if doc.nodeName != 'cdml':
-        ## first try if there is the right namespace
-        if hasattr( doc, 'getElementsByTagNameNS'):
-          docs = doc.getElementsByTagNameNS( data.cdml_namespace, 'cdml')
-        else:
-          Store.log( _("File was not loaded"), message_type="error")
-          return None  # I don't know why this happens, but we simply ignore the document
-        if docs:
-          doc = docs[0]
-        else:
-          # if not, try it without it
-          docs = doc.getElementsByTagName( 'cdml')
-          if docs:
-            # ask if we should proceed with incorrect namespace
-            proceed = tkMessageBox.askokcancel(_("Proceed?"),
-                                               _("CDML data seem present in SVG but have wrong namespace. Proceed?"),
-                                               default='ok',
-                                               parent=self)
-            if proceed:
-              doc = docs[0]
-            else:
-              Store.log(_("file not loaded"))
-              return None
-          else:
-            ## sorry but there is no cdml in the svg file
-            Store.log(_("cdml data are not present in SVG or are corrupted!"))
-            return None
       self.paper.clean_paper()
       self.paper.read_package( doc, draw=draw)
       if not misc.myisstr(self.mode):
@@ -992,8 +952,27 @@ class BKChem( Tk):
       sys.exit(0)
 
 
+  def _get_format_plugin( self, pl_id):
+    """returns the import/export plugin pl_id or None when its module cannot
+    be imported, its menu entries are disabled then"""
+    handler = self.plugins.handlers.get( pl_id)
+    plugin = self.plugins.get( pl_id)
+    if not plugin:
+      name = handler and handler.local_name or pl_id
+      if handler:
+        for menu in (_("Import"), _("Export")):
+          try:
+            self.menu.component( menu + "-menu").entryconfigure( name, state="disabled")
+          except (TclError, KeyError):
+            pass
+      Store.log( _("The plugin %s cannot be loaded, some of the modules it needs are missing.") % name, message_type="error")
+    return plugin
+
+
   def plugin_import( self, pl_id, filename=None):
-    plugin = self.plugins[ pl_id]
+    plugin = self._get_format_plugin( pl_id)
+    if not plugin:
+      return 0
     if not filename:
       if self.paper.changes_made:
         if tkMessageBox.askokcancel( _("Forget changes?"),_("Forget changes in currently visiting file?"), default='ok', parent=self) == 0:
@@ -1054,7 +1033,14 @@ class BKChem( Tk):
 
   def plugin_export( self, pl_id, filename=None, interactive=True, on_begin_attrs=None):
     """interactive attribute tells whether the plugin should be run in interactive mode"""
-    plugin = self.plugins[ pl_id]
+    with self.paper.prepared_for_export():
+      return self._plugin_export( pl_id, filename=filename, interactive=interactive, on_begin_attrs=on_begin_attrs)
+
+
+  def _plugin_export( self, pl_id, filename=None, interactive=True, on_begin_attrs=None):
+    plugin = self._get_format_plugin( pl_id)
+    if not plugin:
+      return False
     exporter = plugin.exporter( self.paper)
     exporter.interactive = interactive and not self.in_batch_mode
     attrs = on_begin_attrs or {}
@@ -1106,9 +1092,9 @@ class BKChem( Tk):
       if not dial.apply:
         return
       elif dial.apply == 2:
-        [o.redraw() for o in self.paper.apply_current_standard( old_standard=old_standard)]
+        [self.paper.schedule_redraw( o) for o in self.paper.apply_current_standard( old_standard=old_standard)]
       elif dial.apply == 1:
-        [o.redraw() for o in self.paper.apply_current_standard( objects=self.paper.selected, old_standard=old_standard)]
+        [self.paper.schedule_redraw( o) for o in self.paper.apply_current_standard( objects=self.paper.selected, old_standard=old_standard)]
       self.paper.add_bindings()
       self.paper.start_new_undo_record()
 
@@ -1406,6 +1392,7 @@ Enter InChI:""")
     if pd.result == 1:
       for i in self.papers:
         i._paper_properties['use_real_minus'] = Store.pm.get_preference("use_real_minus")
+        i.culling.draw_all()
         [j.redraw() for j in i.stack]
 
 
@@ -122,5 +122,17 @@ options:
  -H DIR          overrides the BKChem home dir
                  (where standard drawing setting, user-defined templates etc. are stored.)
  -b SCRIPT       start BKChem in batch mode, run SCRIPT and exit
+ -c, --convert FORMAT [-o DIR] [-j N] FILES
+                 convert FILES to FORMAT (svg, cd-svg, cdml, png or pdf)
+                 without starting the GUI, the output is written to DIR
+                 or next to the input files; directories in FILES are
+                 searched for BKChem documents; the files are converted
+                 by N processes in parallel (by default one per CPU)
  -v, --version   show program version and exit
+ --profile-startup OUTPUT [--profile-baseline BASELINE]
+                 start the application, write the time spent in the
+                 startup phases and module imports to OUTPUT as JSON
+                 ('-' for standard output) and exit; with BASELINE
+                 (an OUTPUT of an earlier run) exits with status 1 when
+                 a phase became noticeably slower
 """)
@@ -379,10 +379,16 @@ class edit_mode(basic_mode):
 
   Also good as parent for more specialized modes.
   """
+  # motion events coming within this time (in ms) are merged into one move
+  DRAG_FRAME = 15
+
   def __init__( self):
     basic_mode.__init__( self)
     self.name = _('edit')
     self._dragging = 0
+    self._drag_dx = 0
+    self._drag_dy = 0
+    self._drag_job = None
     self._dragged_molecule = None
     self._block_leave_event = 0
     self._moving_selected_arrow = None
@@ -424,8 +430,8 @@ class edit_mode(basic_mode):
     self._alt = 'alt' in mods
     # we focus what is under cursor if its not focused already
     if not self.focused:
-      ids = Store.app.paper.find_overlapping( event.x, event.y, event.x, event.y)
-      if ids and Store.app.paper.is_registered_id( ids[-1]):
+      ids = Store.app.paper.find_registered_overlapping( event.x, event.y, event.x, event.y)
+      if ids:
         self.focused = Store.app.paper.id_to_object( ids[-1])
         self.focused.focus()
     if self.focused and isinstance( self.focused, hg.selection_square):
@@ -470,24 +476,23 @@ class edit_mode(basic_mode):
     if not self._dragging:
       self.mouse_click( event)
     else:
+      self._flush_drag()
       if self._dragging == 3:
         self._end_of_empty_drag( self._startx, self._starty, event.x, event.y)
         Store.app.paper.delete( self._selection_rect)
       elif self._dragging == 1:
-        # repositioning of atoms and double bonds
-        atoms = [j for i in [o.neighbors for o in Store.app.paper.selected
-                                             if (isinstance(o, oasa.graph.vertex) and
-                                                 o not in Store.app.paper.selected)]
-                     for j in i]
-        atoms = misc.filter_unique( [o for o in Store.app.paper.selected if isinstance( o, oasa.graph.vertex)] + atoms)
+        # the selection was only translated, atoms and bonds need to be
+        # repositioned only where it is connected to the rest
+        moved = [o for o in Store.app.paper.selected if isinstance( o, oasa.graph.vertex)]
+        atoms = misc.filter_unique( [a for b in self._bonds_to_update for a in b.atoms])
         [o.decide_pos() for o in atoms]
-        [o.redraw() for o in atoms]
+        [Store.app.paper.schedule_redraw( o) for o in atoms]
         [self.reposition_bonds_around_atom( o) for o in atoms]
         [self.reposition_bonds_around_bond( o) for o in self._bonds_to_update]
-        Store.app.paper.handle_overlap()
+        Store.app.paper.handle_overlap( atoms=moved)
         Store.app.paper.start_new_undo_record()
       elif self._dragging == 2:
-        Store.app.paper.handle_overlap()
+        Store.app.paper.handle_overlap( atoms=list( getattr( self._dragged_molecule, 'atoms', [])))
         Store.app.paper.start_new_undo_record()
       elif self._dragging == 4:
         if self.focused:
@@ -588,15 +593,8 @@ class edit_mode(basic_mode):
       else:
         ### don't do anything
         self._dragging = 10  # just a placeholder to know that click should not be called
-    if self._dragging == 1:
-      [o.move( dx, dy) for o in Store.app.paper.selected]
-      if self._moving_selected_arrow:
-        self._moving_selected_arrow.move( dx, dy)
-      [o.redraw() for o in self._bonds_to_update]
-      [o.redraw() for o in self._arrows_to_update]
-      self._startx, self._starty = event.x, event.y
-    elif self._dragging == 2:
-      self._dragged_molecule.move( dx, dy)
+    if self._dragging in (1, 2):
+      self._queue_drag( dx, dy)
       self._startx, self._starty = event.x, event.y
     elif self._dragging == 3:
       Store.app.paper.coords( self._selection_rect, self._startx, self._starty, event.x, event.y)
@@ -609,6 +607,35 @@ class edit_mode(basic_mode):
         Store.log( '%i, %i' % ( dx, dy))
 
 
+  def _queue_drag( self, dx, dy):
+    """accumulates the move, it is applied at most once per DRAG_FRAME"""
+    self._drag_dx += dx
+    self._drag_dy += dy
+    if not self._drag_job:
+      self._drag_job = Store.app.paper.after( self.DRAG_FRAME, self._flush_drag)
+
+
+  def _flush_drag( self):
+    """applies the accumulated move; items are only translated and bonds
+    connecting the moved part to the rest are drawn as simple lines, the
+    full redraw is done in mouse_up"""
+    if self._drag_job:
+      Store.app.paper.after_cancel( self._drag_job)
+      self._drag_job = None
+    dx, dy = self._drag_dx, self._drag_dy
+    self._drag_dx = self._drag_dy = 0
+    if not (dx or dy):
+      return
+    if self._dragging == 1:
+      [o.move( dx, dy) for o in Store.app.paper.selected]
+      if self._moving_selected_arrow:
+        self._moving_selected_arrow.move( dx, dy)
+      [o.simple_redraw() for o in self._bonds_to_update]
+      [o.redraw() for o in self._arrows_to_update]
+    elif self._dragging == 2:
+      self._dragged_molecule.move( dx, dy)
+
+
   def enter_object( self, object, event):
     if not self._dragging:
       if self.focused:
@@ -631,23 +658,26 @@ class edit_mode(basic_mode):
 
   def reposition_bonds_around_atom( self, a):
     bs = a.neighbor_edges
-    [b.redraw( recalc_side = 1) for b in bs] # if b.order == 2]
+    [Store.app.paper.schedule_redraw( b, recalc_side = 1) for b in bs] # if b.order == 2]
     if isinstance( a, textatom) or isinstance( a, atom):
+      # the marks are placed around the bbox of the atom, it must be redrawn first
+      Store.app.paper.flush_redraw( a)
       a.reposition_marks()
 
 
   def reposition_bonds_around_bond( self, b):
     bs = misc.filter_unique( b.atom1.neighbor_edges + b.atom2.neighbor_edges)
-    [b.redraw( recalc_side = 1) for b in bs if b.order == 2]
+    [Store.app.paper.schedule_redraw( b, recalc_side = 1) for b in bs if b.order == 2]
     # all atoms to update
-    atms = misc.filter_unique(j for i in [[b.atom1, b.atom2] for b in bs] for j in i)
-    [a.reposition_marks() for a in atms if isinstance( a, atom)]
+    atms = [a for a in misc.filter_unique(j for i in [[b.atom1, b.atom2] for b in bs] for j in i) if isinstance( a, atom)]
+    [Store.app.paper.flush_redraw( a) for a in atms]
+    [a.reposition_marks() for a in atms]
 
 
   def _end_of_empty_drag( self, x1, y1, x2, y2):
     Store.app.paper.select( filter( lambda o: o,\
                                     map( Store.app.paper.id_to_object,\
-                                         Store.app.paper.find_enclosed( x1, y1, x2, y2))))
+                                         Store.app.paper.find_registered_enclosed( x1, y1, x2, y2))))
 
 
   ## METHODS FOR KEY EVENTS RESPONSES
@@ -1133,14 +1163,37 @@ class template_mode( edit_mode):
   def __init__( self):
     edit_mode.__init__( self)
     self.name = _('template')
-    self.submodes = [Store.tm.get_template_names()]
-    self.submodes_names = [Store.tm.get_template_names()]
+    # the template names are read when the mode is first used
+    self.submodes = None
+    self.submodes_names = None
     self.submode = [0]
     self.register_key_sequence( 'C-t', self._mark_focused_as_template_atom_or_bond)
     self._user_selected_template = ''
     self.template_manager = Store.tm
 
 
+  @property
+  def submodes( self):
+    if self._submodes is None:
+      self._submodes = [self.template_manager.get_template_names()]
+    return self._submodes
+
+  @submodes.setter
+  def submodes( self, submodes):
+    self._submodes = submodes
+
+
+  @property
+  def submodes_names( self):
+    if self._submodes_names is None:
+      self._submodes_names = [self.template_manager.get_template_names()]
+    return self._submodes_names
+
+  @submodes_names.setter
+  def submodes_names( self, submodes_names):
+    self._submodes_names = submodes_names
+
+
   def mouse_click( self, event):
     if self.submodes == [[]]:
       Store.log( _("No template is available"))
@@ -1373,11 +1426,9 @@ class rotate_mode( edit_mode):
           sig = abs(dx1) > abs(dy1) and misc.signum(dx1) or misc.signum(dy1)
           angle = round( sig * math.sqrt(dx1**2 +dy1**2) / 50.0, 3)
           t = geometry.create_transformation_to_rotate_around_particular_axis( self._fixed.atom2.get_xyz(), self._fixed.atom1.get_xyz(), angle)
-          for a in self._rotated_atoms:
-            x, y, z = a.x, a.y, a.z
-            x, y, z = t.transform_xyz( x, y, z)
-            a.move_to( x, y)
-            a.z = z
+          coords = self._rotated_mol.get_coordinates( self._rotated_atoms)
+          coords.transform( t)
+          coords.apply()
           for a in self._rotated_mol.bonds:
             a.simple_redraw()
         else:
@@ -1388,11 +1439,9 @@ class rotate_mode( edit_mode):
           tr.set_move( -self._centerx, -self._centery, 0)
           tr.set_rotation( -angle2, angle1, 0)
           tr.set_move( self._centerx, self._centery, 0)
-          for a in self._rotated_mol.atoms:
-            x, y, z = a.x, a.y, a.z
-            x, y, z = tr.transform_xyz( x, y, z)
-            a.move_to( x, y)
-            a.z = z
+          coords = self._rotated_mol.get_coordinates()
+          coords.transform( tr)
+          coords.apply()
           for a in self._rotated_mol.bonds:
             a.simple_redraw()
 
@@ -2043,8 +2092,8 @@ class user_template_mode( template_mode):
   def __init__( self):
     template_mode.__init__( self)
     self.name = _('users templates')
-    self.submodes = [Store.utm.get_template_names()]
-    self.submodes_names = [Store.utm.get_template_names()]
+    self.submodes = None
+    self.submodes_names = None
     self.submode = [0]
     self.pulldown_menu_submodes = [0]
     #self.register_key_sequence( 'C-t C-1', self._mark_focused_as_template_atom_or_bond)
@@ -44,7 +44,9 @@ from group import group
 from fragment import fragment
 from textatom import textatom
 from queryatom import queryatom
+from coordinates import coordinate_array
 from singleton_store import Store, Screen
+from spatial_index import coincident_pairs
 from parents import container, top_level, id_enabled, with_paper
 
 
@@ -81,6 +83,9 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
     self.t_atom = None
     self.display_form = ''  # this is a (html like) text that defines how to present the molecule in linear form
     self.fragments = set()
+    self._oasa_cache = None
+    self._ring_index = None
+    self._fragment_index = None
     if package:
       self.read_package( package)
 
@@ -138,17 +143,74 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
 
 
   def add_vertex( self, v=None):
+    # a vertex without edges does not change the rings
+    rings = self._ring_index
     x = oasa.molecule.add_vertex( self, v=v)
     x.molecule = self
+    self._ring_index = rings
     return x
 
 
   def add_edge( self, v1, v2, e=None):
+    # an edge to a vertex without other edges does not close a ring
+    rings = self._ring_index
+    bridge = not v1.neighbors or not v2.neighbors
     x = oasa.molecule.add_edge( self, v1, v2, e=e)
     x.molecule = self
+    if bridge:
+      self._ring_index = rings
     return x
 
 
+  def _flush_cache( self):
+    oasa.molecule._flush_cache( self)
+    self.flush_oasa_cache()
+    self._ring_index = None
+    self._fragment_index = None
+
+
+  ## RING MEMBERSHIP
+
+  def _get_ring_index( self):
+    """returns dict mapping atoms to the rings (sets of atoms from the
+    smallest set of smallest rings) they are part of; the index is kept
+    when atoms move and when bonds that do not change the rings are added
+    or removed"""
+    if self._ring_index is None:
+      index = {}
+      for ring in self.get_smallest_independent_cycles_dangerous_and_cached():
+        for a in ring:
+          index.setdefault( a, []).append( ring)
+      self._ring_index = index
+    return self._ring_index
+
+
+  def get_rings_of_atom( self, a):
+    """returns list of rings (sets of atoms) the atom is part of"""
+    return list( self._get_ring_index().get( a, ()))
+
+
+  def get_rings_of_bond( self, b):
+    """returns list of rings (sets of atoms) containing both atoms of the bond"""
+    return [r for r in self._get_ring_index().get( b.atom1, ()) if b.atom2 in r]
+
+
+  ## CACHE OF DATA COMPUTED USING OASA
+
+  def get_oasa_cached( self, key, compute):
+    """returns compute( self); the value is cached until the molecule or
+    any of its atoms and bonds changes"""
+    if self._oasa_cache is None:
+      self._oasa_cache = {}
+    if key not in self._oasa_cache:
+      self._oasa_cache[ key] = compute( self)
+    return self._oasa_cache[ key]
+
+
+  def flush_oasa_cache( self):
+    self._oasa_cache = None
+
+
   ## LOOK
   def eat_molecule( self, mol):
     "transfers everything from mol to self, now only calls feed_data"
@@ -272,14 +334,22 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
 
 
   def delete_bond( self, item):
+    rings = self._ring_index
+    a1, a2 = item.atom1, item.atom2
     item.delete()
     self.disconnect_edge( item)
+    if rings is not None and not [r for r in rings.get( a1, ()) if a2 in r]:
+      # the bond was not part of any ring
+      self._ring_index = rings
     return item
 
 
   def delete_atom( self, item):
     "remove links to atom from molecule records"
     self.vertices.remove( item)
+    if self._ring_index and self._ring_index.pop( item, None):
+      self._ring_index = None
+    self._fragment_index = None
     item.delete()
     if item == self.t_atom:
       t_atom = None
@@ -362,6 +432,7 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
         pass
       else:
         self.fragments.add( f)
+    self._fragment_index = None
 
     ud = dom_extensions.getChildrenNamed( package, "user-data")
     if ud:
@@ -425,26 +496,24 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
   def handle_overlap( self):
     "deletes one of overlaping atoms and updates the bonds"
     to_delete = []
+    to_delete_set = set()
     bonds_to_check = set() # this can speedup the following for b in bonds_to_check by factor of 10 for big mols
-    for i in range( len( self.atoms)):
-      for j in range( i+1, len( self.atoms)):
-        a = self.atoms[i]
-        b = self.atoms[j]
-        if (abs( a.x-b.x) < 4) and (abs( a.y-b.y) <4):
-          if a not in to_delete:
-            for e,v in b.get_neighbor_edge_pairs():
-              e.change_atoms( b, a)
-              a.add_neighbor( v, e)
-              v.add_neighbor( a, e)
-              bonds_to_check.add( e)
-            to_delete.append( b)
+    for a, b in coincident_pairs( self.atoms, 4):
+      if a not in to_delete_set:
+        for e,v in b.get_neighbor_edge_pairs():
+          e.change_atoms( b, a)
+          a.add_neighbor( v, e)
+          v.add_neighbor( a, e)
+          bonds_to_check.add( e)
+        to_delete.append( b)
+        to_delete_set.add( b)
     deleted = misc.filter_unique( to_delete)
     [self.delete_atom( o) for o in deleted]
     # after all is done, find and delete orphan bonds and update the others
     to_redraw = []
     bonds = set( self.bonds)
     for b in bonds_to_check:
-      if not b in self.bonds:
+      if not b in bonds:
         #print(b, "not in self.bonds")
         continue
       recent_b = None
@@ -494,14 +563,20 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
   def redraw( self, reposition_double=0):
     for o in self.bonds:
       if o.order == 2:
-        o.redraw( recalc_side=reposition_double)
+        self.paper.schedule_redraw( o, recalc_side=reposition_double)
       else:
-        o.redraw()
-    [o.redraw() for o in self.atoms]
+        self.paper.schedule_redraw( o)
+    for o in self.atoms:
+      self.paper.schedule_redraw( o)
+    self.paper.flush_redraws()
 
 
   def get_formula_dict( self):
     """returns a formula dict as defined in the periodic_table.py::formula_dict"""
+    return copy.copy( self.get_oasa_cached( 'formula', molecule._compute_formula_dict))
+
+
+  def _compute_formula_dict( self):
     comp = PT.formula_dict()
     for a in self.atoms:
       comp += a.get_formula_dict()
@@ -541,10 +616,10 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
     self.move_bonds_between_atoms( old, new)
     self.delete_vertex( old)
     # change the references to the vertex in fragments as well
-    for f in self.fragments:
-      if old in f.vertices:
-        f.vertices.remove( old)
-        f.vertices.add( new)
+    for f in self.get_fragments_with_vertex( old):
+      f.vertices.remove( old)
+      f.vertices.add( new)
+    self._fragment_index = None
 
 
   def lift( self):
@@ -582,10 +657,19 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
                                 self.atoms.index(b.atom2)))
 
 
+  def get_coordinates( self, atoms=None):
+    """returns coordinate_array of the atoms (all atoms by default)"""
+    return coordinate_array( self.atoms if atoms is None else atoms)
+
+
   def transform( self, tr):
     """applies given transformation to its children"""
+    coords = self.get_coordinates()
+    coords.transform( tr)
+    coords.apply( move_marks=False)
     for a in self.atoms:
-      a.transform( tr)
+      for m in a.marks:
+        m.transform( tr)
     for b in self.bonds:
       b.transform( tr)
 
@@ -637,6 +721,9 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
       nf.edges = set( edges)
       nf.vertices = set( vertices)
       self.fragments.add( nf)
+      if self._fragment_index is not None:
+        self._add_to_fragment_index( nf)
+      self._note_undo_change()
       return nf
     else:
       return None
@@ -653,6 +740,10 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
 
 
   def get_fragment_by_id( self, id):
+    f = self._get_fragment_index()['id'].get( id)
+    if f is not None and f.id == id:
+      return f
+    # the id might have been changed after the index was built
     fs = [f for f in self.fragments if f.id == id]
     if fs:
       return fs[0]
@@ -663,24 +754,44 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
   def delete_fragment( self, f):
     if f in self.fragments:
       self.fragments.remove( f)
+      self._fragment_index = None
+      self._note_undo_change()
       return True
     return False
 
 
   def get_fragments_with_vertex( self, v):
-    fs = set()
-    for f in self.fragments:
-      if v in f.vertices:
-        fs.add( f)
-    return fs
+    return set( f for f in self._get_fragment_index()['vertex'].get( v, ()) if v in f.vertices)
 
 
   def get_fragments_with_edge( self, e):
-    fs = set()
-    for f in self.fragments:
-      if e in f.edges:
-        fs.add( f)
-    return fs
+    return set( f for f in self._get_fragment_index()['edge'].get( e, ()) if e in f.edges)
+
+
+  def get_fragments_by_type( self, type):
+    return set( f for f in self._get_fragment_index()['type'].get( type, ()) if f.type == type)
+
+
+  def _get_fragment_index( self):
+    """returns dict with the fragments indexed by 'id', 'vertex', 'edge'
+    and 'type'; the index is built on demand and dropped when the graph or
+    the set of fragments changes. Fragments may lose vertices and edges
+    behind its back, therefore the lookups check the fragments found"""
+    if self._fragment_index is None:
+      self._fragment_index = {'id': {}, 'vertex': {}, 'edge': {}, 'type': {}}
+      for f in self.fragments:
+        self._add_to_fragment_index( f)
+    return self._fragment_index
+
+
+  def _add_to_fragment_index( self, f):
+    index = self._fragment_index
+    index['id'].setdefault( f.id, f)
+    index['type'].setdefault( f.type, set()).add( f)
+    for v in f.vertices:
+      index['vertex'].setdefault( v, set()).add( f)
+    for e in f.edges:
+      index['edge'].setdefault( e, set()).add( f)
 
 
   def check_linear_form_fragment( self, f):
@@ -696,6 +807,8 @@ class molecule( container, top_level, id_enabled, oasa.molecule, with_paper):
         if es or vs:
           f.edges = es
           f.vertices = vs
+          self._fragment_index = None
+          self._note_undo_change()
         else:
           return False
       # the fragment should be redrawn
@@ -42,6 +42,10 @@ def read_smiles( text, paper):
 
 
 def mol_to_smiles( mol):
+  return mol.get_oasa_cached( 'smiles', _mol_to_smiles)
+
+
+def _mol_to_smiles( mol):
   m = bkchem_mol_to_oasa_mol( mol)
   m.remove_unimportant_hydrogens()
   c = oasa.smiles.converter()
@@ -57,6 +61,10 @@ def read_inchi( text, paper):
 
 
 def mol_to_inchi( mol, program):
+  return mol.get_oasa_cached( ('inchi', program), lambda m: _mol_to_inchi( m, program))
+
+
+def _mol_to_inchi( mol, program):
   m = bkchem_mol_to_oasa_mol( mol)
   # we do not use mol_to_text because generate_inchi_and_inchikey returns extra warning messages
   _inchi, _key, _warnings = oasa.inchi.generate_inchi_and_inchikey( m, program=program, fixed_hs=False)
@@ -92,9 +100,11 @@ def oasa_mol_to_bkchem_mol( mol, paper):
   miny = None
   maxy = None
   # atoms
+  atom_map = {}
   for a in mol.vertices:
     a2 = oasa_atom_to_bkchem_atom( a, paper, m)
     m.insert_atom( a2)
+    atom_map[ a] = a2
     if calc_position:
       # data for rescaling
       if not maxx or a2.x > maxx:
@@ -110,8 +120,8 @@ def oasa_mol_to_bkchem_mol( mol, paper):
   for b in mol.edges:
     b2 = oasa_bond_to_bkchem_bond( b, paper)
     aa1, aa2 = b.vertices
-    atom1 = m.atoms[ mol.vertices.index( aa1)]
-    atom2 = m.atoms[ mol.vertices.index( aa2)]
+    atom1 = atom_map[ aa1]
+    atom2 = atom_map[ aa2]
     m.add_edge( atom1, atom2, b2)
     b2.molecule = m
     if calc_position:
@@ -157,13 +167,16 @@ def oasa_bond_to_bkchem_bond( b, paper):
 # BKCHEM -> OASA
 def bkchem_mol_to_oasa_mol( mol):
   m = oasa.molecule()
+  vertex_map = {}
   for a in mol.atoms:
-    m.add_vertex( bkchem_atom_to_oasa_atom( a))
+    v = bkchem_atom_to_oasa_atom( a)
+    m.add_vertex( v)
+    vertex_map[ a] = v
   for b in mol.bonds:
     b2 = bkchem_bond_to_oasa_bond( b)
     aa1, aa2 = b.atoms
-    v1 = m.vertices[ mol.atoms.index( aa1)]
-    v2 = m.vertices[ mol.atoms.index( aa2)]
+    v1 = vertex_map[ aa1]
+    v2 = vertex_map[ aa2]
     b2.vertices = (v1, v2)
     m.add_edge( v1, v2, b2)
   return m
@@ -28,6 +28,7 @@ import os
 import sys
 import math
 import oasa
+import contextlib
 import operator
 import xml.dom.minidom as dom
 try:
@@ -75,7 +76,13 @@ from group import group
 from textatom import textatom
 from molecule import molecule
 from reaction import reaction
-from id_manager import id_manager
+from stack import top_level_stack
+from redraw import redraw_scheduler
+from culling import viewport_culler
+from display_list import display_list
+from selection import selection
+from id_manager import id_manager, id_registry
+from spatial_index import canvas_item_index, coincident_pairs
 from temp_manager import template_manager
 from singleton_store import Store, Screen
 from helper_graphics import selection_rect
@@ -95,16 +102,25 @@ class chem_paper(Canvas, object):
 
   def __init__( self, master = None, file_name={}, **kw):
     Canvas.__init__( self, master, kw)
+    self.display_list = display_list()  # mirror of the canvas items for exporters
+    self.init_paper( file_name=file_name)
 
+
+  def init_paper( self, file_name={}):
+    """sets up the paper state, separated from __init__ so that it can be
+    used for papers not backed by a Tk canvas"""
     self.clipboard = None
 
     self.standard = self.get_personal_standard()
     self.submode = None
-    self.selected = []    # selected item
+    self.selected = selection()    # selected items
+    self.redraws = redraw_scheduler( self)
+    self.culling = viewport_culler( self)  # molecules not drawn until they get visible
     self.__in = 1
     self.__in_id = 0
-    self._id_2_object = {}
-    self.stack = []
+    self._id_2_object = id_registry()
+    self._item_index = canvas_item_index()
+    self.stack = top_level_stack()
 
     # bindings to input events
     self.set_bindings()
@@ -154,6 +170,8 @@ class chem_paper(Canvas, object):
       # scrolling (linux only?)
       self.bind( "<Button-4>", lambda e: self.yview( "scroll", -1, "units"))
       self.bind( "<Button-5>", lambda e: self.yview( "scroll", 1, "units"))
+      # the resized window could show culled molecules
+      self.bind( "<Configure>", lambda e: self.culling.draw_visible())
       # scrolling (windows)
       #self.bind( "<MouseWheel>", lambda e: self.yview( "scroll", -misc.signum( e.delta), "units"))
       # hope it does not clash on some platforms :(
@@ -161,27 +179,27 @@ class chem_paper(Canvas, object):
 
   @property
   def molecules(self):
-    return [o for o in self.stack if isinstance( o, molecule)]
+    return self.stack.of_kind( 'molecule')
 
 
   @property
   def arrows(self):
-    return [o for o in self.stack if isinstance( o, arrow.arrow)]
+    return self.stack.of_kind( 'arrow')
 
 
   @property
   def pluses(self):
-    return [o for o in self.stack if isinstance( o, classes.plus)]
+    return self.stack.of_kind( 'plus')
 
 
   @property
   def texts(self):
-    return [o for o in self.stack if isinstance( o, classes.text)]
+    return self.stack.of_kind( 'text')
 
 
   @property
   def vectors(self):
-    return [o for o in self.stack if isinstance( o, graphics.vector_graphics_item)]
+    return self.stack.of_kind( 'vector')
 
 
   @property
@@ -196,12 +214,12 @@ class chem_paper(Canvas, object):
 
   @property
   def selected_atoms(self):
-    return [o for o in self.selected if isinstance( o, oasa.graph.vertex)]
+    return self.selected.of_type( 'atom')
 
 
   @property
   def selected_bonds(self):
-    return [o for o in self.selected if isinstance( o, oasa.graph.edge)]
+    return self.selected.of_type( 'bond')
 
 
   @property
@@ -214,7 +232,7 @@ class chem_paper(Canvas, object):
 
   @property
   def groups_selected(self):
-    return [o for o in self.selected if isinstance( o, group)]
+    return [o for o in self.selected.of_type( 'atom') if isinstance( o, group)]
 
 
   @property
@@ -226,6 +244,8 @@ class chem_paper(Canvas, object):
 
 
   def add_bindings( self, active_names=()):
+    # everything should be drawn before the stacking order is fixed
+    self.flush_redraws()
     self.lower( self.background)
     [o.lift() for o in self.stack]
     if not Store.app.in_batch_mode:
@@ -234,6 +254,7 @@ class chem_paper(Canvas, object):
       else:
         names = active_names
     self._do_not_focus = [] # self._do_not_focus is temporary and is cleaned automatically here
+    self.selected.flush_cache()
     self.event_generate( "<<selection-changed>>")
     # we generate this event here because this method is often called after some change as a last thing
 
@@ -269,8 +290,7 @@ class chem_paper(Canvas, object):
     event.y = self.canvasy( event.y)
     Store.app.update_cursor_position( event.x, event.y)
     Store.app.mode.mouse_drag( event)
-    b = self.find_overlapping( event.x-2, event.y-2, event.x+2, event.y+2)
-    b = filter( self.is_registered_id, b)
+    b = self.find_registered_overlapping( event.x-2, event.y-2, event.x+2, event.y+2)
     a = map( self.id_to_object, b)
     a = [i for i in a if i not in self._do_not_focus]
     if a:
@@ -310,8 +330,7 @@ class chem_paper(Canvas, object):
     Store.app.update_cursor_position( event.x, event.y)
     Store.app.mode.mouse_move( event)
 
-    b = self.find_overlapping( event.x-3, event.y-3, event.x+3, event.y+3)
-    b = filter( self.is_registered_id, b)
+    b = self.find_registered_overlapping( event.x-3, event.y-3, event.x+3, event.y+3)
     id_objs = [(x, self.id_to_object( x)) for x in b]
     a = [i for i in id_objs if i[1] not in self._do_not_focus]
 
@@ -380,63 +399,70 @@ class chem_paper(Canvas, object):
 
   def select( self, items):
     "adds an object to the list of other selected objects and calls their select() method"
+    if self._select( items):
+      self.event_generate( "<<selection-changed>>")
+
+
+  def _select( self, items):
+    """select without the selection-changed event, returns True when
+    something was selected"""
+    changed = False
     for o in items:
       if o.object_type in ('arrow','polygon','polyline'):
         # we cannot allow arrows or polygons to be selected because selection of arrow and its points
         # doubles some actions (moving etc.) and this couldn't be easily solved other way
-        self.select( o.points)
+        changed = self._select( o.points) or changed
       elif o.object_type == 'selection_rect' or o.object_type == 'selection_square':
-        return
-      elif o not in self.selected:
-        self.selected.append( o)
+        break
+      elif self.selected.add( o):
         o.select()
-    self.event_generate( "<<selection-changed>>")
+        changed = True
+    return changed
 
 
   def unselect( self, items):
     "reverse of select()"
+    changed = False
     for item in items:
-      try:
-        self.selected.remove( item)
+      if self.selected.discard( item):
         item.unselect()
-      except ValueError:
-        pass #warn( 'trying to unselect not selected object '+id( item))
-    self.event_generate( "<<selection-changed>>")
+        changed = True
+    if changed:
+      self.event_generate( "<<selection-changed>>")
 
 
   def unselect_all( self):
     [o.unselect() for o in self.selected]
-    self.selected = []
+    self.selected.clear()
     self.event_generate( "<<selection-changed>>")
 
 
   def delete_selected( self):
     # ARROW
-    to_delete = [o for o in self.selected if o.object_type == 'arrow']
-    [a.arrow.delete_point( a) for a in self.selected if a.object_type == 'point' and (a.arrow not in to_delete)]
+    to_delete = self.selected.of_type( 'arrow')
+    [a.arrow.delete_point( a) for a in self.selected.of_type( 'point') if a.arrow not in to_delete]
     for a in self.arrows:
       if a.is_empty_or_single_point():
         if a not in to_delete:
           to_delete += [a]
       else:
         a.redraw()
-    map( self.stack.remove, to_delete)
+    [self.stack.remove( o) for o in to_delete]
     [o.delete() for o in to_delete]
     # PLUS
-    to_delete = filter( lambda o: o.object_type == 'plus', self.selected)
-    map( lambda o: o.delete(), to_delete)
-    map( self.stack.remove, to_delete)
+    for o in self.selected.of_type( 'plus'):
+      o.delete()
+      self.stack.remove( o)
     # TEXT
-    to_delete = filter( lambda o: o.object_type == 'text', self.selected)
-    for t in to_delete:
+    for t in self.selected.of_type( 'text'):
       t.delete()
       self.stack.remove( t)
     # VECTOR GRAPHICS
-    for o in [obj for obj in self.selected if obj.object_type == 'rect' or obj.object_type == 'oval']:
+    for o in self.selected.of_type( 'rect') + self.selected.of_type( 'oval'):
       o.delete()
       self.stack.remove( o)
     # polygon is special (points were removed on begining together with arrow points)
-    to_delete = [o for o in self.selected if o.object_type in ('polygon','polyline')]
+    to_delete = self.selected.of_type( 'polygon') + self.selected.of_type( 'polyline')
     for a in self.vectors:
       if a.object_type in ('polygon','polyline'):
         if a.is_empty_or_single_point():
@@ -444,15 +470,16 @@ class chem_paper(Canvas, object):
             to_delete += [a]
         else:
           a.redraw()
-    map( self.stack.remove, to_delete)
+    [self.stack.remove( o) for o in to_delete]
     [o.delete() for o in to_delete]
     # BOND AND ATOM
-    bonds = [o for o in self.selected if o.object_type == 'bond']
-    atoms = [o for o in self.selected if o.object_type == 'atom']
+    items_of_mol = {}
+    for o in self.selected.of_type( 'bond') + self.selected.of_type( 'atom'):
+      items_of_mol.setdefault( o.molecule, []).append( o)
     deleted, new, mols_to_delete = [], [], []
     changed_mols = []
     for mol in self.molecules:
-      items = [o for o in bonds+atoms if o.molecule == mol]
+      items = items_of_mol.get( mol, [])
       if items:
         changed_mols.append( mol)
       now_deleted, new_mols = mol.delete_items( items)
@@ -461,14 +488,14 @@ class chem_paper(Canvas, object):
       if new_mols:
         mols_to_delete.append( mol)
     if new:
-      map( self.stack.remove, mols_to_delete)
+      [self.stack.remove( o) for o in mols_to_delete]
       self.stack.extend( new)
     empty_mols = filter( lambda o: o.is_empty(), self.molecules)
     [self.stack.remove( o) for o in empty_mols]
     # start new undo
     if self.selected:
       self.start_new_undo_record()
-    self.selected = []
+    self.selected.clear()
     #return deleted
 
     ## check reactions
@@ -477,8 +504,7 @@ class chem_paper(Canvas, object):
 
 
   def bonds_to_update( self, exclude_selected_bonds=True):
-    a = set().union(*(set(i) for i in (v.neighbor_edges for v in self.selected
-                                                          if v.object_type == "atom")))
+    a = set().union(*(set(i) for i in (v.neighbor_edges for v in self.selected.of_type( 'atom'))))
     # if bond is also selected then it moves with and should not be updated
     if exclude_selected_bonds:
       return [b for b in a if b not in self.selected]
@@ -488,9 +514,8 @@ class chem_paper(Canvas, object):
 
   def atoms_to_update( self):
     a = []
-    for o in self.selected:
-      if o.object_type == 'bond':
-        a.extend( o.atoms)
+    for o in self.selected.of_type( 'bond'):
+      a.extend( o.atoms)
     if a:
       return misc.difference( misc.filter_unique( a), self.selected)
     else:
@@ -498,7 +523,7 @@ class chem_paper(Canvas, object):
 
 
   def arrows_to_update( self):
-    a = map( lambda o: o.arrow, filter( lambda p: p.object_type == 'point', self.selected))
+    a = [p.arrow for p in self.selected.of_type( 'point')]
     return misc.filter_unique( a)
 
 
@@ -544,6 +569,9 @@ class chem_paper(Canvas, object):
     old_standard = self.standard
     if new_standard:
       self.standard = new_standard
+    # in big documents only the visible molecules are drawn
+    lazy = draw and not Store.app.in_batch_mode and \
+           len( CDML.getElementsByTagName( 'atom')) >= config.lazy_drawing_min_atoms
     for p in CDML.childNodes:
       if p.nodeName in data.loadable_types:
         o = self.add_object_from_package( p)
@@ -561,7 +589,9 @@ class chem_paper(Canvas, object):
               # it was in version '0.12' of CDML moved to the saved package and does not have to be
               # checked on start anymore
               [b.post_read_analysis() for b in mol.bonds]
-          if draw:
+          if lazy:
+            [self.culling.cull( mol) for mol in mols]
+          elif draw:
             [mol.draw( automatic="none") for mol in mols]
         else:
           if draw:
@@ -588,6 +618,10 @@ class chem_paper(Canvas, object):
 
     if draw:
       self.add_bindings()
+    if self.culling:
+      self.update_scrollregion()
+      # the view could have changed meanwhile
+      self.after_idle( self.culling.draw_visible)
     self.um.start_new_record()
 
 
@@ -596,7 +630,17 @@ class chem_paper(Canvas, object):
     clashes between ids that might be already on the paper and ids that are in the file.
     This is especialy needed for copying and template addition (although this is done somewhere else)"""
     self.__old_id_manager = Store.id_manager
-    Store.id_manager = id_manager()
+    Store.id_manager = self.__old_id_manager.new_sandbox()
+
+
+  def onread_id_sandbox_cancel( self):
+    """closes the sandbox left open by a failed read, the ids created in it are dropped"""
+    try:
+      Store.id_manager = self.__old_id_manager
+    except AttributeError:
+      # no sandbox is open
+      return
+    del self.__old_id_manager
 
 
   def onread_id_sandbox_finish( self, apply_to=None):
@@ -607,9 +651,9 @@ class chem_paper(Canvas, object):
     else:
       os = apply_to
     for o in os:
-      o.generate_id()
+      Store.id_manager.adopt_id( o)
       if isinstance( o, molecule):
-        [ch.generate_id() for ch in o.children]
+        [Store.id_manager.adopt_id( ch) for ch in o.children]
 
 
   def get_package( self):
@@ -695,10 +739,12 @@ class chem_paper(Canvas, object):
   def clean_paper( self):
     "removes all items from paper and deletes them from molecules and items"
     self.unselect_all()
+    self.redraws.clear()
+    self.culling.clear()
     self.delete( 'all')
     self.background = None
-    del self._id_2_object
-    self._id_2_object = {}
+    self._id_2_object.clear()
+    self._item_index.clear()
 
     for obj in self.stack:
       obj.paper = None
@@ -706,7 +752,7 @@ class chem_paper(Canvas, object):
         Store.id_manager.unregister_id( obj.id, obj)
 
     del self.stack
-    self.stack = []
+    self.stack = top_level_stack()
     self.um.clean()
     self.changes_made = 0
 
@@ -716,48 +762,64 @@ class chem_paper(Canvas, object):
     self.stack.remove( container)
 
 
-  def handle_overlap( self):
-    "puts overlaping molecules together to one and then calles handle_overlap(a1, a2) for that molecule"
-    overlap = []
-    for a in self.find_withtag('atom'):
-      x, y = self.id_to_object( a).get_xy()
-      for b in self.find_overlapping( x-2, y-2, x+2, y+2):
-        if (a != b) and ( 'atom' in self.gettags( b)):
-          a1 = self.id_to_object( a)
-          a2 = self.id_to_object( b)
-          if ( abs( a1.x - a2.x) < 2) and ( abs( a1.y - a2.y) < 2):
-            if (not [a2,a1] in overlap) and a1.z == a2.z:
-              overlap.append( [a1,a2])
+  def handle_overlap( self, atoms=None):
+    """puts overlaping molecules together to one and then calles handle_overlap(a1, a2) for that molecule;
+    when atoms are given only their surroundings are checked using the spatial index"""
+    # the scheduled redraws must not draw the merged objects again
+    self.flush_redraws()
+    if atoms is None:
+      atoms = [a for m in self.molecules for a in m.atoms]
+    else:
+      atoms = self._atoms_around( atoms, 2)
+    overlap = [(a1, a2) for a1, a2 in coincident_pairs( atoms, 2) if a1.z == a2.z]
 
     deleted = []
     if overlap:
-      mols = misc.filter_unique( map( lambda a: map( lambda b: b.molecule, a), overlap))
-      a_eatenby_b1 = []
-      a_eatenby_b2 = []
-      for (mol, mol2) in mols:
-        while (mol in a_eatenby_b1):
-          mol = a_eatenby_b2[ a_eatenby_b1.index( mol)]
-        while (mol2 in a_eatenby_b1):
-          mol2 = a_eatenby_b2[ a_eatenby_b1.index( mol2)]
-        if mol != mol2 and (mol2 not in a_eatenby_b1):
+      # the merged molecules must be drawn
+      self.culling.draw_now( set( [a.molecule for pair in overlap for a in pair]))
+      # molecules are merged using union-find, eaten molecules point to their eater
+      eaten_by = {}
+      def find( mol):
+        while mol in eaten_by:
+          mol = eaten_by[ mol]
+        return mol
+      to_check = []
+      for a1, a2 in overlap:
+        mol = find( a1.molecule)
+        mol2 = find( a2.molecule)
+        if mol != mol2:
           mol.eat_molecule( mol2)
-          a_eatenby_b1.append( mol2)
-          a_eatenby_b2.append( mol)
+          eaten_by[ mol2] = mol
           self.stack.remove( mol2)
-        else:
-          deleted.extend( mol.handle_overlap())
-      deleted.extend(j for i in [mol.handle_overlap() for mol in misc.difference(a_eatenby_b2, a_eatenby_b1)]
-                           for j in i)
-      self.selected = misc.difference( self.selected, deleted)
+        to_check.append( mol)
+      for mol in misc.filter_unique( [find( m) for m in to_check]):
+        deleted.extend( mol.handle_overlap())
+      deleted_set = set( deleted)
+      [self.selected.discard( o) for o in deleted_set]
       self.add_bindings()
       Store.log( _('concatenated overlaping atoms'))
+    else:
+      deleted_set = set()
 
     preserved = []
     for a, b in overlap:
-      preserved.append( a in deleted and b or a)
+      preserved.append( a in deleted_set and b or a)
     return deleted, preserved
 
 
+  def _atoms_around( self, atoms, distance):
+    """returns the atoms together with all atoms closer than distance to any of them"""
+    ret = list( atoms)
+    found = set( ret)
+    for a in atoms:
+      for item in self._item_index.find_overlapping( a.x-distance, a.y-distance, a.x+distance, a.y+distance):
+        o = self.id_to_object( item)
+        if o not in found and isinstance( o, oasa.graph.vertex):
+          found.add( o)
+          ret.append( o)
+    return ret
+
+
   def set_name_to_selected( self, name, interpret=1):
     """sets name to all selected atoms and texts,
     also records it in an undo !!!"""
@@ -793,37 +855,270 @@ class chem_paper(Canvas, object):
 
 
   def register_id( self, id, object):
-    self._id_2_object[ id] = object
+    self._id_2_object.register( id, object)
+    self._index_item( id)
+    self.um.note_change( object)
 
 
   def unregister_id( self, id):
+    self._item_index.remove( id)
     try:
-      del self._id_2_object[ id]
+      self.um.note_change( self._id_2_object.unregister( id))
     except KeyError:
       warn( 'trying to unregister not registered id', UserWarning, 3)
 
 
   def id_to_object( self, id):
-    try:
-      return self._id_2_object[ id]
-    except KeyError:
-      return None
+    return self._id_2_object.get_object( id)
 
 
   def object_to_id( self, obj):
-    for k, v in self._id_2_object.items():
-      if v == obj:
-        return k
-    return None
+    return self._id_2_object.get_id( obj)
 
 
   def is_registered_object( self, o):
     """has this object a registered id?"""
-    return o in self._id_2_object.values()
+    return self._id_2_object.has_object( o)
 
 
   def is_registered_id( self, id):
-    return id in self._id_2_object.keys()
+    return id in self._id_2_object
+
+
+  ## spatial index of registered canvas items
+  ## the canvas methods changing position or stacking of items are overriden
+  ## in order to keep the index up to date
+  def _index_item( self, item):
+    bbox = self.bbox( item)
+    if not bbox:
+      self._item_index.remove( item)
+      return
+    kind = self.type( item)
+    shape = None
+    if kind in ('line', 'polygon'):
+      shape = (kind, self.coords( item), float( self.itemcget( item, 'width') or 1))
+    elif kind in ('rectangle', 'oval') and not self.itemcget( item, 'fill') and self.itemcget( item, 'outline'):
+      shape = ('hollow', self.coords( item), float( self.itemcget( item, 'width') or 1))
+    self._item_index.insert( item, bbox, shape)
+
+
+  def _note_item_change( self, item):
+    """the object owning the item changed, undo has to know about it"""
+    o = self._id_2_object.get_object( item)
+    if o is not None:
+      self.um.note_change( o)
+
+
+  def _indexed_items_with_tag( self, tag_or_id):
+    if tag_or_id in self._item_index:
+      return [tag_or_id]
+    elif tag_or_id == 'all':
+      return self._item_index.items()
+    elif isinstance( tag_or_id, int):
+      return []
+    else:
+      return [i for i in Canvas.find_withtag( self, tag_or_id) if i in self._item_index]
+
+
+  def move( self, tag_or_id, dx, dy):
+    Canvas.move( self, tag_or_id, dx, dy)
+    for i in self._items_with_tag( tag_or_id):
+      self.display_list.move( i, dx, dy)
+      self._note_item_change( i)
+    for i in self._indexed_items_with_tag( tag_or_id):
+      self._item_index.move( i, dx, dy)
+
+
+  def coords( self, tag_or_id, *args):
+    if not args and tag_or_id in self.display_list:
+      return list( self.display_list[ tag_or_id].coords)
+    ret = Canvas.coords( self, tag_or_id, *args)
+    if args:
+      for i in self._items_with_tag( tag_or_id):
+        self.display_list.set_coords( i, args)
+        self._note_item_change( i)
+      for i in self._indexed_items_with_tag( tag_or_id):
+        self._index_item( i)
+    return ret
+
+
+  def delete( self, *args):
+    # tags have to be resolved before the items are gone
+    items = []
+    for tag_or_id in args:
+      if tag_or_id == 'all':
+        self.display_list.clear()
+        self._item_index.clear()
+      elif isinstance( tag_or_id, int):
+        items.append( tag_or_id)
+      else:
+        items.extend( self._items_with_tag( tag_or_id))
+    Canvas.delete( self, *args)
+    for i in items:
+      self.display_list.remove( i)
+      if i in self._item_index:
+        self._item_index.remove( i)
+
+
+  def tag_raise( self, tag_or_id, *args):
+    Canvas.tag_raise( self, tag_or_id, *args)
+    if tag_or_id in self._item_index and not args:
+      self._item_index.raise_item( tag_or_id)
+    elif not isinstance( tag_or_id, int):
+      self._item_index.order_stale = True
+
+  lift = tkraise = tag_raise
+
+
+  def tag_lower( self, tag_or_id, *args):
+    Canvas.tag_lower( self, tag_or_id, *args)
+    if tag_or_id in self._item_index and not args:
+      self._item_index.lower_item( tag_or_id)
+    elif not isinstance( tag_or_id, int):
+      self._item_index.order_stale = True
+
+  lower = tag_lower
+
+
+  ## the display list of canvas items
+  ## the items are recorded when they are created and updated by the
+  ## overriden canvas methods, queries about single items are answered
+  ## from it without asking Tk
+  def _create( self, create, type, args, kw):
+    item = create( self, *args, **kw)
+    self.display_list.add( item, type, args, kw)
+    return item
+
+
+  def create_line( self, *args, **kw):
+    return self._create( Canvas.create_line, 'line', args, kw)
+
+
+  def create_polygon( self, *args, **kw):
+    return self._create( Canvas.create_polygon, 'polygon', args, kw)
+
+
+  def create_rectangle( self, *args, **kw):
+    return self._create( Canvas.create_rectangle, 'rectangle', args, kw)
+
+
+  def create_oval( self, *args, **kw):
+    return self._create( Canvas.create_oval, 'oval', args, kw)
+
+
+  def create_text( self, *args, **kw):
+    return self._create( Canvas.create_text, 'text', args, kw)
+
+
+  def _items_with_tag( self, tag_or_id):
+    if tag_or_id in self.display_list:
+      return [tag_or_id]
+    elif isinstance( tag_or_id, int):
+      return []
+    return Canvas.find_withtag( self, tag_or_id)
+
+
+  # options that change the area covered by an item, fill and outline
+  # decide whether rectangles and ovals are hollow
+  _geometry_options = ('text', 'font', 'width', 'anchor', 'justify', 'arrow', 'arrowshape',
+                       'capstyle', 'smooth', 'splinesteps', 'state')
+
+  def itemconfig( self, tag_or_id, cnf=None, **kw):
+    ret = Canvas.itemconfig( self, tag_or_id, cnf, **kw)
+    if isinstance( cnf, dict):
+      kw.update( cnf)
+    elif cnf is not None:
+      # a query of one option, nothing is changed
+      return ret
+    if kw:
+      geometry = [k for k in kw if k in self._geometry_options]
+      shading = 'fill' in kw or 'outline' in kw
+      for i in self._items_with_tag( tag_or_id):
+        self.display_list.configure( i, kw)
+        if i in self._id_2_object and (geometry or (shading and self.type( i) in ('rectangle', 'oval'))):
+          self._index_item( i)
+    return ret
+
+  itemconfigure = itemconfig
+
+
+  def itemcget( self, tag_or_id, option):
+    if tag_or_id in self.display_list:
+      return self.display_list[ tag_or_id].get( option)
+    return Canvas.itemcget( self, tag_or_id, option)
+
+
+  def type( self, tag_or_id):
+    if tag_or_id in self.display_list:
+      return self.display_list[ tag_or_id].type
+    return Canvas.type( self, tag_or_id)
+
+
+  def gettags( self, tag_or_id):
+    if tag_or_id in self.display_list:
+      return tuple( self.display_list[ tag_or_id].tags)
+    return Canvas.gettags( self, tag_or_id)
+
+
+  def addtag_withtag( self, newtag, tag_or_id):
+    Canvas.addtag_withtag( self, newtag, tag_or_id)
+    for i in self._items_with_tag( tag_or_id):
+      tags = self.display_list[ i].tags
+      if newtag not in tags:
+        tags.append( newtag)
+
+
+  def dtag( self, tag_or_id, tag_to_delete=None):
+    Canvas.dtag( self, tag_or_id, tag_to_delete)
+    if tag_to_delete is None:
+      tag_to_delete = tag_or_id
+    for i in self._items_with_tag( tag_or_id):
+      tags = self.display_list[ i].tags
+      if tag_to_delete in tags:
+        tags.remove( tag_to_delete)
+
+
+  def bbox( self, *args):
+    if len( args) == 1 and args[0] in self.display_list:
+      # bboxes of single items are cached until the item changes
+      it = self.display_list[ args[0]]
+      if it.bbox is None:
+        it.bbox = Canvas.bbox( self, args[0])
+      return it.bbox
+    return Canvas.bbox( self, *args)
+
+
+  ## scrolling draws the culled molecules that get visible
+  def xview( self, *args):
+    ret = Canvas.xview( self, *args)
+    if args:
+      self.culling.draw_visible()
+    return ret
+
+
+  def yview( self, *args):
+    ret = Canvas.yview( self, *args)
+    if args:
+      self.culling.draw_visible()
+    return ret
+
+
+  def find_registered_overlapping( self, x1, y1, x2, y2):
+    """like find_overlapping but returns only registered items,
+    uses the spatial index instead of the canvas"""
+    items = self._item_index.find_overlapping( x1, y1, x2, y2)
+    if len( items) > 1 and self._item_index.order_stale:
+      self._item_index.set_order( Canvas.find_all( self))
+    return self._item_index.sort( items)
+
+
+  def find_registered_enclosed( self, x1, y1, x2, y2):
+    """like find_enclosed but returns only registered items,
+    uses the spatial index instead of the canvas"""
+    items = self._item_index.find_enclosed( x1, y1, x2, y2)
+    if len( items) > 1 and self._item_index.order_stale:
+      self._item_index.set_order( Canvas.find_all( self))
+    return self._item_index.sort( items)
 
 
   def new_molecule( self):
@@ -894,12 +1189,12 @@ class chem_paper(Canvas, object):
 
   def list_bbox( self, items):
     """extension of Canvas.bbox to provide support for lists of items"""
-    self.dtag( 'bbox', 'bbox') # just to be sure
-    for i in items:
-      self.addtag_withtag( 'bbox', i)
-    ret = self.bbox( 'bbox')
-    self.dtag( 'bbox', 'bbox')
-    return ret
+    # the bboxes of single items are mostly cached
+    boxes = [b for b in map( self.bbox, items) if b]
+    if not boxes:
+      return None
+    return (min( b[0] for b in boxes), min( b[1] for b in boxes),
+            max( b[2] for b in boxes), max( b[3] for b in boxes))
 
 
   def selected_to_clipboard( self, delete_afterwards=0, strict=0):
@@ -1119,25 +1414,7 @@ class chem_paper(Canvas, object):
     """maps all items in self.selected to their top_levels (atoms->molecule etc.),
     filters them to be unique and returns tuple of (unique_top_levels, unique)
     where unique is true when there was only one item from each container"""
-    filtrate = []
-    unique = 1
-    for o in self.selected:
-      if o.object_type == 'atom' or o.object_type == 'bond':
-        if o.molecule not in filtrate:
-          filtrate.append( o.molecule)
-        else:
-          unique = 0
-      elif o.object_type == 'point':
-        if o.arrow not in filtrate:
-          filtrate.append( o.arrow)
-        else:
-          unique = 0
-      else:
-        if o not in filtrate:
-          filtrate.append( o)
-        else:
-          unique = 0
-    return (filtrate, unique)
+    return self.selected.get_top_levels()
 
 
   def undo( self):
@@ -1192,20 +1469,21 @@ class chem_paper(Canvas, object):
       o.transform( tr)
       if scale_font:
         [i.scale_font( ratio) for i in o.atoms]
-        [i.redraw() for i in o.atoms if i.show]
+        [self.schedule_redraw( i) for i in o.atoms if i.show]
       if scale_font:
         for a in o.atoms:
           for m in a.marks:
             m.size *= ratio
-            m.redraw()
+            self.schedule_redraw( m)
       if scale_bond_width:
         for e in o.edges:
           e.bond_width *= ratio
-          e.redraw()
+          self.schedule_redraw( e)
       for frag in o.fragments:
         if frag.type == "linear_form":
           frag.properties['bond_length'] = round( frag.properties['bond_length'] * ratio)
           o.check_linear_form_fragment( frag)
+      self.flush_redraws()
     if o.object_type in ('arrow','polygon','polyline'):
       for i in o.points:
         x, y = tr.transform_xy( i.x, i.y)
@@ -1243,11 +1521,45 @@ class chem_paper(Canvas, object):
     Store.log( _("selected top_levels were exported to clipboard in SVG"))
 
 
+  @property
+  def revision( self):
+    """number increased on every recorded change of the paper"""
+    return self.um.revision
+
+
+  def schedule_redraw( self, o, **kw):
+    """o.redraw( **kw) will be called when Tk is idle or on flush_redraws,
+    only once even if the object is scheduled more times"""
+    self.redraws.schedule( o, **kw)
+
+
+  def flush_redraws( self):
+    """redraws all the objects waiting for redraw"""
+    self.redraws.flush()
+
+
+  def flush_redraw( self, o):
+    """redraws o now if it waits for redraw"""
+    self.redraws.flush_object( o)
+
+
+  @contextlib.contextmanager
+  def prepared_for_export( self):
+    """the canvas shows the whole document for the time of the with block -
+    the pending redraws are done and the culled molecules are drawn.
+    Everything that exports the drawn items must run in it"""
+    self.flush_redraws()
+    with self.culling.fully_drawn():
+      yield
+
+
   def start_new_undo_record( self, name=''):
+    self.flush_redraws()
     if name != "arrow-key-move":
       self.before_undo_record()
     if not self.changes_made:
       self.changes_made = 1
+    self.selected.flush_cache()
     self.um.start_new_record( name=name)
     self.after_undo_record()
 
@@ -1338,8 +1650,11 @@ class chem_paper(Canvas, object):
 
 
   def select_all( self):
-    self.unselect_all()
-    self.select( [o for o in map( self.id_to_object, self.find_all()) if o and hasattr( o, 'select') and o.object_type != 'arrow'])
+    # add_bindings generates the only selection-changed event
+    [o.unselect() for o in self.selected]
+    self.selected.clear()
+    self.culling.draw_all()
+    self._select( [o for o in map( self.id_to_object, self.find_all()) if o and hasattr( o, 'select') and o.object_type != 'arrow'])
     self.add_bindings()
 
 
@@ -1391,7 +1706,7 @@ class chem_paper(Canvas, object):
     """expands groups, if selected==1 only for selected, otherwise for all"""
     if selected:
       mols = [o for o in self.selected_to_unique_top_levels()[0] if o.object_type == 'molecule']
-      atoms = [o for o in self.selected if isinstance( o, group)]
+      atoms = self.groups_selected
       self.unselect_all()
       for mol in mols:
         this_atoms = misc.intersection( atoms, mol.atoms)
@@ -1417,7 +1732,8 @@ class chem_paper(Canvas, object):
     os = self.selected_to_unique_top_levels()[0]
     for o in os:
       self.stack.remove( o)
-      self.stack.insert( 0, o)
+    # the same order as if each of them was inserted at the bottom
+    self.stack[0:0] = reversed( os)
     Store.log( _("selected items were put back"))
     self.add_bindings()
     self.start_new_undo_record()
@@ -1426,8 +1742,11 @@ class chem_paper(Canvas, object):
   def swap_selected_on_stack( self):
     os = self.selected_to_unique_top_levels()[0]
     indxs = sorted(self.stack.index(o) for o in os)
+    new = list( self.stack)
     for i in range( len( indxs) // 2):
-      self.stack[ indxs[i]], self.stack[ indxs[-1-i]] =  self.stack[ indxs[-1-i]], self.stack[ indxs[i]]
+      new[ indxs[i]], new[ indxs[-1-i]] = new[ indxs[-1-i]], new[ indxs[i]]
+    # one assignment so that the index of the stack is rebuilt only once
+    self.stack[:] = new
     Store.log( _("selected items were swapped"))
     self.add_bindings()
     self.start_new_undo_record()
@@ -1527,6 +1846,10 @@ class chem_paper(Canvas, object):
 
   def update_scrollregion( self):
     x1,y1,x2,y2 = self.bbox(ALL)
+    culled = self.culling.get_bbox()
+    if culled:
+      x1, y1 = min( x1, culled[0]), min( y1, culled[1])
+      x2, y2 = max( x2, culled[2]), max( y2, culled[3])
     self.config( scrollregion=(x1-100,y1-100,x2+100,y2+100))
 
 
@@ -1551,6 +1874,9 @@ class chem_paper(Canvas, object):
     that have changed are applied; in template mode no changes of paper format are made"""
     if not template_mode:
       self.create_background()
+    if not objects:
+      # all the molecules will be redrawn
+      self.culling.draw_all()
     objs = objects or self.top_levels
     to_redraw = []
     st = self.standard
@@ -1608,7 +1934,7 @@ class chem_paper(Canvas, object):
     horizontal x-axis"""
     # locate all selected top_levels, filter them to be unique
     to_align, unique = self.selected_to_unique_top_levels()
-    to_select_then = copy.copy( self.selected)
+    to_select_then = list( self.selected)
     self.unselect_all()
     # check if there is anything to align
     if len( to_align) < 1:
@@ -58,6 +58,13 @@ class simple_parent(object):
     pass
 
 
+  def _note_undo_change( self):
+    """lets the undo manager of the paper know that the object changed"""
+    um = getattr( getattr( self, 'paper', None), 'um', None)
+    if um is not None:
+      um.note_change( self)
+
+
 
 class id_enabled(simple_parent):
   """Basic parent that has something to do with the paper, provides id support.
@@ -90,6 +97,7 @@ class id_enabled(simple_parent):
       Store.id_manager.unregister_object( self)
     Store.id_manager.register_id( self, id)
     self.__id = id
+    self._note_undo_change()
 
 
   def copy_settings(self, other):
@@ -152,6 +160,15 @@ class drawable(simple_parent):
   @dirty.setter
   def dirty(self, dirty):
     self.__dirty = dirty
+    if dirty:
+      self._note_undo_change()
+
+
+  def _schedule_redraw_if_drawn( self):
+    """lets the paper redraw the (dirty) object when it becomes idle"""
+    redraws = getattr( getattr( self, 'paper', None), 'redraws', None)
+    if redraws is not None and getattr( self, 'item', None):
+      redraws.schedule_dirty( self)
 
 
   # public methods
@@ -17,11 +17,15 @@
 
 #--------------------------------------------------------------------------
 
+from __future__ import print_function
+
 import os
 import sys
+import importlib
 import xml.dom.minidom as dom
 
 import debug
+import startup
 import os_support
 import dom_extensions as dom_ext
 
@@ -29,14 +33,39 @@ from singleton_store import Store
 
 
 
+# metadata read from the plugin files
+_plugin_cache = startup.file_cache( "plugins")
+# names and texts for the menus of the import and export plugins
+_format_plugin_cache = startup.file_cache( "format_plugins")
+
+
+
 class plugin_manager(object):
+  """The plugin files are searched for and read on first use."""
 
   def __init__( self):
-    self.plugins = {}
+    self._plugins = None
     self.descriptions = {}
 
 
+  @property
+  def plugins(self):
+    """Dictionary of plugin_handler instances by their names.
+
+    """
+    if self._plugins is None:
+      self._plugins = {}
+      with startup.timed( "plugins"):
+        self._read_available_plugins()
+      _plugin_cache.save()
+    return self._plugins
+
+
   def get_available_plugins( self):
+    return self.plugins.keys()
+
+
+  def _read_available_plugins( self):
     dir2 = os_support.get_dirs( 'plugin')
     dir1 = os_support.get_bkchem_private_dir()
     dir1 = os.path.join( dir1, 'plugins')
@@ -52,11 +81,19 @@ class plugin_manager(object):
           #except:
           #  debug.log( "could not load plugin file", name)
 
-    return self.plugins.keys()
-
 
   def read_plugin_file( self, dir, name):
-    doc = dom.parse( os.path.join( dir, name))
+    data = _plugin_cache.get( os.path.join( dir, name), self._read_plugin_data, key=Store.lang)
+    if data:
+      name, file, plugin_type, desc, menu = data
+      self.plugins[ name] = plugin_handler( name, file, type=plugin_type, desc=desc, menu=menu)
+
+
+  def _read_plugin_data( self, path):
+    """returns (name, file, type, description, menu) of the plugin
+    described in the file path or None"""
+    dir = os.path.dirname( path)
+    doc = dom.parse( path)
     root = doc.childNodes[0]
     plugin_type = root.getAttribute( 'type') or 'script'
     sources = dom_ext.simpleXPathSearch( doc, "/plugin/source")
@@ -76,10 +113,8 @@ class plugin_manager(object):
         else:
           menu = ""
 
-        plugin = plugin_handler( name, file, type=plugin_type,
-                                 desc=self._select_correct_text( descs),
-                                 menu=menu)
-        self.plugins[ name] = plugin
+        return name, file, plugin_type, self._select_correct_text( descs), menu
+    return None
 
 
   def run_plugin( self, name):
@@ -159,3 +194,122 @@ class plugin_handler(object):
     """returns directory where the plugin resides"""
     return os.path.split( self.filename)[0]
 
+
+
+class format_plugins(object):
+  """The import and export plugins (modules of the plugins package) by
+  their names.
+
+  The names and texts for the menus come from a cache, so the plugins are
+  listed without importing them. A module is imported when its plugin is
+  first used.
+  """
+
+  def __init__( self):
+    self._handlers = None
+
+
+  @property
+  def handlers( self):
+    """Dictionary of format_plugin_handler instances by the plugin names.
+
+    """
+    if self._handlers is None:
+      self._handlers = {}
+      with startup.timed( "format plugins"):
+        self._read_handlers()
+      _format_plugin_cache.save()
+    return self._handlers
+
+
+  def _read_handlers( self):
+    import plugins
+    dir = os.path.dirname( os.path.abspath( plugins.__file__))
+    for module_name in plugins.__all__:
+      path = os.path.join( dir, module_name + ".py")
+      try:
+        info = _format_plugin_cache.get( path, _read_format_plugin_info, key=Store.lang)
+      except (IOError, ImportError) as e:
+        # not cached, it is tried again on the next start
+        print("Could not load module %s: %s" % (module_name, e), file=sys.stderr)
+        continue
+      handler = format_plugin_handler( path, module_name, *info)
+      self._handlers[ handler.name] = handler
+
+
+  def keys( self):
+    return self.handlers.keys()
+
+
+  def __contains__( self, name):
+    return name in self.handlers
+
+
+  def __getitem__( self, name):
+    """returns the plugin module, raises KeyError when it is not available"""
+    module = self.get( name)
+    if module is None:
+      raise KeyError( name)
+    return module
+
+
+  def get( self, name, default=None):
+    """returns the plugin module or default when the plugin is not known or
+    its module cannot be imported (a dependency could have disappeared since
+    it was cached) - such plugin is dropped, also from the cache"""
+    handler = self.handlers.get( name)
+    if not handler:
+      return default
+    try:
+      return handler.get_module()
+    except (IOError, ImportError) as e:
+      print("Could not load module %s: %s" % (handler.module_name, e), file=sys.stderr)
+      del self.handlers[ name]
+      _format_plugin_cache.forget( handler.path)
+      _format_plugin_cache.save()
+      return default
+
+
+
+class format_plugin_handler(object):
+  """Information about an import/export plugin, it is available without
+  importing the module.
+
+  importer_doc and exporter_doc are None when the plugin has no importer
+  or exporter.
+  """
+  def __init__( self, path, module_name, name, local_name, importer_doc, exporter_doc):
+    self.path = path
+    self.module_name = module_name
+    self.name = name
+    self.local_name = local_name
+    self.importer_doc = importer_doc
+    self.exporter_doc = exporter_doc
+    self._module = None
+
+
+  def get_module( self):
+    if not self._module:
+      self._module = importlib.import_module( "plugins." + self.module_name)
+      # support for tuning of piddle
+      if self.name.endswith( "(Piddle)"):
+        from plugins import tk2piddle
+        import tuning
+        tk2piddle.tk2piddle.text_x_shift = tuning.Tuning.Piddle.text_x_shift
+    return self._module
+
+
+
+def _read_format_plugin_info( path):
+  """imports the plugin module at path and returns (name, local name,
+  importer doc, exporter doc) of the plugin"""
+  module = importlib.import_module( "plugins." + os.path.splitext( os.path.basename( path))[0])
+  local_name = getattr( module, "local_name", None) or module.name
+  docs = []
+  for kind in ("importer", "exporter"):
+    cls = getattr( module, kind, None)
+    if cls:
+      docs.append( getattr( cls, "doc_string", None) or cls.__doc__ or "")
+    else:
+      docs.append( None)
+  return (module.name, local_name) + tuple( docs)
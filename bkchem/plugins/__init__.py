@@ -17,33 +17,23 @@
 
 #--------------------------------------------------------------------------
 
-from __future__ import print_function
+"""The import and export plugins.
 
-__all__ = []
+The modules are imported on first use, plugin_support.format_plugins
+lists them from a cache without importing them.
+"""
 
 # 'bitmap' and 'gtml' were removed for the release
-_names = ["CML",
-          "CML2",
-          "openoffice",
-          "ps_builtin",
-          "molfile",
-          "pdf_piddle",
-          "ps_piddle",
-          "pdf_cairo",
-          "png_cairo",
-          "odf",
-          "svg_cairo",
-          "ps_cairo",
-          "CDXML"]
-
-import sys
-
-for _name in _names:
-  try:
-    exec('from . import %s' % _name)
-    __all__.append(_name)
-  except (IOError, ImportError):
-    print("Could not load module %s" % _name, file=sys.stderr)
-
-del _name
-del _names
+__all__ = ["CML",
+           "CML2",
+           "openoffice",
+           "ps_builtin",
+           "molfile",
+           "pdf_piddle",
+           "ps_piddle",
+           "pdf_cairo",
+           "png_cairo",
+           "odf",
+           "svg_cairo",
+           "ps_cairo",
+           "CDXML"]
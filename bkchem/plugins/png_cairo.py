@@ -71,7 +71,11 @@ support and antialiased fonts. The output should look the same as the PDF (Cairo
 
 
   def save( self):
-    self.surface.write_to_png(self.filename.encode(sys.getfilesystemencoding()))
+    if hasattr( self.filename, 'write'):
+      # a file-like object, used to render into memory
+      self.surface.write_to_png( self.filename)
+    else:
+      self.surface.write_to_png(self.filename.encode(sys.getfilesystemencoding()))
     self.surface.finish()
 
 
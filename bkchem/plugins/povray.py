@@ -24,6 +24,7 @@
 """provides export plugin to povray"""
 
 import plugin
+import display_list
 import operator
 import StringIO
 
@@ -74,18 +75,17 @@ class POV_exporter( plugin.exporter):
     return 1
 
   def fill_image( self):
-    for item in self.paper.find_all():
-      if self.paper.type( item) == "line":
-        a = map( int, self.paper.coords( item))
-        t = float( self.paper.itemcget( item, 'width'))
+    for item in self.paper.display_list.items( self.paper.find_all(), exported_only=False):
+      if item.type == "line":
+        a = [int( c) for c in item.coords]
+        t = float( item.get( 'width'))
         if not (a[0]==a[2] and a[1]==a[3]): 
           self.doc.write( '''cylinder {<%d, %d, 0>, <%d, %d, 0>, %1.1f\n texture { bond }}\n''' % ( a[0], 480-a[1], a[2], 480-a[3], t))
-      elif self.paper.type( item) == "text":
-        a = self.paper.bbox( item)
+      elif item.type == "text":
+        a = self.paper.bbox( item.id)
         x, y = a[0], 480-a[1]
-        text = self.paper.itemcget( item, 'text')
-        font = self.paper.itemcget( item, 'font')
-        size = round( int( font.split()[1]) / 0.75)
+        text = item.get( 'text')
+        size = round( display_list.font_size( item.get( 'font')) / 0.75)
         y -= size * 0.75
         self.doc.write( '''text { ttf "timrom.ttf" "%s" %1.3f, 0\n texture { bond }\n scale %d\n translate <%d, %d, 0>}\n''' % (text, 1.0/size, size, x, y))
     
@@ -54,6 +54,8 @@ class tk2cairo(object):
   def __init__( self, text_to_curves=False):
     self.text_to_curves = text_to_curves
     self._font_size_remap_cache = {}
+    self._color_cache = {}
+    self._font_cache = {}
 
 
   def export_to_cairo( self, tk_canvas, cairo_context, transformer=None):
@@ -72,8 +74,9 @@ class tk2cairo(object):
       self.context.set_source_rgba( 0,0,0,1)
       return False
     else:
-      colors = self.paper.winfo_rgb( color)
-      self.context.set_source_rgb( *map( lambda x: x/65535.0, colors))
+      if color not in self._color_cache:
+        self._color_cache[ color] = [x/65535.0 for x in self.paper.winfo_rgb( color)]
+      self.context.set_source_rgb( *self._color_cache[ color])
       return True
 
 
@@ -91,32 +94,31 @@ class tk2cairo(object):
   def draw_document( self):
     # initial values
     self.context.set_fill_rule( cairo.FILL_RULE_EVEN_ODD)
-    # the conversion function for coordinates
-    for item in self.paper.find_all():
-      if not "no_export" in self.paper.gettags( item):
-        method = "_draw_" + self.paper.type( item)
-        if not hasattr( self, method):
-          print("Method to draw %s is not implemented" % self.paper.type( item))
-        else:
-          getattr( self, method)( item)
+    # the items are taken from the display list of the paper
+    for item in self.paper.display_list.items( self.paper.find_all()):
+      method = "_draw_" + item.type
+      if not hasattr( self, method):
+        print("Method to draw %s is not implemented" % item.type)
+      else:
+        getattr( self, method)( item)
     self.context.show_page()
 
 
   def _draw_line( self, item):
-    if self.paper.itemcget( item, 'fill') != '':
+    if item.get( 'fill') != '':
       # arrows at first as they make the lines bellow them shorter
       start = None
       end = None
-      arrows = self.paper.itemcget( item, 'arrow')
+      arrows = item.get( 'arrow')
       if arrows != "none":
-        color = self.paper.itemcget( item, 'fill')
-        coords = self.paper.coords( item)
+        color = item.get( 'fill')
+        coords = item.coords
         if arrows in ("last", "both"):
-          end = self._create_arrow( self.paper.itemcget( item, 'arrowshape'), coords[-4:-2], coords[-2:], color)
+          end = self._create_arrow( item.get( 'arrowshape'), coords[-4:-2], coords[-2:], color)
         if arrows in ("first", "both"):
-          start = self._create_arrow( self.paper.itemcget( item, 'arrowshape'), coords[2:4], coords[0:2], color)
+          start = self._create_arrow( item.get( 'arrowshape'), coords[2:4], coords[0:2], color)
 
-      coords = self.transformer.transform_xy_flat_list( self.paper.coords( item))
+      coords = self.transformer.transform_xy_flat_list( item.coords)
       if start:
         coords[0] = start[0]
         coords[1] = start[1]
@@ -125,19 +127,19 @@ class tk2cairo(object):
         coords[-1] = end[1]
 
       # cap style
-      cap = self.paper.itemcget( item, 'capstyle')
+      cap = item.get( 'capstyle')
       self.context.set_line_cap( self._caps[ cap])
       # join style
-      join = self.paper.itemcget( item, 'joinstyle')
+      join = item.get( 'joinstyle')
       self.context.set_line_join( self._joins[ join])
       # color
-      is_visible = self.set_cairo_color( self.paper.itemcget( item, 'fill'))
+      is_visible = self.set_cairo_color( item.get( 'fill'))
       # line width
-      width = self.p2c_width( float( self.paper.itemcget( item, 'width')))
+      width = self.p2c_width( float( item.get( 'width')))
       self.context.set_line_width( width)
       # the path itself
       cs = self._flat_list_to_list_of_tuples( coords)
-      if self.paper.itemcget( item, 'smooth') != "0":
+      if item.get( 'smooth') != "0":
         # smooth lines
         xycoords = self._flat_list_to_list_of_tuples( coords)
         beziers = geometry.tkspline_to_cubic_bezier( xycoords)
@@ -153,17 +155,20 @@ class tk2cairo(object):
 
 
   def _draw_text( self, item):
-    text = self.paper.itemcget(item, 'text')
-    x1, y1, x2, y2 = self.paper.bbox( item)
+    text = item.get( 'text')
+    x1, y1, x2, y2 = self.paper.bbox( item.id)
     x1, y1, x2, y2 = self.transformer.transform_4( (x1+1, y1, x2-2, y2))
-    afont = tkFont.Font( font=self.paper.itemcget( item, 'font'))
+    font = item.get( 'font')
+    if font not in self._font_cache:
+      self._font_cache[ font] = tkFont.Font( font=font)
+    afont = self._font_cache[ font]
     conf = afont.config()
     font_family = conf['family']
     slant =  'italic' in conf['slant'] and cairo.FONT_SLANT_ITALIC or cairo.FONT_SLANT_NORMAL
     weight = 'bold' in conf['weight'] and cairo.FONT_WEIGHT_BOLD or cairo.FONT_WEIGHT_NORMAL
 
     # color
-    is_visible = self.set_cairo_color( self.paper.itemcget( item, 'fill'))
+    is_visible = self.set_cairo_color( item.get( 'fill'))
     # helvetica which is often used does not work for me - therefore I use remap
     font_name = self._font_remap.get( font_family, font_family)
     self.context.select_font_face( font_name, slant, weight)
@@ -190,10 +195,10 @@ class tk2cairo(object):
 
 
   def _draw_rectangle( self, item):
-    coords = self.transformer.transform_4( self.paper.coords( item))
-    outline = self.paper.itemcget( item, 'outline')
-    fill = self.paper.itemcget( item, 'fill')
-    width = self.p2c_width( float( self.paper.itemcget( item, 'width')))
+    coords = self.transformer.transform_4( item.coords)
+    outline = item.get( 'outline')
+    fill = item.get( 'fill')
+    width = self.p2c_width( float( item.get( 'width')))
     x1, y1, x2, y2 = coords
     self.context.set_line_join( cairo.LINE_JOIN_MITER)
     self.context.rectangle( x1, y1, x2-x1, y2-y1)
@@ -209,14 +214,14 @@ class tk2cairo(object):
 
 
   def _draw_polygon( self, item):
-    coords = self.transformer.transform_xy_flat_list( self.paper.coords( item))
-    outline = self.paper.itemcget( item, 'outline')
-    fill = self.paper.itemcget( item, 'fill')
-    width = self.p2c_width( float( self.paper.itemcget( item, 'width')))
+    coords = self.transformer.transform_xy_flat_list( item.coords)
+    outline = item.get( 'outline')
+    fill = item.get( 'fill')
+    width = self.p2c_width( float( item.get( 'width')))
     cs = self._flat_list_to_list_of_tuples( coords)
 
     # join style
-    join = self.paper.itemcget( item, 'joinstyle')
+    join = item.get( 'joinstyle')
     self.context.set_line_join( self._joins[ join])
 
     self._create_cairo_path( cs, closed=True)
@@ -232,10 +237,10 @@ class tk2cairo(object):
 
 
   def _draw_oval( self, item):
-    coords = self.transformer.transform_4( self.paper.coords( item))
-    outline = self.paper.itemcget( item, 'outline')
-    fill = self.paper.itemcget( item, 'fill')
-    width = self.p2c_width( float( self.paper.itemcget( item, 'width')))
+    coords = self.transformer.transform_4( item.coords)
+    outline = item.get( 'outline')
+    fill = item.get( 'fill')
+    width = self.p2c_width( float( item.get( 'width')))
     x1, y1, x2, y2 = coords
     w = x2 - x1
     h = y2 - y1
@@ -37,12 +37,14 @@ class tk2piddle(object):
   text_x_shift = 0.7
 
   def __init__( self):
-    pass
+    self._color_cache = {}
+    self._font_cache = {}
 
 
   def export_to_piddle_canvas( self, tk_canvas, piddle_canvas, transformer=None):
     self.canvas = piddle_canvas
     self.paper = tk_canvas
+    self._dpi = self.paper.winfo_fpixels( '254m')/10.0
     self.convert = self.paper_to_canvas_coord
     if not transformer:
       self.transformer = self.prepare_dumb_transformer()
@@ -55,13 +57,14 @@ class tk2piddle(object):
   def paper_to_canvas_color( self, color):
     if not color:
       return piddle.transparent
-    colors = self.paper.winfo_rgb( color)
-    return piddle.Color( *map( lambda x: x/65535.0, colors))
+    if color not in self._color_cache:
+      colors = self.paper.winfo_rgb( color)
+      self._color_cache[ color] = piddle.Color( *[x/65535.0 for x in colors])
+    return self._color_cache[ color]
 
 
   def paper_to_canvas_coord( self, x):
-    dpi = self.paper.winfo_fpixels( '254m')/10.0
-    return 72*x/dpi
+    return 72*x/self._dpi
 
 
   def prepare_dumb_transformer( self):
@@ -71,31 +74,30 @@ class tk2piddle(object):
 
 
   def draw_document( self):
-    # the conversion function for coordinates
-    for item in self.paper.find_all():
-      if not "no_export" in self.paper.gettags( item):
-        method = "_draw_" + self.paper.type( item)
-        if not hasattr( self, method):
-          print("Method to draw %s is not implemented" % self.paper.type(item))
-        else:
-          getattr( self, method)( item)
+    # the items are taken from the display list of the paper
+    for item in self.paper.display_list.items( self.paper.find_all()):
+      method = "_draw_" + item.type
+      if not hasattr( self, method):
+        print("Method to draw %s is not implemented" % item.type)
+      else:
+        getattr( self, method)( item)
 
 
   def _draw_line( self, item):
-    if self.paper.itemcget( item, 'fill') != '':
+    if item.get( 'fill') != '':
       # arrows at first as they make the lines bellow them shorter
       start = None
       end = None
-      arrows = self.paper.itemcget( item, 'arrow')
+      arrows = item.get( 'arrow')
       if arrows != "none":
-        color = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
-        coords = self.paper.coords( item)
+        color = self.paper_to_canvas_color( item.get( 'fill'))
+        coords = item.coords
         if arrows in ("last", "both"):
-          end = self._create_arrow( self.paper.itemcget( item, 'arrowshape'), coords[-4:-2], coords[-2:], color)
+          end = self._create_arrow( item.get( 'arrowshape'), coords[-4:-2], coords[-2:], color)
         if arrows in ("first", "both"):
-          start = self._create_arrow( self.paper.itemcget( item, 'arrowshape'), coords[2:4], coords[0:2], color)
+          start = self._create_arrow( item.get( 'arrowshape'), coords[2:4], coords[0:2], color)
 
-      coords = self.transformer.transform_xy_flat_list( self.paper.coords( item))
+      coords = self.transformer.transform_xy_flat_list( item.coords)
       if start:
         coords[0] = start[0]
         coords[1] = start[1]
@@ -104,10 +106,10 @@ class tk2piddle(object):
         coords[-1] = end[1]
 
       if len( coords) > 4:
-        if self.paper.itemcget( item, 'smooth') != "0":   #smooth is spline
-          outline = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
+        if item.get( 'smooth') != "0":   #smooth is spline
+          outline = self.paper_to_canvas_color( item.get( 'fill'))
           fill = piddle.transparent
-          width = self.convert( float( self.paper.itemcget( item, 'width')))
+          width = self.convert( float( item.get( 'width')))
           xycoords = self._flat_list_to_list_of_tuples( coords)
           beziers = geometry.tkspline_to_cubic_bezier( xycoords)
           for bez in beziers:
@@ -116,15 +118,15 @@ class tk2piddle(object):
 
         else:
           # polyline
-          outline = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
+          outline = self.paper_to_canvas_color( item.get( 'fill'))
           fill = piddle.transparent
-          width = self.convert( float( self.paper.itemcget( item, 'width')))
+          width = self.convert( float( item.get( 'width')))
           cs = self._flat_list_to_list_of_tuples( coords)
           self.canvas.drawPolygon( cs, edgeColor=outline, edgeWidth=width, fillColor=fill, closed=0)
       else:
         # simple line
-        fill = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
-        width = self.convert( float( self.paper.itemcget( item, 'width')))
+        fill = self.paper_to_canvas_color( item.get( 'fill'))
+        width = self.convert( float( item.get( 'width')))
         x1, y1, x2, y2 = coords
         self.canvas.drawLine( x1, y1, x2, y2, color=fill, width=width)
     else:
@@ -132,45 +134,48 @@ class tk2piddle(object):
 
 
   def _draw_text( self, item):
-    text = self.paper.itemcget( item, 'text')
-    #x, y = map( self.convert, self.paper.coords( item))
-    x1, y1, x2, y2 = self.transformer.transform_4( self.paper.bbox( item))
-    afont = tkFont.Font( font=self.paper.itemcget( item, 'font'))
+    text = item.get( 'text')
+    #x, y = map( self.convert, item.coords)
+    x1, y1, x2, y2 = self.transformer.transform_4( self.paper.bbox( item.id))
+    font = item.get( 'font')
+    if font not in self._font_cache:
+      self._font_cache[ font] = tkFont.Font( font=font)
+    afont = self._font_cache[ font]
     conf = afont.config()
     font_family = conf['family']
     font_size = conf[ 'size']
     italic = 'italic' in conf['slant']
     bold = 'bold' in conf['weight']
     y = max(y1,y2)- self.convert( afont.metrics()['descent'])
-    fill = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
+    fill = self.paper_to_canvas_color( item.get( 'fill'))
     font = piddle.Font( face=font_family, size=font_size, bold=bold, italic=italic)
     self.canvas.drawString( text, x1+self.convert( self.text_x_shift), y, font=font, color=fill)
 
 
   def _draw_rectangle( self, item):
-    coords = self.transformer.transform_4( self.paper.coords( item))
-    outline = self.paper_to_canvas_color( self.paper.itemcget( item, 'outline'))
-    fill = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
-    width = self.convert( float( self.paper.itemcget( item, 'width')))
+    coords = self.transformer.transform_4( item.coords)
+    outline = self.paper_to_canvas_color( item.get( 'outline'))
+    fill = self.paper_to_canvas_color( item.get( 'fill'))
+    width = self.convert( float( item.get( 'width')))
     x1, y1, x2, y2 = coords
     if fill != piddle.transparent or outline != piddle.transparent:
       self.canvas.drawRect( x1, y1, x2, y2, edgeColor=outline, edgeWidth=width, fillColor=fill)
 
 
   def _draw_polygon( self, item):
-    coords = self.transformer.transform_xy_flat_list( self.paper.coords( item))
-    outline = self.paper_to_canvas_color( self.paper.itemcget( item, 'outline'))
-    fill = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
-    width = self.convert( float( self.paper.itemcget( item, 'width')))
+    coords = self.transformer.transform_xy_flat_list( item.coords)
+    outline = self.paper_to_canvas_color( item.get( 'outline'))
+    fill = self.paper_to_canvas_color( item.get( 'fill'))
+    width = self.convert( float( item.get( 'width')))
     cs = self._flat_list_to_list_of_tuples( coords)
     self.canvas.drawPolygon( cs, edgeColor=outline, edgeWidth=width, fillColor=fill, closed=1)
 
 
   def _draw_oval( self, item):
-    coords = self.transformer.transform_4( self.paper.coords( item))
-    outline = self.paper_to_canvas_color( self.paper.itemcget( item, 'outline'))
-    fill = self.paper_to_canvas_color( self.paper.itemcget( item, 'fill'))
-    width = self.convert( float( self.paper.itemcget( item, 'width')))
+    coords = self.transformer.transform_4( item.coords)
+    outline = self.paper_to_canvas_color( item.get( 'outline'))
+    fill = self.paper_to_canvas_color( item.get( 'fill'))
+    width = self.convert( float( item.get( 'width')))
     x1, y1, x2, y2 = coords
     self.canvas.drawEllipse( x1, y1, x2, y2, edgeColor=outline, edgeWidth=width, fillColor=fill)
 
@@ -218,7 +223,7 @@ class tk2piddle_pdf(tk2piddle):
            'projecting': 2}
 
   def _draw_line( self, item):
-    cap = self.paper.itemcget( item, 'capstyle')
+    cap = item.get( 'capstyle')
     self.canvas.pdf.setLineCap( self._caps[ cap])
     tk2piddle._draw_line( self, item)
 
@@ -235,7 +240,7 @@ class tk2piddle_ps(tk2piddle):
            'projecting': 2}
 
   def _draw_line( self, item):
-    cap = self.paper.itemcget( item, 'capstyle')
+    cap = item.get( 'capstyle')
     self.canvas.setLineCap( self._caps[ cap])
     tk2piddle._draw_line( self, item)
 
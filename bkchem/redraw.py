@@ -0,0 +1,137 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Deferred redrawing of objects.
+
+"""
+
+import collections
+
+
+
+class redraw_scheduler(object):
+  """Queue of objects waiting to be redrawn.
+
+  Each object is redrawn only once however many times it was scheduled,
+  atoms are redrawn before bonds (bonds are shortened according to the
+  atom labels) and everything else after them. The queue is flushed when
+  Tk becomes idle or explicitly by flush.
+
+  Objects scheduled by schedule_dirty (because they were marked dirty)
+  are redrawn only if they are still dirty and drawn when the queue is
+  flushed - an explicit redraw in the meantime makes them clean.
+
+  requested counts the redraws asked for by schedule (plus the dirty
+  objects that really had to be redrawn), redrawn the redraws really
+  done, the difference is in avoided.
+  """
+  order = {'atom': 0, 'bond': 1}
+  # redraw arguments for which True means less work, when an object is
+  # scheduled more times they are combined by 'and', the others by 'or'
+  weakening_arguments = ('suppress_reposition',)
+
+  def __init__( self, paper):
+    self.paper = paper
+    self._queue = collections.OrderedDict()  # object -> redraw arguments or None
+    self._job = None
+    self._flushing = False
+    self.requested = 0
+    self.redrawn = 0
+
+
+  def __len__( self):
+    return len( self._queue)
+
+
+  def schedule( self, o, **kw):
+    """schedules o.redraw( **kw)"""
+    self.requested += 1
+    old = self._queue.get( o)
+    if old is not None:
+      for k in set( old) | set( kw):
+        if k in self.weakening_arguments:
+          kw[ k] = old.get( k, 0) and kw.get( k, 0)
+        else:
+          kw[ k] = old.get( k, 0) or kw.get( k, 0)
+    self._queue[ o] = kw
+    self._plan()
+
+
+  def schedule_dirty( self, o):
+    """schedules redraw of o for the case it is still dirty when the queue is flushed"""
+    if o not in self._queue:
+      self._queue[ o] = None
+      self._plan()
+
+
+  def _plan( self):
+    if not self._job:
+      self._job = self.paper.after_idle( self._flush_when_idle)
+
+
+  def _flush_when_idle( self):
+    self._job = None
+    self.flush()
+
+
+  def flush( self):
+    """redraws all the scheduled objects"""
+    if self._job:
+      self.paper.after_cancel( self._job)
+      self._job = None
+    if self._flushing:
+      # called from a redraw, the loop below takes care of it
+      return
+    self._flushing = True
+    try:
+      # redraw could schedule more objects
+      while self._queue:
+        queue = self._queue
+        self._queue = collections.OrderedDict()
+        for o in sorted( queue, key=lambda o: self.order.get( o.object_type, 2)):
+          self._redraw( o, queue[ o])
+    finally:
+      self._flushing = False
+
+
+  def flush_object( self, o):
+    """redraws o now when it is scheduled, the rest of the queue waits"""
+    if o in self._queue and not self._flushing:
+      self._redraw( o, self._queue.pop( o))
+
+
+  def _redraw( self, o, kw):
+    if kw is None:
+      if not (o.dirty and o.item):
+        return
+      self.requested += 1
+      kw = {}
+    o.redraw( **kw)
+    self.redrawn += 1
+
+
+  def clear( self):
+    """forgets all the scheduled objects"""
+    self._queue.clear()
+
+
+  @property
+  def avoided( self):
+    """number of requests that did not lead to a redraw"""
+    return self.requested - self.redrawn - len( self._queue)
@@ -0,0 +1,120 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""The selection of the paper.
+
+"""
+
+import collections
+
+
+
+class selection(object):
+  """Ordered set of selected objects.
+
+  It replaces the plain list used before and supports the same reading
+  operations (iteration in the order of selection, len, in, indexing),
+  but membership is tested in constant time. The objects are also kept
+  partitioned by their object_type and the mapping to top levels is
+  cached until the selection changes or flush_cache is called.
+  """
+  def __init__( self, items=()):
+    self._items = collections.OrderedDict()
+    self._by_type = {}
+    self._top_levels = None
+    for o in items:
+      self.add( o)
+
+
+  def __len__( self):
+    return len( self._items)
+
+
+  def __iter__( self):
+    return iter( list( self._items))
+
+
+  def __contains__( self, o):
+    return o in self._items
+
+
+  def __bool__( self):
+    return bool( self._items)
+
+  __nonzero__ = __bool__
+
+
+  def __getitem__( self, i):
+    return list( self._items)[i]
+
+
+  def add( self, o):
+    """adds o to the selection, returns True when it was not selected before"""
+    if o in self._items:
+      return False
+    self._items[ o] = True
+    self._by_type.setdefault( o.object_type, collections.OrderedDict())[ o] = True
+    self._top_levels = None
+    return True
+
+
+  def discard( self, o):
+    """removes o from the selection, returns True when it was selected"""
+    if o not in self._items:
+      return False
+    del self._items[ o]
+    del self._by_type[ o.object_type][ o]
+    self._top_levels = None
+    return True
+
+
+  def clear( self):
+    self._items.clear()
+    self._by_type.clear()
+    self._top_levels = None
+
+
+  def of_type( self, object_type):
+    """returns list of selected objects with the given object_type"""
+    return list( self._by_type.get( object_type, ()))
+
+
+  def get_top_levels( self):
+    """returns tuple (unique_top_levels, unique), see chem_paper.selected_to_unique_top_levels"""
+    if self._top_levels is None:
+      filtrate = collections.OrderedDict()
+      unique = 1
+      for o in self._items:
+        if o.object_type == 'atom' or o.object_type == 'bond':
+          top = o.molecule
+        elif o.object_type == 'point':
+          top = o.arrow
+        else:
+          top = o
+        if top in filtrate:
+          unique = 0
+        else:
+          filtrate[ top] = True
+      self._top_levels = (list( filtrate), unique)
+    return list( self._top_levels[0]), self._top_levels[1]
+
+
+  def flush_cache( self):
+    """the top levels of the selected objects might have changed"""
+    self._top_levels = None
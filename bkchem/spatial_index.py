@@ -0,0 +1,318 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Spatial indexes used to find objects by their position without
+scanning the whole drawing.
+
+grid_index is a generic uniform grid of bounding boxes, canvas_item_index
+adds the information needed to mimic the find_overlapping and
+find_enclosed methods of the Tk canvas for registered items.
+"""
+
+import math
+
+
+
+class grid_index(object):
+  """Uniform grid of axis aligned bounding boxes.
+
+  Every key is stored in all the cells its bbox touches, so that queries
+  for small areas only inspect a few cells.
+  """
+  def __init__( self, cell_size=64):
+    self.cell_size = float( cell_size)
+    self._cells = {}
+    self._bboxes = {}
+
+
+  def __len__( self):
+    return len( self._bboxes)
+
+
+  def __contains__( self, key):
+    return key in self._bboxes
+
+
+  def _cell_range( self, bbox):
+    x1, y1, x2, y2 = bbox
+    s = self.cell_size
+    return (int( math.floor( min( x1, x2) / s)), int( math.floor( min( y1, y2) / s)),
+            int( math.floor( max( x1, x2) / s)), int( math.floor( max( y1, y2) / s)))
+
+
+  def insert( self, key, bbox):
+    if key in self._bboxes:
+      self.remove( key)
+    bbox = tuple( bbox)
+    self._bboxes[ key] = bbox
+    i1, j1, i2, j2 = self._cell_range( bbox)
+    for i in range( i1, i2+1):
+      for j in range( j1, j2+1):
+        self._cells.setdefault( (i,j), set()).add( key)
+
+
+  def remove( self, key):
+    bbox = self._bboxes.pop( key, None)
+    if bbox is None:
+      return
+    i1, j1, i2, j2 = self._cell_range( bbox)
+    for i in range( i1, i2+1):
+      for j in range( j1, j2+1):
+        cell = self._cells.get( (i,j))
+        if cell is not None:
+          cell.discard( key)
+          if not cell:
+            del self._cells[ (i,j)]
+
+
+  def move( self, key, dx, dy):
+    x1, y1, x2, y2 = self._bboxes[ key]
+    self.insert( key, (x1+dx, y1+dy, x2+dx, y2+dy))
+
+
+  def get_bbox( self, key):
+    return self._bboxes.get( key)
+
+
+  def keys( self):
+    return list( self._bboxes.keys())
+
+
+  def clear( self):
+    self._cells.clear()
+    self._bboxes.clear()
+
+
+  def query( self, bbox):
+    """returns set of keys whose bbox overlaps the given one"""
+    x1, y1, x2, y2 = bbox
+    x1, x2 = min( x1, x2), max( x1, x2)
+    y1, y2 = min( y1, y2), max( y1, y2)
+    i1, j1, i2, j2 = self._cell_range( (x1, y1, x2, y2))
+    found = set()
+    for i in range( i1, i2+1):
+      for j in range( j1, j2+1):
+        cell = self._cells.get( (i,j))
+        if cell:
+          found |= cell
+    ret = set()
+    for key in found:
+      bx1, by1, bx2, by2 = self._bboxes[ key]
+      if bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+        ret.add( key)
+    return ret
+
+
+  def query_enclosed( self, bbox):
+    """returns set of keys whose bbox lies completely inside the given one"""
+    x1, y1, x2, y2 = bbox
+    x1, x2 = min( x1, x2), max( x1, x2)
+    y1, y2 = min( y1, y2), max( y1, y2)
+    ret = set()
+    for key in self.query( bbox):
+      bx1, by1, bx2, by2 = self._bboxes[ key]
+      if bx1 >= x1 and bx2 <= x2 and by1 >= y1 and by2 <= y2:
+        ret.add( key)
+    return ret
+
+
+
+class canvas_item_index(object):
+  """Index of canvas items with their shape and stacking order.
+
+  The shape is optional and is used to refine the bbox test - it is a
+  tuple (kind, coords, width) where kind is one of 'line', 'polygon' or
+  'hollow' (a rectangle or oval without fill). The stacking order is
+  kept up to date for single items raised or lowered, other changes
+  only mark it as stale and the owner is expected to provide the real
+  order via set_order.
+  """
+  def __init__( self, cell_size=64):
+    self.grid = grid_index( cell_size=cell_size)
+    self._shapes = {}
+    self._order = {}
+    self._top = 0
+    self._bottom = 0
+    self.order_stale = False
+
+
+  def __contains__( self, item):
+    return item in self.grid
+
+
+  def __len__( self):
+    return len( self.grid)
+
+
+  def insert( self, item, bbox, shape=None):
+    self.grid.insert( item, bbox)
+    if shape:
+      self._shapes[ item] = shape
+    else:
+      self._shapes.pop( item, None)
+    if item not in self._order:
+      self.raise_item( item)
+
+
+  def remove( self, item):
+    self.grid.remove( item)
+    self._shapes.pop( item, None)
+    self._order.pop( item, None)
+
+
+  def move( self, item, dx, dy):
+    self.grid.move( item, dx, dy)
+    shape = self._shapes.get( item)
+    if shape:
+      kind, coords, width = shape
+      coords = [c + (i % 2 and dy or dx) for i, c in enumerate( coords)]
+      self._shapes[ item] = (kind, coords, width)
+
+
+  def clear( self):
+    self.grid.clear()
+    self._shapes.clear()
+    self._order.clear()
+    self.order_stale = False
+
+
+  def items( self):
+    return self.grid.keys()
+
+
+  # stacking order
+  def raise_item( self, item):
+    self._top += 1
+    self._order[ item] = self._top
+
+
+  def lower_item( self, item):
+    self._bottom -= 1
+    self._order[ item] = self._bottom
+
+
+  def set_order( self, items):
+    """sets the stacking order from a list of items ordered from bottom to top"""
+    self._order.clear()
+    self._bottom = 0
+    self._top = 0
+    for item in items:
+      if item in self.grid:
+        self.raise_item( item)
+    self.order_stale = False
+
+
+  def sort( self, items):
+    """sorts items from bottom to top"""
+    return sorted( items, key=lambda i: self._order.get( i, 0))
+
+
+  # queries
+  def find_overlapping( self, x1, y1, x2, y2):
+    """returns unsorted list of items overlapping the given rectangle"""
+    return [i for i in self.grid.query( (x1, y1, x2, y2))
+              if i not in self._shapes or _shape_overlaps( self._shapes[i], (x1, y1, x2, y2))]
+
+
+  def find_enclosed( self, x1, y1, x2, y2):
+    """returns unsorted list of items completely inside the given rectangle"""
+    return list( self.grid.query_enclosed( (x1, y1, x2, y2)))
+
+
+
+def _shape_overlaps( shape, rect):
+  """exact test if a shape overlaps rect"""
+  kind, coords, width = shape
+  x1, y1, x2, y2 = rect
+  cx, cy = (x1+x2)/2.0, (y1+y2)/2.0
+  r = max( abs( x2-x1), abs( y2-y1)) / 2.0
+  points = list( zip( coords[0::2], coords[1::2]))
+  if kind == 'line':
+    if len( points) == 1:
+      points = points * 2
+    segments = zip( points[:-1], points[1:])
+  else:
+    segments = zip( points, points[1:] + points[:1])
+  if kind == 'polygon' and _point_in_polygon( cx, cy, points):
+    return True
+  if kind == 'hollow':
+    # rectangle or oval without fill, only its outline is sensitive
+    px1, py1 = points[0]
+    px2, py2 = points[-1]
+    points = [(px1,py1), (px2,py1), (px2,py2), (px1,py2)]
+    segments = zip( points, points[1:] + points[:1])
+  limit = r + width/2.0
+  for (ax, ay), (bx, by) in segments:
+    if _point_segment_distance( cx, cy, ax, ay, bx, by) <= limit:
+      return True
+  return False
+
+
+
+def _point_segment_distance( x, y, ax, ay, bx, by):
+  dx, dy = bx-ax, by-ay
+  l2 = dx*dx + dy*dy
+  if l2 == 0:
+    return math.sqrt( (x-ax)**2 + (y-ay)**2)
+  t = max( 0.0, min( 1.0, ((x-ax)*dx + (y-ay)*dy) / l2))
+  return math.sqrt( (x-ax-t*dx)**2 + (y-ay-t*dy)**2)
+
+
+
+def _point_in_polygon( x, y, points):
+  inside = False
+  n = len( points)
+  for i in range( n):
+    ax, ay = points[i]
+    bx, by = points[i-1]
+    if (ay > y) != (by > y) and x < (bx-ax) * (y-ay) / float( by-ay) + ax:
+      inside = not inside
+  return inside
+
+
+
+def coincident_pairs( objects, tolerance, key=None):
+  """Returns list of pairs (a, b) of objects whose x and y coordinates
+  both differ by less than tolerance.
+
+  Objects are bucketed by their rounded coordinates, so that only
+  objects in neighboring buckets are compared. In each pair a precedes b
+  in the input sequence and the pairs are ordered as a nested loop over
+  the input would produce them. key is an optional function returning
+  the (x, y) of an object, by default its x and y attributes are used.
+  """
+  objects = list( objects)
+  if key is None:
+    key = lambda o: (o.x, o.y)
+  coords = [key( o) for o in objects]
+  buckets = {}
+  for i, (x, y) in enumerate( coords):
+    buckets.setdefault( (int( math.floor( x / tolerance)), int( math.floor( y / tolerance))), []).append( i)
+  pairs = []
+  for i, (x, y) in enumerate( coords):
+    bx, by = int( math.floor( x / tolerance)), int( math.floor( y / tolerance))
+    near = []
+    for cx in (bx-1, bx, bx+1):
+      for cy in (by-1, by, by+1):
+        for j in buckets.get( (cx, cy), ()):
+          if j > i and abs( coords[j][0] - x) < tolerance and abs( coords[j][1] - y) < tolerance:
+            near.append( j)
+    near.sort()
+    pairs.extend( [(objects[i], objects[j]) for j in near])
+  return pairs
@@ -20,18 +20,13 @@
 import oasa
 import operator
 import xml.dom.minidom as dom
-try:
-  import tkinter.font as tkFont
-except ImportError:
-  import tkFont
-
 from oasa import geometry
 from math import sin, cos, sqrt, pi
 
 import misc
 import marks
 
-from ftext import ftext
+from ftext import ftext, get_font, get_font_metrics
 from tuning import Tuning
 from singleton_store import Store, Screen
 from parents import meta_enabled, area_colored, point_drawable, text_like, child_with_paper
@@ -152,6 +147,7 @@ class vertex_common(object):
 
 
   def _set_mark_helper( self, mark, sign=1):
+    self._flush_molecule_cache()
     mark_name, _ = self._mark_to_name_and_class( mark)
     if mark_name == "atom_number":
       if not self.get_marks_by_type( "atom_number"):
@@ -320,6 +316,27 @@ class drawable_chem_vertex(oasa.chem_vertex,
     self.focus_item = None
 
 
+  # Override of drawable.dirty
+  @property
+  def dirty(self):
+    return point_drawable.dirty.__get__(self)
+
+
+  @dirty.setter
+  def dirty(self, dirty):
+    point_drawable.dirty.__set__(self, dirty)
+    if dirty:
+      self._flush_molecule_cache()
+      self._schedule_redraw_if_drawn()
+
+
+  def _flush_molecule_cache( self):
+    """data cached on the molecule are no longer valid when the vertex changes"""
+    mol = getattr( self, '_molecule', None)
+    if mol is not None:
+      mol.flush_oasa_cache()
+
+
   @property
   def molecule(self):
     return self._molecule
@@ -338,6 +355,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
   @x.setter
   def x( self, x):
     self._x = Screen.any_to_px( x)
+    self._flush_molecule_cache()
 
 
   @property
@@ -348,6 +366,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
   @y.setter
   def y(self, y):
     self._y = Screen.any_to_px( y)
+    self._flush_molecule_cache()
 
 
   @property
@@ -358,6 +377,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
   @z.setter
   def z(self, z):
     self._z = z
+    self._flush_molecule_cache()
 
 
   @property
@@ -466,7 +486,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
     x1, y1, x2, y2 = self.ftext.bbox( complete=complete)
     self.item = self.paper.create_rectangle( x1, y1, x2, y2, fill='', outline='', tags=('atom','no_export'))
     ## shrink the selector according to the font size and properties
-    hack_y = self.font.metrics()['descent'] - 1
+    hack_y = self.font_metrics.metrics['descent'] - 1
     self.selector = self.paper.create_rectangle( x1, y1, x2, y2-hack_y, fill=self.area_color, outline='',tags=('helper_a','no_export'))
     if not redraw:
       [m.draw() for m in self.marks]
@@ -475,6 +495,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
     self.paper.lift( self.item)
     self.paper.register_id( self.item, self)
     self._reposition_on_redraw = 0
+    self.dirty = 0
 
 
   def redraw( self, suppress_reposition=0):
@@ -526,7 +547,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
   def move( self, dx, dy, dont_move_marks=False):
     """moves object with his selector (when present)"""
     # saving old dirty value
-    # d = self.dirty
+    d = self.dirty
     self.x += dx
     self.y += dy
     if self.drawn:
@@ -539,7 +560,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
         for m in self.marks:
           m.move( dx, dy)
     # restoring dirty value because move does not dirty the atom
-    # self.dirty = d
+    self.dirty = d
 
 
   def move_to( self, x, y, dont_move_marks=False):
@@ -598,7 +619,13 @@ class drawable_chem_vertex(oasa.chem_vertex,
 
 
   def update_font( self):
-    self.font = tkFont.Font( family=self.font_family, size=self.font_size)
+    self.font = get_font( self.font_family, self.font_size)
+
+
+  @property
+  def font_metrics(self):
+    """shared ftext.font_metrics for the font of self"""
+    return get_font_metrics( self.font_family, self.font_size)
 
 
   def scale_font( self, ratio):
@@ -634,7 +661,7 @@ class drawable_chem_vertex(oasa.chem_vertex,
     if self.item:
       box = self.paper.bbox( self.item)
       if substract_font_descent and self.show:
-        hack_y = self.font.metrics()['descent']
+        hack_y = self.font_metrics.metrics['descent']
         x1, y1, x2, y2 = map( operator.add, box, Tuning.Screen.drawable_chem_vertex_bbox_mod_after_descent_removal)
         box =  x1, y1, x2, y2-hack_y
       #if Store.app.in_batch_mode:
@@ -645,14 +672,15 @@ class drawable_chem_vertex(oasa.chem_vertex,
       return box
     else:
       # we have to calculate it, the atoms was not drawn yet
-      length = self.font.measure( self.text)
+      fm = self.font_metrics
+      length = fm.measure( self.text)
+      descent = fm.metrics['descent']
+      ascent = fm.metrics['ascent']
       if self.pos == 'center-first':
-        dx = self.font.measure( self.text[0]) / 2
-        descent = self.font.metrics()['descent']
-        ascent = self.font.metrics()['ascent']
+        dx = fm.measure( self.text[0]) / 2
         return (self.x + length - dx, self.y + descent, self.x - dx, self.y - ascent)
       else:
-        dx = self.font.measure( self.text[-1]) / 2
+        dx = fm.measure( self.text[-1]) / 2
         return (self.x + dx, self.y + descent, self.x - length + dx, self.y - ascent)
 
 
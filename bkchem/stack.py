@@ -0,0 +1,153 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""The stack of top level objects of the paper.
+
+"""
+
+import collections
+
+
+
+class top_level_stack(list):
+  """List of the top levels in their stacking order (from bottom to top).
+
+  Besides being a normal list it keeps the top levels indexed by their
+  kind (see get_kind), so that the top levels of one kind are found
+  without scanning the whole stack, and makes the in test constant
+  time. Appending and removing update the index, other changes of the
+  order rebuild it.
+  """
+  vector_types = ('vector', 'rect', 'oval', 'polygon', 'polyline')
+
+  def __init__( self, items=()):
+    list.__init__( self, items)
+    self._reindex()
+
+
+  def __copy__( self):
+    return self.__class__( self)
+
+
+  @classmethod
+  def get_kind( cls, o):
+    """returns the kind under which o is indexed - its object_type,
+    all vector graphics items are of the kind 'vector'"""
+    if o.object_type in cls.vector_types:
+      return 'vector'
+    return o.object_type
+
+
+  def _reindex( self):
+    self._members = {}
+    self._kinds = {}
+    for o in self:
+      self._add( o)
+
+
+  def _add( self, o):
+    self._members[ o] = self._members.get( o, 0) + 1
+    self._kinds.setdefault( self.get_kind( o), collections.OrderedDict())[ o] = True
+
+
+  def _remove( self, o):
+    n = self._members.pop( o)
+    if n > 1:
+      # the object is in the stack more times, the order must be found again
+      self._reindex()
+    else:
+      del self._kinds[ self.get_kind( o)][ o]
+
+
+  def of_kind( self, kind):
+    """returns list of top levels of the given kind in the stacking order"""
+    return list( self._kinds.get( kind, ()))
+
+
+  def __contains__( self, o):
+    return o in self._members
+
+
+  # methods changing the list
+  def append( self, o):
+    list.append( self, o)
+    if o in self._members:
+      self._reindex()
+    else:
+      self._add( o)
+
+
+  def extend( self, items):
+    for o in items:
+      self.append( o)
+
+
+  def __iadd__( self, items):
+    self.extend( items)
+    return self
+
+
+  def remove( self, o):
+    list.remove( self, o)
+    self._remove( o)
+
+
+  def pop( self, *args):
+    o = list.pop( self, *args)
+    self._remove( o)
+    return o
+
+
+  def insert( self, i, o):
+    list.insert( self, i, o)
+    self._reindex()
+
+
+  def __setitem__( self, i, o):
+    list.__setitem__( self, i, o)
+    self._reindex()
+
+
+  def __delitem__( self, i):
+    list.__delitem__( self, i)
+    self._reindex()
+
+
+  def __setslice__( self, i, j, items):
+    list.__setslice__( self, i, j, items)
+    self._reindex()
+
+
+  def __delslice__( self, i, j):
+    list.__delslice__( self, i, j)
+    self._reindex()
+
+
+  def clear( self):
+    del self[:]
+
+
+  def sort( self, *args, **kw):
+    list.sort( self, *args, **kw)
+    self._reindex()
+
+
+  def reverse( self):
+    list.reverse( self)
+    self._reindex()
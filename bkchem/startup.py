@@ -0,0 +1,286 @@
+#--------------------------------------------------------------------------
+#     This file is part of BKChem - a chemical drawing program
+#     Copyright (C) 2002-2009 Beda Kosata <beda@zirael.org>
+
+#     This program is free software; you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation; either version 2 of the License, or
+#     (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+
+#     Complete text of GNU GPL can be found in the file gpl.txt in the
+#     main directory of the program
+
+#--------------------------------------------------------------------------
+
+"""Support for lazy initialization.
+
+The registries (templates, plugins, external data definitions) load their
+files on first use. file_cache keeps the data read from such files on disk,
+so that unchanged files do not have to be parsed again.
+
+timed (or begin and end) records how long the startup phases took, the
+phases form a tree. With profile_imports the first import of each module
+is recorded as well. The tree can be written to JSON and compared with
+a baseline - this is what bkchem --profile-startup does.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import tempfile
+import contextlib
+import collections
+
+from warnings import warn
+
+try:
+  import builtins
+except ImportError:
+  import __builtin__ as builtins
+
+import os_support
+
+
+
+class phase(object):
+  """Node of the tree of timed phases."""
+  def __init__( self, name):
+    self.name = name
+    self.time = 0.0
+    self.calls = 0
+    self.children = collections.OrderedDict()
+    self._start = None
+
+
+  def get_child( self, name):
+    if name not in self.children:
+      self.children[ name] = phase( name)
+    return self.children[ name]
+
+
+  def as_dict( self):
+    return {'name': self.name,
+            'time': round( self.time, 6),
+            'calls': self.calls,
+            'children': [ch.as_dict() for ch in self.children.values()]}
+
+
+
+root = phase( "startup")
+root._start = time.time()
+_stack = [root]
+
+
+def begin( name):
+  """starts timing of phase name inside the current phase"""
+  p = _stack[-1].get_child( name)
+  p._start = time.time()
+  _stack.append( p)
+
+
+def end():
+  """ends timing of the current phase"""
+  p = _stack.pop()
+  p.time += time.time() - p._start
+  p.calls += 1
+
+
+@contextlib.contextmanager
+def timed( name):
+  """context manager timing the phase name"""
+  begin( name)
+  try:
+    yield
+  finally:
+    end()
+
+
+def report():
+  """returns the startup report as text"""
+  lines = []
+  def _add( p, level):
+    lines.append( "%-40s %8.1f ms %4dx" % ("  "*level + p.name, 1000*p.time, p.calls))
+    for ch in p.children.values():
+      _add( ch, level+1)
+  for p in root.children.values():
+    _add( p, 0)
+  return "\n".join( lines)
+
+
+
+## PROFILING OF STARTUP
+
+def profile_imports():
+  """records the first import of each module as a phase"""
+  original = builtins.__import__
+  def _import( name, *args, **kw):
+    if name in sys.modules:
+      return original( name, *args, **kw)
+    with timed( "import " + (name or ".")):
+      return original( name, *args, **kw)
+  builtins.__import__ = _import
+
+
+def parse_profile_options( argv):
+  """removes --profile-startup OUTPUT and --profile-baseline BASELINE from
+  argv and returns (OUTPUT, BASELINE), or None when not profiling"""
+  values = {}
+  for opt in ("--profile-startup", "--profile-baseline"):
+    if opt in argv:
+      i = argv.index( opt)
+      values[ opt] = i+1 < len( argv) and argv[i+1] or None
+      del argv[i:i+2]
+  if "--profile-startup" not in values:
+    return None
+  return values["--profile-startup"], values.get( "--profile-baseline")
+
+
+def compare( data, baseline, tolerance=0.2, min_difference=0.01):
+  """returns list of (path, baseline time, time) of phases that take more
+  than (1+tolerance) times longer than in baseline, differences smaller
+  than min_difference seconds are ignored"""
+  def _flatten( d, prefix=""):
+    path = prefix and prefix + "/" + d['name'] or d['name']
+    yield path, d['time']
+    for ch in d['children']:
+      for x in _flatten( ch, path):
+        yield x
+  base = dict( _flatten( baseline['phases']))
+  ret = []
+  for path, t in _flatten( data['phases']):
+    if path in base and t > base[ path] * (1+tolerance) and t - base[ path] > min_difference:
+      ret.append( (path, base[ path], t))
+  return ret
+
+
+def finish_profile( output, baseline=None):
+  """writes the recorded phases to the file output as JSON and compares
+  them to baseline (a file written the same way); returns exit status -
+  1 when a regression was found, 0 otherwise"""
+  root.time = time.time() - root._start
+  root.calls = 1
+  data = {'python': platform.python_version(),
+          'platform': sys.platform,
+          'phases': root.as_dict()}
+  if output and output != "-":
+    with open( output, 'w') as f:
+      json.dump( data, f, indent=1)
+  else:
+    print( json.dumps( data, indent=1))
+  if not baseline:
+    return 0
+  with open( baseline) as f:
+    regressions = compare( data, json.load( f))
+  for path, old, new in regressions:
+    print( "startup regression: %s %.1f ms -> %.1f ms" % (path, 1000*old, 1000*new), file=sys.stderr)
+  return regressions and 1 or 0
+
+
+
+class file_cache(object):
+  """On-disk cache of data computed from files.
+
+  The data are stored together with the modification time and size of the
+  file they were computed from and are recomputed when the file changes.
+  key is an optional value (such as the language) the data depend on.
+  The new data are written to the disk by save, the users call it once
+  after they have read all their files. format identifies the structure
+  of the data, a cache written with another format is not used.
+  """
+  version = 2
+
+  def __init__( self, name, format=1):
+    self.name = name
+    self.format = format
+    self._data = None
+    self._changed = False
+
+
+  def get_filename( self):
+    return os.path.join( os_support.get_bkchem_private_dir(), 'cache', self.name + '.cache')
+
+
+  def _load( self):
+    self._data = {}
+    path = self.get_filename()
+    if not os.path.exists( path):
+      return
+    try:
+      with open( path, 'rb') as f:
+        header = pickle.load( f)
+        # written by other version or for other format of the data
+        if header != (self.version, self.format):
+          return
+        self._data = pickle.load( f)
+    except Exception as e:
+      self._data = {}
+      warn( "cache %s cannot be read, it will be rebuilt: %s" % (path, e))
+
+
+  def get( self, filename, compute, key=None):
+    """returns compute( filename) for the current state of the file"""
+    if self._data is None:
+      self._load()
+    filename = os.path.abspath( filename)
+    try:
+      st = os.stat( filename)
+      stamp = (st.st_mtime, st.st_size, key)
+    except OSError:
+      return compute( filename)
+    cached = self._data.get( filename)
+    if cached and cached[0] == stamp:
+      return cached[1]
+    value = compute( filename)
+    self._data[ filename] = (stamp, value)
+    self._changed = True
+    return value
+
+
+  def forget( self, filename):
+    """drops the data computed from filename, they are computed again on
+    the next get"""
+    if self._data is None:
+      self._load()
+    if self._data.pop( os.path.abspath( filename), None) is not None:
+      self._changed = True
+
+
+  def save( self):
+    """writes the cache to the disk when it changed; the cache is optional,
+    so errors only produce a warning"""
+    if not self._changed:
+      return
+    self._changed = False
+    path = self.get_filename()
+    dirname = os.path.dirname( path)
+    tmp = None
+    try:
+      if not os.path.isdir( dirname):
+        os.makedirs( dirname)
+      # other running instances may write the same cache
+      fd, tmp = tempfile.mkstemp( prefix=self.name+'.', suffix='.tmp', dir=dirname)
+      with os.fdopen( fd, 'wb') as f:
+        pickle.dump( (self.version, self.format), f, 2)
+        pickle.dump( self._data, f, 2)
+      if hasattr( os, 'replace'):
+        os.replace( tmp, path)
+      else:
+        if os.name == 'nt' and os.path.exists( path):
+          os.remove( path)
+        os.rename( tmp, path)
+      tmp = None
+    except (IOError, OSError, pickle.PicklingError) as e:
+      warn( "cache %s cannot be written: %s" % (path, e))
+    finally:
+      if tmp and os.path.exists( tmp):
+        os.remove( tmp)
@@ -24,6 +24,7 @@
 import math
 import os.path
 import xml.sax
+import xml.parsers.expat
 import xml.dom.minidom as dom
 
 from warnings import warn
@@ -31,63 +32,107 @@ from oasa.transform import transform
 
 import misc
 import config
+import startup
 import os_support
 
+from bond import bond
+from atom import atom
 from molecule import molecule
 from singleton_store import Store, Screen
 
 
 
 class template_manager(object):
-  templates = []
+  """Templates are read from the files on first use, the data needed to
+  build them are kept in a cache on disk."""
 
   def __init__( self):
-    self.templates = []
-    self._prepared_templates = []
+    self._pending = []   # files added but not read yet
+    self._entries = []   # (file, index in file, name, compiled_template or None)
+    self._prepared_templates = {}
 
 
   def add_template_from_CDML( self, file):
     if not os.path.isfile( file):
-      file = os_support.get_path( file, "template")
-      if not file:
+      path = os_support.get_path( file, "template")
+      if not path:
         warn( "template file %s does not exist - ignoring" % file)
         return
-    try:
-      doc = dom.parse( file).getElementsByTagName( 'cdml')[0]
-    except xml.sax.SAXException:
-      warn( "template file %s cannot be parsed - ignoring" % file)
-      return
-    # when loading old versions of CDML try to convert them, but do nothing when they cannot be converted
-    import CDML_versions
-    CDML_versions.transform_dom_to_version( doc, config.current_CDML_version)
-    Store.app.paper.onread_id_sandbox_activate()
-    added = []
-    for tmp in doc.getElementsByTagName('molecule'):
-      self.templates.append( tmp)
-      m = molecule( Store.app.paper, package=tmp)
-      self._prepared_templates.append( m)
-      added.append( m)
-    Store.app.paper.onread_id_sandbox_finish( apply_to=[]) # just switch the id_managers, no id mangling
+      file = path
+    self._pending.append( os.path.abspath( file))
+
+
+  def _load( self):
+    """reads the files added since the last call"""
+    while self._pending:
+      file = self._pending.pop( 0)
+      with startup.timed( "templates"):
+        try:
+          templates = _template_cache.get( file, _read_template_file, key=config.current_CDML_version)
+        except (xml.sax.SAXException, xml.parsers.expat.ExpatError):
+          warn( "template file %s cannot be parsed - ignoring" % file)
+          continue
+      for i, (name, data) in enumerate( templates):
+        self._entries.append( (file, i, name, data and compiled_template( *data)))
+    _template_cache.save()
+
+
+  @property
+  def templates(self):
+    """List of CDML elements of the templates.
+
+    """
+    return [self.get_template( n) for n in range( len( self.get_template_names()))]
 
 
   def get_template( self, n):
-    return self.templates[n]
+    self._load()
+    file, i = self._entries[n][:2]
+    return _get_template_packages( file)[i]
+
+
+  def _get_prepared_template( self, n):
+    """returns molecule for template n, it is used to get information
+    about the template only"""
+    if n not in self._prepared_templates:
+      compiled = self.get_compiled_template( n)
+      paper = Store.app.paper
+      paper.onread_id_sandbox_activate()
+      if compiled:
+        m = compiled.build( paper)
+      else:
+        m = molecule( paper, package=self.get_template( n))
+      paper.onread_id_sandbox_finish( apply_to=[]) # just switch the id_managers, no id mangling
+      self._prepared_templates[ n] = m
+    return self._prepared_templates[ n]
 
 
   def get_templates_valency( self, name):
-    return self._prepared_templates[ name].next_to_t_atom.occupied_valency -1
+    return self._get_prepared_template( name).next_to_t_atom.occupied_valency -1
 
 
   def get_template_names( self):
-    return [o.name for o in self._prepared_templates]
+    self._load()
+    return [e[2] for e in self._entries]
+
+
+  def get_compiled_template( self, n):
+    """returns compiled_template for template n or None if it could not be compiled"""
+    self._load()
+    return self._entries[n][3]
 
 
   def get_transformed_template( self, n, coords, type='empty', paper=None):
     """type is type of connection - 'bond', 'atom1'(for single atom), 'atom2'(for atom with more than 1 bond), 'empty'"""
     pap = paper or Store.app.paper
-    pap.onread_id_sandbox_activate() # must be here to mangle the ids
-    current = molecule( pap, package=self.templates[n])
-    pap.onread_id_sandbox_finish( apply_to= [current]) # id mangling
+    compiled = self.get_compiled_template( n)
+    if compiled:
+      # ids are generated on demand, no sandbox is needed
+      current = compiled.build( pap)
+    else:
+      pap.onread_id_sandbox_activate() # must be here to mangle the ids
+      current = molecule( pap, package=self.get_template( n))
+      pap.onread_id_sandbox_finish( apply_to= [current]) # id mangling
     current.name = ''
     self._scale_ratio = 1
     trans = transform()
@@ -139,8 +184,10 @@ class template_manager(object):
 
 
   def transform_template( self, temp, trans):
+    coords = temp.get_coordinates()
+    coords.transform( trans)
+    coords.apply()
     for a in temp.atoms:
-      a.x, a.y = trans.transform_xy( a.x, a.y)
       a.scale_font( self._scale_ratio)
     for b in temp.bonds:
       if b.order != 1:
@@ -150,3 +197,150 @@ class template_manager(object):
     # return the ready template
     return temp
 
+
+
+# data read from template files are shared by all template managers,
+# format must be raised when the data of compiled_template change
+_template_cache = startup.file_cache( "templates", format=2)
+_template_packages = {}
+
+
+def _get_template_packages( file):
+  """returns list of CDML elements of the molecules in file"""
+  if file not in _template_packages:
+    doc = dom.parse( file).getElementsByTagName( 'cdml')[0]
+    # when loading old versions of CDML try to convert them, but do nothing when they cannot be converted
+    import CDML_versions
+    CDML_versions.transform_dom_to_version( doc, config.current_CDML_version)
+    _template_packages[ file] = doc.getElementsByTagName( 'molecule')
+  return _template_packages[ file]
+
+
+def _read_template_file( file):
+  """returns list of (name, data of compiled_template or None) for the
+  templates in file"""
+  ret = []
+  for package in _get_template_packages( file):
+    compiled = compiled_template.compile( package)
+    ret.append( (package.getAttribute( 'name'), compiled and compiled.get_data()))
+  return ret
+
+
+
+class compiled_template(object):
+  """Template molecule read from CDML once and kept as plain data.
+
+  Only molecules made of atoms and bonds described by the attributes in
+  atom_attributes and bond_attributes are compiled, compile returns None
+  for the others and they are read from CDML every time.
+  """
+  atom_attributes = ('id', 'name', 'pos', 'charge', 'hydrogens', 'show',
+                     'multiplicity', 'valency', 'free_sites')
+  bond_attributes = ('id', 'type', 'start', 'end', 'bond_width', 'line_width', 'wedge_width',
+                     'center', 'color', 'double_ratio', 'simple_double', 'auto_sign', 'equithick')
+
+  def __init__( self, name, atoms, bonds, anchors):
+    self.name = name
+    self.atoms = atoms       # list of (attributes, (x, y, z) as in CDML)
+    self.bonds = bonds       # list of (index of start atom, index of end atom, attributes)
+    self.anchors = anchors   # indexes of t_atom, t_bond_first, t_bond_second (or None)
+
+
+  def get_data( self):
+    """returns the arguments needed to create the same compiled_template"""
+    return self.name, self.atoms, self.bonds, self.anchors
+
+
+  @classmethod
+  def compile( cls, package):
+    ids = {}
+    atoms = []
+    bonds = []
+    anchors = (None, None, None)
+    for el in package.childNodes:
+      if el.nodeType != el.ELEMENT_NODE:
+        continue
+      attrs = dict( el.attributes.items())
+      children = [ch for ch in el.childNodes if ch.nodeType == ch.ELEMENT_NODE]
+      if el.localName == 'atom':
+        if set( attrs) - set( cls.atom_attributes) or [ch.localName for ch in children] != ['point']:
+          return None
+        ids[ attrs.get( 'id')] = len( atoms)
+        atoms.append( (attrs, tuple( children[0].getAttribute( a) for a in 'xyz')))
+      elif el.localName == 'bond':
+        if set( attrs) - set( cls.bond_attributes) or children:
+          return None
+        bonds.append( attrs)
+      elif el.localName == 'template':
+        anchors = tuple( attrs.get( a) for a in ('atom', 'bond_first', 'bond_second'))
+      else:
+        return None
+    try:
+      bonds = [(ids[ b['start']], ids[ b['end']], b) for b in bonds]
+      anchors = tuple( ids[ a] if a else None for a in anchors)
+    except KeyError:
+      return None
+    if anchors[0] is None:
+      return None
+    return cls( package.getAttribute( 'name'), atoms, bonds, anchors)
+
+
+  def build( self, paper):
+    """returns new molecule created from the template, the same way
+    molecule.read_package would create it"""
+    std = paper.standard
+    ratio = paper.real_to_screen_ratio()
+    mol = molecule( paper)
+    mol.name = self.name
+    atms = []
+    for attrs, point in self.atoms:
+      x, y, z = Screen.any_to_px( list( point))
+      a = atom( standard=std, molecule=mol)
+      a.pos = attrs.get( 'pos', '')
+      if z is not None:
+        a.z = z * ratio
+      a.x, a.y = paper.real_to_screen_coords( (x, y))
+      a.set_name( attrs.get( 'name', ''), check_valency=0)
+      a.charge = int( attrs.get( 'charge') or 0)
+      a.show_hydrogens = attrs.get( 'hydrogens') or 0
+      a.show = attrs.get( 'show') or (a.symbol != 'C')
+      if attrs.get( 'multiplicity'):
+        a.multiplicity = int( attrs['multiplicity'])
+      if attrs.get( 'valency'):
+        a.valency = int( attrs['valency'])
+      if attrs.get( 'free_sites'):
+        a.free_sites = int( attrs['free_sites'])
+      mol.insert_atom( a)
+      atms.append( a)
+    yes_no = ['no', 'yes']
+    for i1, i2, attrs in self.bonds:
+      type = attrs.get( 'type') or 'n1'
+      b = bond( standard=std, atoms=(atms[i1], atms[i2]), molecule=mol, type=type[0], order=int( type[1]))
+      if attrs.get( 'bond_width'):
+        b.bond_width = float( attrs['bond_width']) * ratio
+      if attrs.get( 'line_width'):
+        b.line_width = float( attrs['line_width'])
+      if attrs.get( 'wedge_width'):
+        b.wedge_width = float( attrs['wedge_width'])
+      if attrs.get( 'center'):
+        b.center = yes_no.index( attrs['center'])
+      else:
+        b.center = None
+      if attrs.get( 'color'):
+        b.line_color = attrs['color']
+      if attrs.get( 'double_ratio'):
+        b.double_length_ratio = float( attrs['double_ratio'])
+      if attrs.get( 'simple_double'):
+        b.simple_double = int( attrs['simple_double'])
+      if attrs.get( 'auto_sign'):
+        b.auto_bond_sign = int( attrs['auto_sign'])
+      b.equithick = int( attrs.get( 'equithick') or 0)
+      mol.add_edge( b.atom1, b.atom2, b)
+    t_atom, first, second = self.anchors
+    mol.t_atom = atms[ t_atom]
+    if first is not None and second is not None:
+      mol.t_bond_first = atms[ first]
+      mol.t_bond_second = atms[ second]
+    mol.next_to_t_atom = mol.t_atom.neighbors[0]
+    [a.raise_valency_to_senseful_value() for a in mol.vertices]
+    return mol
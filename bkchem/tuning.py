@@ -36,8 +36,14 @@ class Tuning(object):
         drawable_chem_vertex_bbox_mod_after_descent_removal = (0,0,0,1)
 
         # do not edit this! (unless you know what you are doing)
+        _best_values = {}
+
         @classmethod
         def pick_best_value( self, name, font_size):
+            try:
+                return self._best_values[ (name, font_size)]
+            except KeyError:
+                pass
             if not hasattr( self, name):
                 raise AttributeError("attribute %s does not exist" % name)
             d = getattr( self, name)
@@ -45,12 +51,8 @@ class Tuning(object):
             if font_size in d:
                 return d[font_size]
             # it isn't
-            keys = d.keys()
-            diffs = [abs(k-font_size) for k in keys]
-            best_i = diffs.index( min( diffs))
-            best_key = keys[best_i]
-            #d[font_size] = d[best_key]
-            #print("cache miss", font_size, d[best_key])
+            best_key = min( sorted( d.keys()), key=lambda k: abs(k-font_size))
+            self._best_values[ (name, font_size)] = d[best_key]
             return d[best_key]
 
 
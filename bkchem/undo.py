@@ -27,10 +27,11 @@ exported in __all__.
 ## NOTE that undo uses a low-level access to objects in order to
 ## speed up the task.
 
+import sys
 import copy
 import inspect
 
-import misc
+from stack import top_level_stack
 
 
 
@@ -41,32 +42,70 @@ __all__= ['undo_manager']
 class undo_manager(object):
   """Class to process requests for undo tracking and undoing.
 
+  Records are stored as deltas - each record shares the per-object
+  state of objects that did not change with the preceding record, so
+  only the changed objects cost memory and time. The changes are tracked
+  by note_change - objects call it when they are marked dirty and the
+  paper when their canvas items are created, changed or deleted. The
+  number of records kept is limited by MAX_MEMORY (an estimate in bytes)
+  instead of a fixed count.
+
+  revision is increased on every change of the recorded state (new record,
+  undo, redo, clean), so it can be used to find out if the paper changed.
   """
-  MAX_RECORDS = 50
+  MAX_MEMORY = 32*1024*1024
+  MIN_RECORDS = 2
 
   def __init__( self, paper):
     """well, init"""
     self.paper = paper
     self._records = []
+    self._changed = set()
+    self.revision = 0
     self.clean()
     self.start_new_record()
 
+  def note_change( self, o):
+    """notes that the object o changed since the last record was taken"""
+    self._changed.add( o)
+
+
   def start_new_record( self, name=''):
     """starts new undo_record closing the recent
     name may be set for a record"""
     if len( self._records)-1 > self._pos:
       del self._records[ (self._pos+1):]
-    if len( self._records) >= self.MAX_RECORDS:
+    if self._pos >= 0:
+      previous = self._records[ self._pos]
+    else:
+      previous = None
+    # changes made while recording (ids generated on demand) go to the next record
+    changed, self._changed = self._changed, set()
+    self._records.append( state_record( self.paper, name=name, previous=previous, changed=changed))
+    self._pos += 1
+    self.revision += 1
+    self._trim_to_memory_budget()
+
+
+  def _trim_to_memory_budget( self):
+    """removes the oldest records until the memory estimate fits into MAX_MEMORY"""
+    size = self.get_memory_usage()
+    while size > self.MAX_MEMORY and len( self._records) > self.MIN_RECORDS:
+      size -= self._records[0].size
       del self._records[0]
       self._pos -= 1
-    self._records.append( state_record( self.paper, name=name))
-    self._pos += 1
+
+
+  def get_memory_usage( self):
+    """returns the estimated number of bytes occupied by all the records"""
+    return sum( [rec.size for rec in self._records])
 
   def undo( self):
     """undoes the last step and returns the number of undo records available"""
     self._pos -= 1
+    self.revision += 1
     if self._pos >= 0:
-      self._records[ self._pos].undo( self._records[ self._pos+1])
+      self._set_state( self._records[ self._pos], self._records[ self._pos+1])
     else:
       self._pos = 0
     return self._pos
@@ -74,15 +113,24 @@ class undo_manager(object):
   def redo( self):
     """redoes the last undone step, returns number of redos available"""
     self._pos += 1
+    self.revision += 1
     if self._pos < len( self._records):
-      self._records[ self._pos].undo( self._records[ self._pos-1])
+      self._set_state( self._records[ self._pos], self._records[ self._pos-1])
     else:
       self._pos = len( self._records)-1
     return len( self._records) - self._pos -1
 
+  def _set_state( self, record, previous):
+    changed, self._changed = self._changed, set()
+    record.undo( previous, changed=changed)
+    # the paper is now in the state of record, the changes done by undo itself do not count
+    self._changed = set()
+
   def clean( self):
     """removes all undo informations, does not start new undo record"""
     self._pos = -1
+    self.revision += 1
+    self._changed = set()
     for record in self._records:
       record.clean()
     del self._records
@@ -123,16 +171,16 @@ class undo_manager(object):
 
   def compare_records( self, o, state_rec1, state_rec2):
     """returns True if the object o changed between ref1 and ref2"""
-    x1 = o in state_rec1.objects
-    x2 = o in state_rec2.objects
+    x1 = state_rec1.has_object( o)
+    x2 = state_rec2.has_object( o)
     if (x1 and not x2) or (x2 and not x1):
       # one record does not have o
       return False
     if not x1 and not x2:
       # no record has o - they are the same then
       return True
-    rec1 = state_rec1.records[ state_rec1.objects.index( o)]
-    rec2 = state_rec2.records[ state_rec2.objects.index( o)]
+    rec1 = state_rec1.get_record( o)
+    rec2 = state_rec2.get_record( o)
     for a in o.meta__undo_fake + o.meta__undo_simple + o.meta__undo_properties:
       if rec1[a] != rec2[a]:
         return False
@@ -176,117 +224,132 @@ class undo_manager(object):
 class state_record(object):
   """Class for storing and setting state of the whole system.
 
+  The state is kept in groups, one for each top level object together
+  with its children (atoms, bonds, marks, points...). When previous record
+  is given only the objects reported as changed since it was taken (see
+  undo_manager.note_change) are recorded again, the state of the other
+  objects is shared with it; groups of top levels with no changed object
+  are shared as a whole.
   """
-  def __init__( self, paper, name=''):
-    """hmmm, what is supposed to be in comment for __init__?"""
+  def __init__( self, paper, name='', previous=None, changed=None):
+    """changed is the set of objects changed since previous was taken,
+    None means that everything is recorded again"""
     self.paper = paper
-    self.objects = []
-    self.records = []
+    self.groups = {}
+    self.top_levels = []
     self.name = name
     self.stack = []
-    self.record_state()
+    self.size = 0
+    self.changed = 0
+    self.record_state( previous=previous, changed=changed)
 
 
   def clean( self):
     del self.stack
     del self.paper
-    del self.objects
-    del self.records
+    del self.groups
+    del self.top_levels
     del self.name
 
 
-  def record_state( self):
+  def record_state( self, previous=None, changed=None):
     """stores all necessary information about the system, so that its than able to
     fully recover that state."""
-    self.stack = copy.copy( self.paper.stack)
+    # a plain list, the index of the stack is rebuilt on undo
+    self.stack = list( self.paper.stack)
 
+    if changed is not None:
+      changed_by_top = {}
+      for o in changed:
+        changed_by_top.setdefault( _top_level_of( o), []).append( o)
     for o in self.paper.top_levels:
-      self.record_object( o)
-
-
-  def record_object( self, o):
-    rec = {}
-    for a in o.meta__undo_fake:
-      rec[a] = getattr( o, a)
-    for a in o.meta__undo_simple:
-      rec[a] = getattr( o, a)
-    for a in o.meta__undo_properties:
-      rec[a] = getattr( o, a)
-    for a in o.meta__undo_copy:
-      rec[a] = copy.copy( o.__dict__[a])
-    self.objects.append( o)
-    self.records.append( rec)
-    # process the chidren
-    for a in o.meta__undo_children_to_record:
-      obj = getattr( o, a)
-      if isinstance(obj, (list, set)):
-        [self.record_object( i) for i in obj]
-      elif isinstance(obj, dict):
-        [self.record_object( i) for i in obj.itervalues() if i]
+      if o in self.groups:
+        continue
+      old = previous and previous.groups.get( o)
+      if changed is None:
+        group = record_group( o)
+      elif old is not None and o not in changed_by_top and old.signature == _signature( o):
+        # nothing changed in the top level
+        group = old
       else:
-        self.record_object( obj)
+        group = record_group( o, previous=old, changed=changed_by_top.get( o, ()))
+      if group is not old:
+        self.changed += group.changed
+        self.size += group.size
+      self.groups[ o] = group
+      self.top_levels.append( o)
+    self.size += sys.getsizeof( self.stack) + sys.getsizeof( self.groups) + sys.getsizeof( self.top_levels)
 
 
-  def undo( self, previous):
+  def undo( self, previous, changed=()):
     """does undo, actually only calls self.set_state"""
-    self.set_state( previous)
+    self.set_state( previous, changed=changed)
 
 
-  def set_state( self, previous):
+  def set_state( self, previous, changed=()):
     """sets the system to the recorded state (update is done only where necessary,
-    not changed values are not touched)."""
+    not changed values are not touched).
+
+    The actual state is expected to be that of previous apart from the
+    objects in changed (changed since previous was recorded or restored),
+    objects whose state is shared with previous and that are not in
+    changed are therefore skipped."""
+    changed_tops = set( [_top_level_of( o) for o in changed])
     # we need to know about deleted bonds before we try to redraw them (when updating atom)
-    deleted = misc.difference( self.objects, previous.objects)
-    added = misc.difference( previous.objects, self.objects)
+    # lists keep the order of drawing, sets are used for membership tests
+    # only the groups with different objects have to be compared
+    own = [o for t in self.top_levels if not _same_objects( self.groups[ t], previous.groups.get( t))
+           for o in self.groups[ t].objects]
+    other = [o for t in previous.top_levels if not _same_objects( previous.groups[ t], self.groups.get( t))
+             for o in previous.groups[ t].objects]
+    own_set = set( own)
+    other_set = set( other)
+    deleted = [o for o in own if o not in other_set]
+    added = [o for o in other if o not in own_set]
+    deleted_set = set( deleted)
+    added_set = set( added)
     to_redraw = set()
+    to_flush = set()
     ## CHANGED OBJECTS
-    i = 0
-    for o in self.objects:
-      changed = 0
-      for a in o.meta__undo_fake:
-        # fakes serve only to force redraw in some cases however do not perform any undo
-        if self.records[i][a] != getattr( o, a):
-          changed = 1
-      for a in o.meta__undo_simple:
-        if self.records[i][a] != o.__dict__[a]:
-          o.__dict__[a] = self.records[i][a]
-          if a != 'molecule':  # this jumps a little from the clean, meta-driven design, however saves much time
-            changed = 1
-      for a in o.meta__undo_copy:
-        if self.records[i][a] != o.__dict__[a]:
-          o.__dict__[a] = copy.copy( self.records[i][a])
-          changed = 1
-          # this part is not meta driven, I have to rewrite it one day
-          if a == 'bonds':
-            o.edges = o.bonds
-          elif a == 'atoms':
-            o.vertices = o.atoms
-          # / end of the shitty patch
-      for a in o.meta__undo_properties:
-        if hasattr( o, a):
-          if self.records[i][a] != getattr( o, a):
-            setattr( o, a, self.records[i][a])
-            changed = 1
-
-      if changed:
+    for t in self.top_levels:
+      group = self.groups[ t]
+      old_group = previous.groups.get( t)
+      if group is old_group and t not in changed_tops:
+        # the whole top level is in the recorded state
+        continue
+      for o, rec in zip( group.objects, group.records):
+        if old_group and old_group.get_record( o) is rec and o not in changed:
+          # the state is shared with the previous record and the object did not change since
+          continue
+        state_changed = self._set_object_state( o, rec)
+        if o.object_type in ('atom', 'bond', 'mark'):
+          # the attributes were set behind the back of the setters, the
+          # results cached on the molecule have to be flushed
+          mol = _top_level_of( o)
+          if mol is not None and mol.object_type == 'molecule':
+            to_flush.add( mol)
+        if not state_changed:
+          continue
         to_redraw.add( o)
+        if o.object_type == 'molecule':
+          # the graph was changed behind the back of oasa
+          o._flush_cache()
         # some hacks needed to ensure complete redraw
         if o.object_type == 'atom':
-          neigh_edges = set( [b for b in o.neighbor_edges if b not in deleted and b not in added])
+          neigh_edges = set( [b for b in o.neighbor_edges if b not in deleted_set and b not in added_set])
           to_redraw |= neigh_edges
           # neighboring edges of the atoms edges - needed because of new bond drawing code
           # that takes neighboring edges into account
           neigh_edges2 = set()
           for e in neigh_edges:
-            neigh_edges2 |= set([e2 for e2 in e.neighbor_edges if e2 not in added])
+            neigh_edges2 |= set([e2 for e2 in e.neighbor_edges if e2 not in added_set])
           to_redraw |= neigh_edges2
         elif o.object_type == 'bond':
-          to_redraw |= set( [a for a in o.get_atoms() if a.show and not a in deleted and not a in added])
+          to_redraw |= set( [a for a in o.get_atoms() if a.show and a not in deleted_set and a not in added_set])
         elif o.object_type == 'point':
           to_redraw.add( o)
           to_redraw.add( o.parent)
-
-      i += 1
+    [mol.flush_oasa_cache() for mol in to_flush]
 
     ## DELETED OBJECTS
     # deleted are known from the top of this def
@@ -299,9 +362,9 @@ class state_record(object):
           o.draw()
       # hacks to ensure complete redraw
       if o.object_type == 'atom':
-        to_redraw |= set( [b for b in o.neighbor_edges if b not in deleted])
+        to_redraw |= set( [b for b in o.neighbor_edges if b not in deleted_set])
       elif o.object_type == 'bond':
-        to_redraw |= set( [a for a in o.get_atoms() if a.show and not a in deleted])
+        to_redraw |= set( [a for a in o.get_atoms() if a.show and a not in deleted_set])
       elif o.object_type == 'point':
         to_redraw.add( o)
         to_redraw.add( o.parent)
@@ -317,22 +380,70 @@ class state_record(object):
     to_redraw = list( to_redraw)
     to_redraw.sort(key=_redraw_sorting)
     for o in to_redraw:
-      if o not in deleted and o.object_type != 'molecule' and hasattr(o,'redraw'):
+      if o not in deleted_set and o.object_type != 'molecule' and hasattr(o,'redraw'):
         if hasattr( o, "after_undo"):
           o.after_undo()
         if o.object_type == 'atom':
-          o.redraw( suppress_reposition=1)
+          self.paper.schedule_redraw( o, suppress_reposition=1)
         else:
-          o.redraw()
+          self.paper.schedule_redraw( o)
+    # objects made dirty by the changes above are redrawn here as well, each only once
+    self.paper.flush_redraws()
 
-    self.paper.stack = copy.copy( self.stack)
+    self.paper.stack = top_level_stack( self.stack)
     self.paper.add_bindings()
 
 
+  def _set_object_state( self, o, rec):
+    """sets the recorded state rec to the object o, returns True if something changed"""
+    changed = 0
+    for a in o.meta__undo_fake:
+      # fakes serve only to force redraw in some cases however do not perform any undo
+      if rec[a] != getattr( o, a):
+        changed = 1
+    for a in o.meta__undo_simple:
+      if rec[a] != o.__dict__[a]:
+        o.__dict__[a] = rec[a]
+        if a != 'molecule':  # this jumps a little from the clean, meta-driven design, however saves much time
+          changed = 1
+    for a in o.meta__undo_copy:
+      if rec[a] != o.__dict__[a]:
+        o.__dict__[a] = copy.copy( rec[a])
+        changed = 1
+        # this part is not meta driven, I have to rewrite it one day
+        if a == 'bonds':
+          o.edges = o.bonds
+        elif a == 'atoms':
+          o.vertices = o.atoms
+        # / end of the shitty patch
+    for a in o.meta__undo_properties:
+      if hasattr( o, a):
+        if rec[a] != getattr( o, a):
+          setattr( o, a, rec[a])
+          changed = 1
+    return changed
+
+
+  def _find_group( self, o):
+    """returns the group o is recorded in or None"""
+    group = self.groups.get( _top_level_of( o))
+    if group is not None and o in group._index:
+      return group
+    # the object might have been moved to another top level meanwhile
+    for group in self.groups.values():
+      if o in group._index:
+        return group
+    return None
+
+
+  def has_object( self, o):
+    return self._find_group( o) is not None
+
+
   def get_record( self, o):
-    if o in self.objects:
-      i = self.objects.index(o)
-      return self.records[i]
+    group = self._find_group( o)
+    if group is not None:
+      return group.get_record( o)
     else:
       return None
 
@@ -365,6 +476,156 @@ class state_record(object):
 
 
 
+##-------------------- RECORD GROUP --------------------
+
+class record_group(object):
+  """State of one top level object and all its children.
+
+  With previous (the group of the same top level from the previous
+  record) given, only the changed objects and objects that cannot report
+  their changes are recorded, the records of the rest are taken from
+  previous. When the structure (the set of children) did not change,
+  the list of objects and its index are shared with previous as well.
+  """
+  # objects that do not draw anything themselves and so are not noticed
+  # when they change, they are always recorded again
+  untracked_types = ('molecule', 'fragment')
+
+  def __init__( self, top_level, previous=None, changed=None):
+    """changed is a collection of changed objects of this top level,
+    None means that all of them are recorded again"""
+    self.signature = _signature( top_level)
+    self.size = 0
+    self.changed = 0
+    if previous is not None and changed is not None and self.signature == previous.signature:
+      if self._update( previous, changed):
+        return
+    self.objects = []
+    self.records = []
+    self._index = {}
+    self._untracked = []
+    self.size = 0
+    self.changed = 0
+    if changed is not None:
+      changed = set( changed)
+    self.record_object( top_level, previous, changed)
+    self.size += sys.getsizeof( self.objects) + sys.getsizeof( self.records) + sys.getsizeof( self._index)
+
+
+  def _update( self, previous, changed):
+    """records the changed objects into a copy of previous, returns False
+    if the structure changed and the whole group has to be recorded"""
+    updates = {}
+    for o in list( changed) + [previous.objects[i] for i in previous._untracked]:
+      i = previous._index.get( o)
+      if i is None:
+        # a new object
+        return False
+      rec = _record( o)
+      old = previous.records[ i]
+      for a in o.meta__undo_children_to_record:
+        if rec[a] != old[a]:
+          return False
+      if rec != old:
+        updates[ i] = rec
+    self.objects = previous.objects
+    self._index = previous._index
+    self._untracked = previous._untracked
+    self.records = list( previous.records)
+    for i, rec in updates.items():
+      self.records[ i] = rec
+      self.changed += 1
+      self.size += _record_size( rec)
+    self.size += sys.getsizeof( self.records)
+    return True
+
+
+  def record_object( self, o, previous, changed):
+    rec = old = None
+    if previous is not None:
+      old = previous.get_record( o)
+    if old is not None and changed is not None and o not in changed:
+      if o.object_type in self.untracked_types:
+        rec = _record( o)
+        if rec == old:
+          rec = old
+      else:
+        rec = old
+        # cheap check of the containers in case they were changed behind our back
+        for a in o.meta__undo_copy:
+          if rec[a] != o.__dict__[a]:
+            rec = None
+            break
+    if rec is None:
+      rec = _record( o)
+    if rec is not old:
+      self.changed += 1
+      self.size += _record_size( rec)
+    if o.object_type in self.untracked_types:
+      self._untracked.append( len( self.objects))
+    self._index.setdefault( o, len( self.objects))
+    self.objects.append( o)
+    self.records.append( rec)
+    # process the chidren
+    for a in o.meta__undo_children_to_record:
+      obj = getattr( o, a)
+      if isinstance(obj, (list, set)):
+        [self.record_object( i, previous, changed) for i in obj]
+      elif isinstance(obj, dict):
+        [self.record_object( i, previous, changed) for i in obj.itervalues() if i]
+      else:
+        self.record_object( obj, previous, changed)
+
+
+  def get_record( self, o):
+    i = self._index.get( o)
+    if i is not None:
+      return self.records[i]
+    else:
+      return None
+
+
+
+def _record( o):
+  """returns the record of the recent state of o"""
+  rec = {}
+  for a in o.meta__undo_fake:
+    rec[a] = getattr( o, a)
+  for a in o.meta__undo_simple:
+    rec[a] = getattr( o, a)
+  for a in o.meta__undo_properties:
+    rec[a] = getattr( o, a)
+  for a in o.meta__undo_copy:
+    rec[a] = copy.copy( o.__dict__[a])
+  return rec
+
+
+def _top_level_of( o):
+  """returns the top level o belongs to (o itself for top levels)"""
+  object_type = getattr( o, 'object_type', None)
+  if object_type == 'mark':
+    o = o.atom
+  elif object_type == 'point':
+    return o.arrow
+  return getattr( o, 'molecule', None) or o
+
+
+def _same_objects( group1, group2):
+  return group2 is not None and group1.objects is group2.objects
+
+
+def _signature( o):
+  """sizes of the children of the top level o, a change in them means that
+  the structure changed"""
+  return tuple( [len( getattr( o, a)) for a in o.meta__undo_children_to_record])
+
+
+def _record_size( rec):
+  """returns a rough estimate of memory occupied by one object record"""
+  return sys.getsizeof( rec) + sum( [sys.getsizeof( v) for v in rec.values()])
+
+
+
 REDRAW_PREFERENCES = ("atom", "bond")
 
 def cmp_to_key(mycmp):
@@ -90,6 +90,11 @@ class SVG_writer(XML_writer):
     """Construct the SVG dom from all top_levels.
 
     """
+    with self.paper.prepared_for_export():
+      self._construct_dom_tree(top_levels)
+
+
+  def _construct_dom_tree(self, top_levels):
     # the constants
     border_size = self.paper.get_paper_property( 'crop_margin')
 
@@ -126,10 +131,8 @@ class SVG_writer(XML_writer):
       self.group.setAttribute( 'transform', 'translate(%d,%d)' % (-x1+border_size, -y1+border_size))
 
     # sort the top_levels according to paper.stack
-    cs = []
-    for c in self.paper.stack:
-      if c in top_levels:
-        cs.append( c)
+    top_levels = set( top_levels)
+    cs = [c for c in self.paper.stack if c in top_levels]
     for o in cs:
       if o.object_type == 'molecule':
         for b in o.bonds:
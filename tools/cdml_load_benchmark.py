@@ -0,0 +1,81 @@
+"""Compares reading of CDML and CD-SVG files by the streaming reader
+(cdml_reader) with parsing of the whole file by minidom.
+
+  python cdml_load_benchmark.py [-r REPEAT] FILE...
+
+For each file the best time of REPEAT runs and the peak memory of
+one run (Python 3 only) are reported for both ways of reading.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import gzip
+import optparse
+import xml.dom.minidom as dom
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+if "_" not in builtins.__dict__:
+    builtins.__dict__["_"] = lambda m: m
+
+import cdml_reader
+
+
+def read_minidom(file_name):
+    # the way files were read before cdml_reader
+    try:
+        s = gzip.open(file_name, "rb").read()
+        doc = dom.parseString(s)
+    except IOError:
+        doc = dom.parse(file_name)
+    return doc.getElementsByTagName("cdml")[0]
+
+
+def read_stream(file_name):
+    return cdml_reader.read_cdml(file_name)[0]
+
+
+def measure(function, file_name, repeat):
+    times = []
+    for i in range(repeat):
+        t = time.time()
+        function(file_name)
+        times.append(time.time() - t)
+    peak = None
+    if tracemalloc:
+        tracemalloc.start()
+        function(file_name)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [-r REPEAT] FILE...")
+    parser.add_option("-r", "--repeat", type="int", default=5)
+    options, args = parser.parse_args()
+    if not args:
+        parser.error("no files given")
+    for file_name in args:
+        print(file_name)
+        for name, function in (("minidom", read_minidom), ("stream", read_stream)):
+            t, peak = measure(function, file_name, options.repeat)
+            memory = peak is not None and "%.1f MB" % (peak / 1e6) or "n/a"
+            print("  %-8s %8.1f ms  peak memory %s" % (name, 1000 * t, memory))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Frame time benchmark of dragging a selection in edit_mode (bkchem/modes.py).
+
+  python drag_benchmark.py [-e EVENTS] [-i INTERVAL] [-f FRACTION] FILE...
+
+Each FILE is read into the headless paper (bkchem/headless.py) and
+FRACTION of the atoms of its biggest molecule are selected and dragged by
+EVENTS motion events coming every INTERVAL ms. The drag is done twice:
+as edit_mode did it before - each event moves the selection and fully
+redraws the bonds connecting it to the rest of the molecule - and
+coalesced by _queue_drag/_flush_drag into one move per DRAG_FRAME. The
+after() callbacks run on a simulated clock, the reported times are the
+real time spent in handling the events and in the frames.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+
+import headless  # installs the translation functions the other modules need
+import modes
+
+from singleton_store import Store
+
+
+class simulated_clock(object):
+    """after() and after_cancel() of the paper running on simulated time"""
+
+    def __init__(self):
+        self.now = 0
+        self._jobs = {}
+        self._last = 0
+
+    def after(self, ms, function):
+        self._last += 1
+        self._jobs[self._last] = (self.now + ms, function)
+        return self._last
+
+    def after_cancel(self, job):
+        self._jobs.pop(job, None)
+
+    def advance(self, now):
+        """runs the jobs due until now"""
+        self.now = now
+        for job, (due, function) in sorted(self._jobs.items(), key=lambda j: j[1][0]):
+            if due <= now and job in self._jobs:
+                del self._jobs[job]
+                function()
+
+
+def start_drag(file_name, fraction):
+    """returns edit_mode dragging the selected atoms of the loaded file"""
+    paper = headless.load(file_name)
+    clock = simulated_clock()
+    paper.after = clock.after
+    paper.after_cancel = clock.after_cancel
+    mol = max(paper.molecules, key=lambda m: len(m.atoms))
+    paper.select(mol.atoms[:max(1, int(len(mol.atoms) * fraction))])
+    mode = modes.edit_mode()
+    mode._dragging = 1
+    paper.select(paper.atoms_to_update())
+    mode._bonds_to_update = paper.bonds_to_update()
+    mode._arrows_to_update = paper.arrows_to_update()
+    return paper, clock, mode
+
+
+def drag_per_event(paper, clock, mode, events, interval):
+    # edit_mode.mouse_drag before the motion was coalesced
+    times = []
+    for i in range(events):
+        t = time.time()
+        [o.move(1, 1) for o in paper.selected]
+        [o.redraw() for o in mode._bonds_to_update]
+        [o.redraw() for o in mode._arrows_to_update]
+        times.append(time.time() - t)
+    return times, sum(times)
+
+
+def drag_coalesced(paper, clock, mode, events, interval):
+    frames = []
+    flush = mode._flush_drag
+
+    def timed_flush():
+        t = time.time()
+        flush()
+        frames.append(time.time() - t)
+    mode._flush_drag = timed_flush
+    t = time.time()
+    for i in range(events):
+        clock.advance(i * interval)
+        mode._queue_drag(1, 1)
+    clock.advance(events * interval + mode.DRAG_FRAME)
+    return frames, time.time() - t
+
+
+def report(name, events, frames, total):
+    print("  %-12s %7d events %7d frames  total %9.1f ms  mean frame %7.2f ms  max frame %7.2f ms" % (
+        name, events, len(frames), 1000 * total,
+        1000 * sum(frames) / max(1, len(frames)), 1000 * max(frames or [0])))
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [-e EVENTS] [-i INTERVAL] [-f FRACTION] FILE...")
+    parser.add_option("-e", "--events", type="int", default=500)
+    parser.add_option("-i", "--interval", type="float", default=4.0)
+    parser.add_option("-f", "--fraction", type="float", default=0.5)
+    options, args = parser.parse_args()
+    if not args:
+        parser.error("no files given")
+    headless.init()
+    for file_name in args:
+        print(file_name)
+        for name, drag in (("per event", drag_per_event), ("coalesced", drag_coalesced)):
+            paper, clock, mode = start_drag(file_name, options.fraction)
+            if name == "per event":
+                print("  %d atoms selected, %d bonds to update" % (
+                    len([o for o in paper.selected if o.object_type == 'atom']), len(mode._bonds_to_update)))
+            frames, total = drag(paper, clock, mode, options.events, options.interval)
+            report(name, options.events, frames, total)
+    Store.app.paper.reset()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Benchmark of drawing molecules with 3D coordinates (bond.draw).
+
+  python draw_3d_benchmark.py [-r REPEAT] [-q QUADRATIC_LIMIT] [ATOMS...]
+
+Two molecules of about ATOMS atoms are built on the headless paper
+(bkchem/headless.py) and drawn: a helix with alternating single and
+double bonds and a chain of tilted benzene rings. Each double bond is
+drawn after projecting the atoms around it and in its rings to the plane
+of the drawing. The helix has fixed bond centers. The rings are drawn
+with automatic centers, so the side of the second line is computed from
+the projected rings. The time is compared with projecting the whole
+molecule for every double bond, as bond.draw did before. That comparison
+runs only up to QUADRATIC_LIMIT atoms, because it is quadratic. Both
+ways must give the same drawing.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import math
+import time
+import optparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+
+import headless  # installs the translation functions the other modules need
+
+from bond import bond
+from singleton_store import Store
+
+
+def add_atom(mol, x, y, z):
+    a = mol.create_vertex()
+    a.x = x
+    a.y = y
+    a.z = z
+    mol.add_vertex(a)
+    return a
+
+
+def add_bond(mol, a1, a2, order, center):
+    b = mol.create_edge()
+    b.order = order
+    b.center = center
+    mol.add_edge(a1, a2, b)
+    return b
+
+
+def build_helix(paper, atoms):
+    mol = paper.new_molecule()
+    last = None
+    for i in range(atoms):
+        a = add_atom(mol, 400 + 100 * math.cos(0.6 * i), 400 + 100 * math.sin(0.6 * i), 15 * i)
+        if last:
+            add_bond(mol, last, a, i % 2 + 1, 0)
+        last = a
+    return mol
+
+
+def build_rings(paper, atoms):
+    """benzene rings tilted around the x axis, linked by single bonds"""
+    mol = paper.new_molecule()
+    r = 25
+    last = None
+    for k in range(max(1, atoms // 6)):
+        tilt = 0.5 + 0.3 * k
+        ring = []
+        for j in range(6):
+            x = r * math.cos(j * math.pi / 3)
+            y = r * math.sin(j * math.pi / 3)
+            ring.append(add_atom(mol, 100 + 80 * k + x, 400 + y * math.cos(tilt), y * math.sin(tilt)))
+        for j in range(6):
+            # the centers are computed when drawn
+            add_bond(mol, ring[j], ring[(j + 1) % 6], 2 - j % 2, None)
+        if last:
+            add_bond(mol, last, ring[3], 1, None)
+        last = ring[0]
+    return mol
+
+
+def whole_molecule(self, rings=None):
+    # bond.draw before - every atom of the molecule was projected,
+    # _compute_sign_and_center (which passes rings) kept its own atoms
+    if rings is None:
+        return self.molecule.atoms
+    return neighborhood(self, rings)
+
+
+neighborhood = bond.__dict__["_get_neighborhood"]
+
+
+@contextlib.contextmanager
+def projecting_whole_molecule():
+    bond._get_neighborhood = whole_molecule
+    try:
+        yield
+    finally:
+        bond._get_neighborhood = neighborhood
+
+
+def draw(build, atoms, automatic, repeat):
+    """returns the best time of drawing the molecule and the coordinates of the drawn items"""
+    times = []
+    for i in range(repeat):
+        paper = Store.app.paper
+        paper.reset()
+        mol = build(paper, atoms)
+        t = time.time()
+        mol.draw(automatic=automatic)
+        times.append(time.time() - t)
+    drawing = [tuple(round(c, 2) for c in paper.coords(item)) for item in paper.find_all()]
+    paper.reset()
+    return 1000 * min(times), drawing
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-r", "--repeat", type="int", default=3)
+    parser.add_option("-q", "--quadratic-limit", type="int", default=2000)
+    options, args = parser.parse_args()
+    sizes = [int(a) for a in args] or [100, 500, 2000, 10000]
+
+    headless.init()
+    print("%8s %8s %16s %16s %10s" % ("shape", "atoms", "molecule [ms]", "neighbors [ms]", "same"))
+    for shape, build, automatic in (("helix", build_helix, "none"), ("rings", build_rings, "both")):
+        for n in sizes:
+            t_new, new = draw(build, n, automatic, options.repeat)
+            if n <= options.quadratic_limit:
+                with projecting_whole_molecule():
+                    t_old, old = draw(build, n, automatic, options.repeat)
+                print("%8s %8d %16.1f %16.1f %10s" % (shape, n, t_old, t_new, old == new and "yes" or "no"))
+            else:
+                print("%8s %8d %16s %16.1f %10s" % (shape, n, "-", t_new, "-"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
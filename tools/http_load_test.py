@@ -0,0 +1,81 @@
+"""Load test for the BKChem http server (http_server2).
+
+Start BKChem with the server running (BKChem.start_server) and run:
+
+  python http_load_test.py [-u http://localhost:8008] [-t THREADS] [-n REQUESTS]
+
+The threads request /content.svg and /smiles/... concurrently and the
+throughput and latencies are reported for each kind of request.
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import optparse
+import threading
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+
+smiles = ["CCO", "c1ccccc1", "CC(=O)O", "C1CCCCC1N", "OC(=O)c1ccccc1O"]
+
+
+def worker(base, paths, count, results, lock):
+    for i in range(count):
+        path = paths[i % len(paths)]
+        kind = path.split("/")[1]
+        t = time.time()
+        try:
+            data = urlopen(base + path).read()
+            ok = bool(data)
+        except Exception as e:
+            ok = False
+        with lock:
+            results.setdefault(kind, []).append((time.time() - t, ok))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-u", "--url", default="http://localhost:8008")
+    parser.add_option("-t", "--threads", type="int", default=8)
+    parser.add_option("-n", "--requests", type="int", default=100,
+                      help="number of requests per thread")
+    parser.add_option("-s", "--svg-only", action="store_true", default=False,
+                      help="do not change the drawing, request only /content.svg")
+    options, args = parser.parse_args()
+
+    paths = ["/content.svg"]
+    if not options.svg_only:
+        paths.extend("/smiles/" + s for s in smiles)
+
+    results = {}
+    lock = threading.Lock()
+    threads = []
+    start = time.time()
+    for i in range(options.threads):
+        # shift the paths so that the threads do not request the same thing at once
+        shifted = paths[i % len(paths):] + paths[:i % len(paths)]
+        t = threading.Thread(target=worker, args=(options.url, shifted, options.requests, results, lock))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    total = sum(len(r) for r in results.values())
+    print("%d requests in %.2f s (%.1f requests/s)" % (total, elapsed, total / elapsed))
+    for kind, rs in sorted(results.items()):
+        times = sorted(r[0] for r in rs)
+        failed = len([r for r in rs if not r[1]])
+        print("%-8s %5d requests, %d failed, median %.1f ms, 95%% %.1f ms, max %.1f ms" %
+              (kind, len(rs), failed, 1000 * times[len(times) // 2],
+               1000 * times[int(len(times) * 0.95)], 1000 * times[-1]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
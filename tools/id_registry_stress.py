@@ -0,0 +1,131 @@
+"""Stress test of the id registries (bkchem/id_manager.py).
+
+  python id_registry_stress.py [-n OBJECTS] [-q QUADRATIC_LIMIT]
+
+Registers OBJECTS objects (100000 by default) in an id_manager, the way
+objects get their CDML ids while a file is read, and under several canvas
+item ids each in an id_registry, the way the paper registers the drawn
+items. Then looks all of them up in both directions, unregisters them and
+checks that nothing is left. The times are compared with the value scans
+used before, for QUADRATIC_LIMIT objects only as they are quadratic.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+
+from id_manager import id_manager, id_registry
+
+
+class fake_object(object):
+    pass
+
+
+class scanning_id_manager(object):
+    """the id_manager as it was before - a dict scanned for objects"""
+
+    def __init__(self):
+        self.id_map = {}
+        self._counter = 0
+
+    def is_registered_object(self, obj):
+        return obj in self.id_map.values()
+
+    def register_id(self, obj, Id):
+        if self.is_registered_object(obj):
+            raise ValueError("Object is already registered " + str(obj))
+        self.id_map[Id] = obj
+
+    def generate_and_register_id(self, obj, prefix='id'):
+        while True:
+            self._counter += 1
+            Id = prefix + str(self._counter)
+            if Id not in self.id_map:
+                break
+        self.register_id(obj, Id)
+        return Id
+
+    def get_id_of_object(self, obj):
+        for k, v in self.id_map.items():
+            if v == obj:
+                return k
+        return None
+
+
+def timed(function, *args):
+    t = time.time()
+    ret = function(*args)
+    return ret, 1000 * (time.time() - t)
+
+
+def stress_id_manager(manager, objects):
+    ids = [manager.generate_and_register_id(o, prefix='atom') for o in objects]
+    return ids
+
+
+def check_id_manager(manager, objects, ids):
+    for o, Id in zip(objects, ids):
+        assert manager.get_id_of_object(o) == Id
+        assert manager.is_registered_object(o)
+
+
+def stress_registry(registry, objects, items_per_object):
+    item = 0
+    for o in objects:
+        for i in range(items_per_object):
+            item += 1
+            registry.register(item, o)
+    return item
+
+
+def check_registry(registry, objects, items_per_object):
+    item = 0
+    for o in objects:
+        ids = registry.get_ids(o)
+        assert len(ids) == items_per_object
+        for i in range(items_per_object):
+            item += 1
+            assert registry.get_object(item) is o
+        assert registry.get_id(o) == ids[0]
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--objects", type="int", default=100000)
+    parser.add_option("-i", "--items-per-object", type="int", default=3)
+    parser.add_option("-q", "--quadratic-limit", type="int", default=5000)
+    options, args = parser.parse_args()
+
+    objects = [fake_object() for i in range(options.objects)]
+
+    manager = id_manager()
+    ids, t_reg = timed(stress_id_manager, manager, objects)
+    _, t_check = timed(check_id_manager, manager, objects, ids)
+    _, t_unreg = timed(lambda: [manager.unregister_object(o) for o in objects])
+    assert not len(manager.id_map)
+    print("id_manager   %7d objects  register %8.1f ms  lookups %8.1f ms  unregister %8.1f ms" % (
+        len(objects), t_reg, t_check, t_unreg))
+
+    registry = id_registry()
+    items, t_reg = timed(stress_registry, registry, objects, options.items_per_object)
+    _, t_check = timed(check_registry, registry, objects, options.items_per_object)
+    _, t_unreg = timed(lambda: [registry.unregister(i) for i in range(1, items + 1)])
+    assert not len(registry) and not registry.has_object(objects[0])
+    print("id_registry  %7d items    register %8.1f ms  lookups %8.1f ms  unregister %8.1f ms" % (
+        items, t_reg, t_check, t_unreg))
+
+    few = objects[:options.quadratic_limit]
+    scanning = scanning_id_manager()
+    ids, t_reg = timed(stress_id_manager, scanning, few)
+    _, t_check = timed(check_id_manager, scanning, few, ids)
+    print("old scans    %7d objects  register %8.1f ms  lookups %8.1f ms" % (len(few), t_reg, t_check))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
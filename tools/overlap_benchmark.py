@@ -0,0 +1,122 @@
+"""Benchmark of finding overlapping atoms (spatial_index.coincident_pairs)
+against the scans used before by chem_paper.handle_overlap and
+molecule.handle_overlap.
+
+  python overlap_benchmark.py [-t TEMPLATE] [-q QUADRATIC_LIMIT] [ATOMS...]
+
+A structure of ATOMS atoms on a grid gets a TEMPLATE atoms big copy of
+its part pasted onto it. The paper check (centres closer than 2 px) is
+timed with coincident_pairs and with the old probing of the bboxes of
+all the atom items around each atom, the molecule check (closer than
+4 px) with coincident_pairs and with the old loop over all pairs of
+atoms. The old ways are quadratic and are run only up to
+QUADRATIC_LIMIT atoms. Both ways have to find the same pairs.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import random
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+
+from spatial_index import coincident_pairs
+
+
+class fake_atom(object):
+    # half of the size of the canvas item of an atom without label
+    radius = 3
+
+    def __init__(self, x, y, z=0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def bbox(self):
+        r = self.radius
+        return self.x - r, self.y - r, self.x + r, self.y + r
+
+
+def build_atoms(n, template):
+    side = int(n ** 0.5) + 1
+    atoms = [fake_atom(25.0 * (i % side), 25.0 * (i // side)) for i in range(n)]
+    # the pasted template fits onto the structure up to a small shift
+    for a in random.sample(atoms, min(template, n)):
+        atoms.append(fake_atom(a.x + random.uniform(-1, 1), a.y + random.uniform(-1, 1)))
+    return atoms
+
+
+def paper_scan(atoms):
+    # chem_paper.handle_overlap before - find_registered_overlapping around
+    # each atom scans the bboxes of all the canvas items
+    overlap = []
+    for a1 in atoms:
+        x, y = a1.x, a1.y
+        for a2 in atoms:
+            bx1, by1, bx2, by2 = a2.bbox()
+            if bx1 <= x + 2 and bx2 >= x - 2 and by1 <= y + 2 and by2 >= y - 2 and a1 is not a2:
+                if abs(a1.x - a2.x) < 2 and abs(a1.y - a2.y) < 2:
+                    if [a2, a1] not in overlap and a1.z == a2.z:
+                        overlap.append([a1, a2])
+    return overlap
+
+
+def paper_buckets(atoms):
+    return [(a1, a2) for a1, a2 in coincident_pairs(atoms, 2) if a1.z == a2.z]
+
+
+def molecule_loop(atoms):
+    # molecule.handle_overlap before
+    pairs = []
+    for i in range(len(atoms)):
+        for j in range(i + 1, len(atoms)):
+            a = atoms[i]
+            b = atoms[j]
+            if (abs(a.x - b.x) < 4) and (abs(a.y - b.y) < 4):
+                pairs.append((a, b))
+    return pairs
+
+
+def molecule_buckets(atoms):
+    return coincident_pairs(atoms, 4)
+
+
+def unordered(pairs):
+    return set(frozenset(p) for p in pairs)
+
+
+def timed(function, *args):
+    t = time.time()
+    ret = function(*args)
+    return ret, 1000 * (time.time() - t)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-t", "--template", type="int", default=20)
+    parser.add_option("-q", "--quadratic-limit", type="int", default=2000)
+    options, args = parser.parse_args()
+    sizes = [int(a) for a in args] or [500, 2000, 10000, 50000]
+
+    print("%8s %16s %16s %16s %16s" % ("atoms", "paper old [ms]", "paper new [ms]", "mol old [ms]", "mol new [ms]"))
+    for n in sizes:
+        atoms = build_atoms(n, options.template)
+        new_paper, t_new_paper = timed(paper_buckets, atoms)
+        new_mol, t_new_mol = timed(molecule_buckets, atoms)
+        assert len(new_paper) == options.template
+        if n <= options.quadratic_limit:
+            old_paper, t_old_paper = timed(paper_scan, atoms)
+            old_mol, t_old_mol = timed(molecule_loop, atoms)
+            assert unordered(old_paper) == unordered(new_paper)
+            assert old_mol == new_mol
+            print("%8d %16.1f %16.1f %16.1f %16.1f" % (n, t_old_paper, t_new_paper, t_old_mol, t_new_mol))
+        else:
+            print("%8d %16s %16.1f %16s %16.1f" % (n, "-", t_new_paper, "-", t_new_mol))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
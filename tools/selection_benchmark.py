@@ -0,0 +1,100 @@
+"""Benchmark of the paper selection (bkchem/selection.py) against the plain
+list that was used before.
+
+  python selection_benchmark.py [-n ATOMS] [-m MOLECULES]
+
+Selects all ATOMS atoms one by one (as paper.select does), maps them to
+their molecules (paper.selected_to_unique_top_levels) and unselects them
+again one by one (paper.unselect).
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+
+from selection import selection
+
+
+class fake_molecule(object):
+    object_type = 'molecule'
+
+
+class fake_atom(object):
+    object_type = 'atom'
+
+    def __init__(self, molecule):
+        self.molecule = molecule
+
+
+def list_select_all(atoms):
+    selected = []
+    for o in atoms:
+        if o not in selected:
+            selected.append(o)
+    return selected
+
+
+def list_top_levels(selected):
+    filtrate = []
+    unique = 1
+    for o in selected:
+        if o.molecule not in filtrate:
+            filtrate.append(o.molecule)
+        else:
+            unique = 0
+    return filtrate, unique
+
+
+def list_unselect_all(selected, atoms):
+    for o in atoms:
+        selected.remove(o)
+
+
+def selection_select_all(atoms):
+    selected = selection()
+    for o in atoms:
+        selected.add(o)
+    return selected
+
+
+def selection_unselect_all(selected, atoms):
+    for o in atoms:
+        selected.discard(o)
+
+
+def timed(function, *args):
+    t = time.time()
+    ret = function(*args)
+    return ret, 1000 * (time.time() - t)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--atoms", type="int", default=10000)
+    parser.add_option("-m", "--molecules", type="int", default=500)
+    options, args = parser.parse_args()
+
+    mols = [fake_molecule() for i in range(options.molecules)]
+    atoms = [fake_atom(mols[i % len(mols)]) for i in range(options.atoms)]
+
+    selected, t1 = timed(list_select_all, atoms)
+    tops, t2 = timed(list_top_levels, selected)
+    _, t3 = timed(list_unselect_all, selected, atoms)
+    print("list       select %8.1f ms  top levels %8.1f ms  unselect %8.1f ms" % (t1, t2, t3))
+
+    selected, t1 = timed(selection_select_all, atoms)
+    tops2, t2 = timed(selected.get_top_levels)
+    _, t2b = timed(selected.get_top_levels)
+    _, t3 = timed(selection_unselect_all, selected, atoms)
+    print("selection  select %8.1f ms  top levels %8.1f ms (cached %.1f ms)  unselect %8.1f ms" % (t1, t2, t2b, t3))
+    assert tops == tops2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
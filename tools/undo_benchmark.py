@@ -0,0 +1,103 @@
+"""Benchmark of undo and redo (bkchem/undo.py) on synthetic documents.
+
+  python undo_benchmark.py [-m MOLECULES] [-l LOOKUPS] [-q QUADRATIC_LIMIT] [ATOMS...]
+
+For documents of ATOMS atoms split into MOLECULES chains it times undo
+and redo of moving one atom and of deleting half of the molecules, and
+compares lookups of objects in a record and the computation of the added
+and deleted objects with the list scans used before (the latter only up
+to QUADRATIC_LIMIT atoms, they are quadratic).
+
+The fake document is the one of undo_record_benchmark.py.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import random
+import optparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from undo_record_benchmark import build_document
+
+
+def all_objects(record):
+    return [o for t in record.top_levels for o in record.groups[t].objects]
+
+
+def list_get_record(objects, records, o):
+    # the way records were looked up before
+    if o in objects:
+        return records[objects.index(o)]
+    return None
+
+
+def list_difference(a, b):
+    # misc.difference
+    return [i for i in a if i not in b]
+
+
+def timed(function, *args):
+    t = time.time()
+    ret = function(*args)
+    return ret, 1000 * (time.time() - t)
+
+
+def undo_redo(um):
+    _, t_undo = timed(um.undo)
+    _, t_redo = timed(um.redo)
+    return t_undo, t_redo
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-m", "--molecules", type="int", default=20)
+    parser.add_option("-l", "--lookups", type="int", default=1000)
+    parser.add_option("-q", "--quadratic-limit", type="int", default=5000)
+    options, args = parser.parse_args()
+    sizes = [int(a) for a in args] or [1000, 5000, 20000]
+
+    for n in sizes:
+        paper = build_document(n, options.molecules)
+        um = paper.um
+        print("%d atoms in %d molecules" % (n, len(paper.stack)))
+
+        paper.stack[0].atoms[0].move(1, 1)
+        um.start_new_record()
+        print("  move one atom        undo %8.2f ms  redo %8.2f ms" % undo_redo(um))
+
+        for mol in paper.stack[::2]:
+            paper.stack.remove(mol)
+        um.start_new_record()
+        print("  delete half          undo %8.2f ms  redo %8.2f ms" % undo_redo(um))
+
+        before, after = um._records[-2], um._records[-1]
+        objects = all_objects(before)
+        records = [before.get_record(o) for o in objects]
+        sample = [random.choice(objects) for i in range(options.lookups)]
+        _, t_index = timed(lambda: [before.get_record(o) for o in sample])
+        line = "  %d lookups  index %8.2f ms" % (len(sample), t_index)
+        if n <= options.quadratic_limit:
+            _, t_list = timed(lambda: [list_get_record(objects, records, o) for o in sample])
+            line += "  list %8.2f ms" % t_list
+        print(line)
+
+        after_objects = all_objects(after)
+        def set_difference():
+            # the way set_state does it
+            after_set = set(after_objects)
+            return [o for o in objects if o not in after_set]
+        _, t_sets = timed(set_difference)
+        line = "  deleted objects    sets  %8.2f ms" % t_sets
+        if n <= options.quadratic_limit:
+            _, t_list = timed(list_difference, objects, after_objects)
+            line += "  list %8.2f ms" % t_list
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Benchmark of taking undo records (bkchem/undo.py).
+
+  python undo_record_benchmark.py [-m MOLECULES] [-r REPEAT] [ATOMS...]
+
+For documents of ATOMS atoms (100 to 10000 by default) split into
+MOLECULES chains it reports the time and estimated memory of one undo
+record when everything is recorded (as every record was before the
+changes were tracked) and when one atom was moved since the last record.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bkchem"))
+
+import undo
+
+
+class fake_molecule(object):
+    object_type = 'molecule'
+    meta__undo_fake = ()
+    meta__undo_simple = ('name',)
+    meta__undo_properties = ('id',)
+    meta__undo_copy = ('atoms', 'bonds')
+    meta__undo_children_to_record = ('atoms', 'bonds')
+
+    def __init__(self, paper, name):
+        self.paper = paper
+        self.name = name
+        self.id = name
+        self.atoms = []
+        self.bonds = []
+
+    def _flush_cache(self):
+        pass
+
+    def flush_oasa_cache(self):
+        pass
+
+
+class fake_atom(object):
+    object_type = 'atom'
+    meta__undo_fake = ()
+    meta__undo_simple = ()
+    meta__undo_properties = ('x', 'y', 'symbol', 'charge', 'show', 'line_color', 'font_size')
+    meta__undo_copy = ('marks',)
+    meta__undo_children_to_record = ('marks',)
+
+    def __init__(self, molecule, x, y):
+        self.molecule = molecule
+        self.x = x
+        self.y = y
+        self.symbol = 'C'
+        self.charge = 0
+        self.show = 0
+        self.line_color = '#000'
+        self.font_size = 12
+        self.marks = set()
+        self.neighbor_edges = []
+
+    @property
+    def paper(self):
+        return self.molecule.paper
+
+    def move(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        # what the dirty setters of the real atoms do
+        self.paper.um.note_change(self)
+
+    def redraw(self, **kw):
+        pass
+
+
+class fake_bond(object):
+    object_type = 'bond'
+    meta__undo_fake = ()
+    meta__undo_simple = ()
+    meta__undo_properties = ('order', 'type', 'line_width', 'line_color', 'center')
+    meta__undo_copy = ()
+    meta__undo_children_to_record = ()
+
+    def __init__(self, molecule, a1, a2):
+        self.molecule = molecule
+        self.atom1 = a1
+        self.atom2 = a2
+        self.order = 1
+        self.type = 'n'
+        self.line_width = 1.0
+        self.line_color = '#000'
+        self.center = None
+        self.neighbor_edges = []
+        a1.neighbor_edges.append(self)
+        a2.neighbor_edges.append(self)
+
+    def get_atoms(self):
+        return [self.atom1, self.atom2]
+
+    def redraw(self, **kw):
+        pass
+
+
+class fake_paper(object):
+
+    def __init__(self):
+        self.stack = []
+        self.um = None
+
+    @property
+    def top_levels(self):
+        return self.stack
+
+    def schedule_redraw(self, o, **kw):
+        o.redraw(**kw)
+
+    def flush_redraws(self):
+        pass
+
+    def add_bindings(self):
+        pass
+
+
+def build_document(atoms, molecules):
+    """returns paper with the atoms split into chain molecules and its undo_manager"""
+    paper = fake_paper()
+    per_molecule = max(1, atoms // molecules)
+    made = 0
+    while made < atoms:
+        mol = fake_molecule(paper, "mol%d" % len(paper.stack))
+        for i in range(min(per_molecule, atoms - made)):
+            a = fake_atom(mol, 20.0 * i, 30.0 * len(paper.stack))
+            if mol.atoms:
+                mol.bonds.append(fake_bond(mol, mol.atoms[-1], a))
+            mol.atoms.append(a)
+        made += len(mol.atoms)
+        paper.stack.append(mol)
+    paper.um = undo.undo_manager(paper)
+    return paper
+
+
+def best_of(repeat, function):
+    times = []
+    for i in range(repeat):
+        t = time.time()
+        ret = function()
+        times.append(time.time() - t)
+    return ret, 1000 * min(times)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-m", "--molecules", type="int", default=1)
+    parser.add_option("-r", "--repeat", type="int", default=5)
+    options, args = parser.parse_args()
+    sizes = [int(a) for a in args] or [100, 1000, 10000]
+
+    print("%8s %14s %14s %14s %14s" % ("atoms", "full [ms]", "full [kB]", "delta [ms]", "delta [kB]"))
+    for n in sizes:
+        paper = build_document(n, options.molecules)
+        um = paper.um
+        previous = um._records[-1]
+
+        full, t_full = best_of(options.repeat, lambda: undo.state_record(paper, previous=previous, changed=None))
+
+        def move_and_record():
+            a = paper.stack[-1].atoms[-1]
+            a.move(1, 1)
+            um.start_new_record()
+            return um._records[-1]
+        delta, t_delta = best_of(options.repeat, move_and_record)
+
+        assert delta.changed <= 3, delta.changed
+        print("%8d %14.2f %14.1f %14.2f %14.1f" % (n, t_full, full.size / 1024.0, t_delta, delta.size / 1024.0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())